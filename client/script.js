@@ -1,4 +1,7 @@
 const API_URL = "http://flats.antoniszczepanik.com/api/v1";
+const OFFERS_PAGE_SIZE = 5000;
+// below this zoom offers are shown as clusters aggregated by server
+const CLUSTER_MAX_ZOOM = 12;
 
 var map = L.map("mapid", { preferCanvas: true }).setView(
   [51.9189046, 19.1343786],
@@ -29,6 +32,30 @@ async function getData(url) {
   return data;
 }
 
+async function getPage(url) {
+  const response = await fetch(url, {
+    mode: "cors",
+    headers: {
+      "Content-Type": "application/json",
+    },
+  });
+  const columns = await response.json();
+  return {
+    data: columnsToOffers(columns),
+    nextCursor: response.headers.get("X-Next-Cursor"),
+  };
+}
+
+// offers are fetched in columnar format (list of values per column)
+function columnsToOffers(columns) {
+  const names = Object.keys(columns);
+  return columns.id.map((_, i) => {
+    let offer = {};
+    names.forEach((name) => (offer[name] = columns[name][i]));
+    return offer;
+  });
+}
+
 async function postData(url = "", data = {}) {
   let full_url = url;
   const response = await fetch(full_url, {
@@ -130,9 +157,11 @@ function updateOfferCount(count) {
   document.getElementById("offer_number").innerHTML = count;
 }
 
-async function refreshOffers() {
-  markers.clearLayers();
-  query = {
+// incremented on every refresh, so pages of outdated queries are dropped
+var refreshCounter = 0;
+
+function getFilterQuery() {
+  return filterNullQueryParams({
     from_date: getFromDate(),
     to_date: getTodayDate(),
     offer_type: document.getElementById("offer_type").value,
@@ -142,14 +171,123 @@ async function refreshOffers() {
     min_size: document.getElementById("min_size").value,
     min_price_estimate_diff: document.getElementById("min_price_estimate_diff")
       .value,
+  });
+}
+
+async function refreshOffers() {
+  const refreshId = ++refreshCounter;
+  markers.clearLayers();
+  markers.addTo(map);
+  if (map.getZoom() < CLUSTER_MAX_ZOOM) {
+    await refreshClusters(refreshId);
+    return;
+  }
+  // only offers visible in current viewport are fetched
+  const bounds = map.getBounds();
+  query = {
+    ...getFilterQuery(),
+    min_lat: bounds.getSouth(),
+    max_lat: bounds.getNorth(),
+    min_lon: bounds.getWest(),
+    max_lon: bounds.getEast(),
+    sort_by: "price_estimate_diff",
+    descending: true,
+    limit: OFFERS_PAGE_SIZE,
+    format: "columnar",
   };
-  query = filterNullQueryParams(query);
   var url = new URL(API_URL + "/offers/");
   url.search = new URLSearchParams(query);
-  const data = await getData(url.toString());
-  updateOfferCount(data.length);
-  data.forEach(renderOffer);
-  markers.addTo(map);
+  let count = 0;
+  // offers are paginated, follow cursors until the last page
+  let cursor = null;
+  do {
+    if (cursor) {
+      url.searchParams.set("cursor", cursor);
+    }
+    const page = await getPage(url.toString());
+    if (refreshId !== refreshCounter) {
+      return;
+    }
+    count += page.data.length;
+    updateOfferCount(count);
+    page.data.forEach(renderOffer);
+    cursor = page.nextCursor;
+  } while (cursor);
+}
+
+function lonToTileX(lon, zoom) {
+  return Math.floor(((lon + 180) / 360) * 2 ** zoom);
+}
+
+function latToTileY(lat, zoom) {
+  const rad = (lat * Math.PI) / 180;
+  return Math.floor(
+    ((1 - Math.log(Math.tan(rad) + 1 / Math.cos(rad)) / Math.PI) / 2) * 2 ** zoom
+  );
+}
+
+async function refreshClusters(refreshId) {
+  const zoom = map.getZoom();
+  const bounds = map.getBounds();
+  const maxTile = 2 ** zoom - 1;
+  const clamp = (tile) => Math.min(Math.max(tile, 0), maxTile);
+  const minX = clamp(lonToTileX(bounds.getWest(), zoom));
+  const maxX = clamp(lonToTileX(bounds.getEast(), zoom));
+  const minY = clamp(latToTileY(bounds.getNorth(), zoom));
+  const maxY = clamp(latToTileY(bounds.getSouth(), zoom));
+  const search = new URLSearchParams(getFilterQuery()).toString();
+
+  let requests = [];
+  for (let x = minX; x <= maxX; x++) {
+    for (let y = minY; y <= maxY; y++) {
+      requests.push(getData(`${API_URL}/clusters/${zoom}/${x}/${y}?${search}`));
+    }
+  }
+  const tiles = await Promise.all(requests);
+  if (refreshId !== refreshCounter) {
+    return;
+  }
+  let count = 0;
+  tiles.flat().forEach((cluster) => {
+    count += cluster.count;
+    renderCluster(cluster);
+  });
+  updateOfferCount(count);
+}
+
+function renderCluster(cluster) {
+  marker = L.circleMarker([cluster.lat, cluster.lon], {
+    color: "#f38181",
+    radius: Math.min(7 + Math.log2(cluster.count) * 2, 30),
+    fillOpacity: 0.7,
+  }).bindPopup(getClusterHtml(cluster));
+  markers.addLayer(marker);
+}
+
+function getClusterHtml(cluster) {
+  return `
+  <table class="table table-hover">
+    <tbody>
+      <tr>
+        <td>Liczba ofert:</td>
+        <td><strong>${cluster.count}</strong></td>
+      </tr>
+      <tr>
+        <td>Najlepsza różnica:</td>
+        <td><strong>${roundLargeToThousands(
+          cluster.max_price_estimate_diff
+        )} zł</strong></td>
+      </tr>
+      <tr>
+        <td>Mediana różnicy:</td>
+        <td><strong>${roundLargeToThousands(
+          cluster.median_price_estimate_diff
+        )} zł</strong></td>
+      </tr>
+    </tbody>
+  </table>
+  Przybliż mapę, aby zobaczyć oferty.
+  `;
 }
 
 async function Valuate() {
@@ -179,4 +317,5 @@ async function Valuate() {
 }
 
 
+map.on("moveend", refreshOffers);
 refreshOffers();
@@ -0,0 +1,91 @@
+#!/usr/bin/env python3
+"""
+Compare deriving amenities flag columns (conviniences, media, equipment)
+with one first_match regex pass per derived column (previous
+implementation) against a single match_keywords scan per value.
+Both are run on all rows of the column, without deduplication of values.
+
+Run from src directory with `python3 -m benchmarks.amenities`.
+
+Usage:
+    amenities [--rows=<n>]
+
+Options:
+    --rows=<n>  Number of rows resampled from the test fixture [default: 100000]
+"""
+import logging
+import time
+
+from docopt import docopt
+
+import columns as c
+from benchmarks.cleaning_rules import get_raw_df
+from pipelines.process.cleaning_utils import contains, first_match, match_keywords
+
+NEGATABLE = {
+    c.BASEMENT: "piwnica",
+    c.TELECOM: "domofon",
+    c.DRIVEWAY: "podjazd",
+    c.FENCE: "ogrodzenie",
+}
+LACKING = {c.INTERNET: "internet", c.GAS: "gaz"}
+PRESENT = {c.WATER: "woda", c.ELECTRICITY: "prąd", c.SEWERS: "kanalizacja"}
+
+
+def conviniences_outputs():
+    outputs = {c.LIFT: ([(["brak windy"], 0), (["winda"], 1)], "no_info")}
+    for column, word in NEGATABLE.items():
+        outputs[column] = ([([f"{word} (nie)", f"{word} (brak)"], 0), ([word], 1)], "no_info")
+    return outputs
+
+
+def media_outputs():
+    outputs = {}
+    for column, word in LACKING.items():
+        outputs[column] = ([([f"{word} (brak"], 0), ([word], 1)], "no_info")
+    for column, word in PRESENT.items():
+        outputs[column] = ([([word], 1)], 0)
+    return outputs
+
+
+def equipment_outputs():
+    return {
+        c.FURNITURE: ([(["meble (nie)"], 0), (["meble"], 1)], "no_info"),
+        c.KITCHEN_FURNITURE: ([(["kuchnia umeblowana"], 1)], "no_info"),
+    }
+
+
+def multi_pass(value, outputs):
+    return {
+        column: first_match(
+            value,
+            [contains(*words) for words, _ in conditions],
+            [choice for _, choice in conditions],
+            default,
+        )
+        for column, (conditions, default) in outputs.items()
+    }
+
+
+def measure(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    args = docopt(__doc__)
+    logging.disable(logging.INFO)
+    n = int(args["--rows"])
+    df = get_raw_df(n).fillna("no_info")
+
+    print(f"{'column':>14} {'outputs':>8} {'multi pass rows/s':>18} {'single pass rows/s':>19}")
+    for column, outputs in (
+        (c.CONVINIENCES, conviniences_outputs()),
+        (c.MEDIA, media_outputs()),
+        (c.EQUIPMENT, equipment_outputs()),
+    ):
+        value = df[column].str.lower()
+        multi = n / measure(multi_pass, value, outputs)
+        single = n / measure(match_keywords, value, outputs)
+        print(f"{column.split('__')[0]:>14} {len(outputs):>8} {multi:18.0f} {single:19.0f}")
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+"""
+Compare finding newest file and files newer than a date by listing the
+directory and parsing all file names (previous implementation) with
+lookups in the catalog, both by a new client (reading whole catalog
+file) and by a client that already read it.
+
+Run from src directory with `python3 -m benchmarks.catalog_lookup`.
+
+Usage:
+    catalog_lookup [--files=<n>]
+
+Options:
+    --files=<n>  Number of files in directory [default: 5000]
+"""
+from datetime import datetime, timedelta
+import logging
+import os
+import tempfile
+import time
+
+import pandas as pd
+from docopt import docopt
+
+from fs_client import FsClient
+
+DIRECTORY = "flats-data/sale/raw"
+FIRST_DAY = datetime(2010, 1, 1, 10)
+REPEAT = 20
+
+
+def listing_newest(fs, from_date):
+    return fs.select_newest_file(fs.list_dir(DIRECTORY))
+
+
+def listing_newer(fs, from_date):
+    paths = [p for p in fs.list_dir(DIRECTORY) if fs.get_date_from_filename(p) > from_date]
+    return sorted(paths, key=fs.get_date_from_filename)
+
+
+def catalog_newest(fs, from_date):
+    return fs.get_newest_path(DIRECTORY)
+
+
+def catalog_newer(fs, from_date):
+    return fs.list_newer_than(DIRECTORY, from_date)
+
+
+def measure(fn, make_fs, from_date):
+    """ Best time of REPEAT runs in milliseconds. """
+    timings = []
+    for _ in range(REPEAT):
+        fs = make_fs()
+        start = time.perf_counter()
+        fn(fs, from_date)
+        timings.append(time.perf_counter() - start)
+    return min(timings) * 1000
+
+
+if __name__ == "__main__":
+    args = docopt(__doc__)
+    logging.disable(logging.INFO)
+    n = int(args["--files"])
+    from_date = FIRST_DAY + timedelta(days=n - 7)
+
+    with tempfile.TemporaryDirectory() as root:
+        os.makedirs(os.path.join(root, DIRECTORY))
+        fs = FsClient(root=root)
+        df = pd.DataFrame({"a": [1]})
+        for day in range(n):
+            fs.save_df(df, DIRECTORY + f"/raw_sale_{FIRST_DAY + timedelta(days=day):%Y_%m_%dT%H_%M_%S}.csv")
+
+        print(f"{n} files, milliseconds per lookup")
+        print(f"{'lookup':>8} {'listing':>9} {'catalog, new client':>20} {'catalog, read':>14}")
+        for name, listing, catalog in (("newest", listing_newest, catalog_newest), ("newer", listing_newer, catalog_newer)):
+            timings = (
+                measure(listing, lambda: fs, from_date),
+                measure(catalog, lambda: FsClient(root=root), from_date),
+                measure(catalog, lambda: fs, from_date),
+            )
+            print(f"{name:>8} {timings[0]:9.2f} {timings[1]:20.2f} {timings[2]:14.3f}")
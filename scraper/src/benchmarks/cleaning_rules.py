@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+"""
+Measure rows/second of every MorizonCleaner column rule (and of the whole
+clean) on raw rows resampled from the cleaning test fixture, without and
+with warm value cache. Batched clean is done the same way as in cleaning_task.
+
+Run from src directory with `python3 -m benchmarks.cleaning_rules`.
+
+Usage:
+    cleaning_rules [--rows=<n>]
+
+Options:
+    --rows=<n>  Number of rows to clean [default: 100000]
+"""
+import logging
+import time
+
+import pandas as pd
+from docopt import docopt
+
+from pipelines.process.cleaning_task import CHUNK_SIZE
+from pipelines.process.cleaning_utils import MorizonCleaner
+
+FIXTURE_PATH = "pipelines/tests/fixtures/raw_sale.csv"
+RULE_REPEAT = 5
+BATCHED_REPEAT = 3
+
+
+def get_raw_df(n):
+    df = pd.read_csv(FIXTURE_PATH)
+    return df.sample(n, replace=True, random_state=0).reset_index(drop=True)
+
+
+def clean_in_batches(df, value_cache):
+    for i in range(0, len(df), CHUNK_SIZE):
+        MorizonCleaner(df[i:i+CHUNK_SIZE], value_cache).clean()
+
+
+def measure(fn):
+    start = time.perf_counter()
+    fn()
+    return time.perf_counter() - start
+
+
+def measure_rule(df, value_cache, rule_name, column):
+    """ Best time of RULE_REPEAT runs, each on a new cleaner as rules modify its df """
+    timings = []
+    for _ in range(RULE_REPEAT):
+        rule = getattr(MorizonCleaner(df, value_cache), rule_name)
+        timings.append(measure(lambda: rule(column)))
+    return min(timings)
+
+
+if __name__ == "__main__":
+    args = docopt(__doc__)
+    logging.disable(logging.INFO)
+    n = int(args["--rows"])
+    df = get_raw_df(n)
+
+    print(f"{'rule':>20} {'rows/s':>12} {'cached rows/s':>14}")
+    warm_cache = {}
+    MorizonCleaner(df, warm_cache).clean()
+    for column, rule in MorizonCleaner(df).cleaning_map.items():
+        if callable(rule):
+            timings = []
+            for value_cache in ({}, warm_cache):
+                timings.append(n / measure_rule(df, value_cache, rule.__name__, column))
+            print(f"{rule.__name__:>20} {timings[0]:12.0f} {timings[1]:14.0f}")
+    timings = [n / measure(lambda: MorizonCleaner(df, cache).clean()) for cache in ({}, warm_cache)]
+    print(f"{'clean':>20} {timings[0]:12.0f} {timings[1]:14.0f}")
+    timings = [
+        n / min(measure(lambda: clean_in_batches(df, cache)) for _ in range(BATCHED_REPEAT))
+        for cache in (None, warm_cache)
+    ]
+    print(f"{'batched clean':>20} {timings[0]:12.0f} {timings[1]:14.0f}")
@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+"""
+Compare closest center lookup throughput: row-wise shapely `nearest_points`
+(previous implementation) against batch BallTree query.
+
+Run from src directory with `python3 -m benchmarks.coords_lookup`.
+
+Usage:
+    coords_lookup [--centers=<n>] [--legacy-max-rows=<n>] [ROWS...]
+
+Options:
+    --centers=<n>  Number of centers in synthetic coords map [default: 2000]
+    --legacy-max-rows=<n>  Skip shapely lookup above this size [default: 100000]
+Arguments:
+    ROWS  Number of synthetic offers per run (10000 100000 1000000 if omitted)
+"""
+import time
+
+import numpy as np
+import pandas as pd
+from docopt import docopt
+from shapely.geometry import MultiPoint, Point
+from shapely.ops import nearest_points
+
+import columns as c
+from pipelines.coords_index import CoordsIndex
+
+# rough bounding box of Poland
+LAT_RANGE = (49.0, 54.8)
+LON_RANGE = (14.1, 24.1)
+
+
+def random_coords(n, seed):
+    rng = np.random.RandomState(seed)
+    return pd.DataFrame({
+        c.LAT: rng.uniform(*LAT_RANGE, size=n),
+        c.LON: rng.uniform(*LON_RANGE, size=n),
+    })
+
+
+def legacy_lookup(df, coords_map):
+    multipoint = MultiPoint([Point(x, y) for x, y in zip(coords_map[c.LON], coords_map[c.LAT])])
+    points = [Point(x, y) for x, y in zip(df[c.LON], df[c.LAT])]
+    return [nearest_points(p, multipoint)[1] for p in points]
+
+
+def index_lookup(df, coords_map):
+    return CoordsIndex(coords_map).query(df[c.LON], df[c.LAT])
+
+
+def measure(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    args = docopt(__doc__)
+    sizes = [int(n) for n in args["ROWS"]] or [10_000, 100_000, 1_000_000]
+    legacy_max_rows = int(args["--legacy-max-rows"])
+    coords_map = random_coords(int(args["--centers"]), seed=0)
+
+    print(f"{'rows':>10} {'shapely rows/s':>16} {'index rows/s':>14}")
+    for n in sizes:
+        df = random_coords(n, seed=1)
+        index_s = measure(index_lookup, df, coords_map)
+        if n <= legacy_max_rows:
+            legacy = f"{n / measure(legacy_lookup, df, coords_map):16.0f}"
+        else:
+            legacy = f"{'skipped':>16}"
+        print(f"{n:>10} {legacy} {n / index_s:14.0f}")
@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Compare peak memory of adding coords features: float lat/lon merge with
+shapely point columns (previous implementation) against positional take.
+
+Run from src directory with `python3 -m benchmarks.features_memory`.
+
+Usage:
+    features_memory [--centers=<n>] [--rows=<n>]
+
+Options:
+    --centers=<n>  Number of centers in synthetic coords map [default: 2000]
+    --rows=<n>  Number of synthetic offers [default: 100000]
+"""
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from docopt import docopt
+
+import columns as c
+from benchmarks.coords_lookup import legacy_lookup, random_coords
+from pipelines.process.add_features import add_coords_factor_col, add_coords_features
+from pipelines.utils import add_point_col, unzip_point_to_lon_and_lat
+
+
+def legacy_add_coords_features(df, coords_map):
+    coords_map = add_point_col(coords_map)
+    df = add_point_col(df)
+    df["closest_center"] = legacy_lookup(df, coords_map)
+    df["lon1"] = df["closest_center"].map(lambda point: point.x)
+    df["lat1"] = df["closest_center"].map(lambda point: point.y)
+    df["lon2"] = df["point"].map(lambda point: point.x)
+    df["lat2"] = df["point"].map(lambda point: point.y)
+    df[c.CLUSTER_CENTER_DIST_KM] = 0.0
+    df = unzip_point_to_lon_and_lat(df, "closest_center")
+    center_colnames = ["unziped_lat_closest_center", "unziped_lon_closest_center"]
+    df = pd.merge(df, coords_map, left_on=center_colnames, right_on=[c.LAT, c.LON],
+                  how="left", suffixes=("", "duplicate"))
+    for col in df.columns:
+        if "duplicate" in col or col in center_colnames + ["point"]:
+            df = df.drop(col, axis=1)
+    return df.pipe(add_coords_factor_col)
+
+
+def get_coords_map(n):
+    rng = np.random.RandomState(2)
+    coords_map = random_coords(n, seed=0)
+    coords_map[c.CLUSTER_MEAN_PRICE_M2] = rng.uniform(4000, 15000, size=n)
+    coords_map[c.CLUSTER_MEAN_PRICE] = rng.uniform(200000, 900000, size=n)
+    coords_map[c.CLUSTER_ID] = np.arange(1, n + 1)
+    return coords_map
+
+
+def get_offers(n):
+    df = random_coords(n, seed=1)
+    # some width to resemble clean data
+    for i in range(20):
+        df[f"feature_{i}"] = np.arange(n, dtype=float)
+    return df
+
+
+def measure(fn, df, coords_map):
+    tracemalloc.start()
+    start = time.perf_counter()
+    fn(df, coords_map)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return peak / 2**20, elapsed
+
+
+if __name__ == "__main__":
+    args = docopt(__doc__)
+    coords_map = get_coords_map(int(args["--centers"]))
+    n = int(args["--rows"])
+    input_mb = get_offers(n).memory_usage(deep=True).sum() / 2**20
+    print(f"rows: {n}, input frame: {input_mb:.1f} MB")
+    for name, fn in (("merge", legacy_add_coords_features), ("take", add_coords_features)):
+        peak_mb, elapsed = measure(fn, get_offers(n), coords_map)
+        print(f"{name:>6}: peak {peak_mb:8.1f} MB, {elapsed:6.2f} s")
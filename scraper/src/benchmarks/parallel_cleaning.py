@@ -0,0 +1,52 @@
+#!/usr/bin/env python3
+"""
+Measure rows/second of batched cleaning done in the current process
+(as with --workers=1) and in pools of worker processes, on raw rows
+resampled from the cleaning test fixture. Every run starts with cold
+value cache.
+
+Run from src directory with `python3 -m benchmarks.parallel_cleaning`.
+
+Usage:
+    parallel_cleaning [--rows=<n>] [--workers=<n>...]
+
+Options:
+    --rows=<n>     Number of rows to clean [default: 100000]
+    --workers=<n>  Numbers of worker processes to compare [default: 2 4]
+"""
+import logging
+import os
+import time
+
+from docopt import docopt
+
+from benchmarks.cleaning_rules import get_raw_df
+from pipelines.process.cleaning_task import CHUNK_SIZE, clean_batches_in_parallel
+from pipelines.process.cleaning_utils import MorizonCleaner
+
+
+def clean_sequentially(batches, value_cache):
+    return [MorizonCleaner(batch, value_cache).clean() for batch in batches]
+
+
+def measure(fn, *args):
+    start = time.perf_counter()
+    fn(*args)
+    return time.perf_counter() - start
+
+
+if __name__ == "__main__":
+    args = docopt(__doc__)
+    logging.disable(logging.WARNING)
+    n = int(args["--rows"])
+    workers_counts = [int(w) for value in args["--workers"] for w in value.split()]
+    df = get_raw_df(n)
+    batches = [df[i:i+CHUNK_SIZE] for i in range(0, len(df), CHUNK_SIZE)]
+
+    print(f"cpus: {os.cpu_count()}")
+    print(f"{'workers':>8} {'rows/s':>10} {'speedup':>8}")
+    baseline = n / measure(clean_sequentially, batches, {})
+    print(f"{1:>8} {baseline:10.0f} {1:8.2f}")
+    for workers in workers_counts:
+        rows_per_second = n / measure(clean_batches_in_parallel, batches, {}, workers)
+        print(f"{workers:>8} {rows_per_second:10.0f} {rows_per_second / baseline:8.2f}")
@@ -0,0 +1,70 @@
+#!/usr/bin/env python3
+"""
+Compare time and peak memory of deduplicating a raw history of daily
+dumps (including building them, as they would be read) with drop_duplicates over all columns of the whole concatenation
+(previous implementation) and with key based, incremental concat_dfs.
+Every dump is a sliding window of offers built from the cleaning test
+fixture, offers stay listed for --offers/--new days and their view count
+changes once a week, so most rows repeat rows of previous dumps.
+
+Run from src directory with `python3 -m benchmarks.raw_dedup`.
+
+Usage:
+    raw_dedup [--days=<n>] [--offers=<n>] [--new=<n>]
+
+Options:
+    --days=<n>    Number of daily dumps [default: 90]
+    --offers=<n>  Number of offers in each dump [default: 5000]
+    --new=<n>     Number of new offers in each dump [default: 200]
+"""
+import logging
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from docopt import docopt
+
+import columns as c
+from benchmarks.cleaning_rules import FIXTURE_PATH
+from pipelines.process.cleaning_task import concat_dfs
+
+
+def iter_daily_dumps(raw_df, days, offers, new):
+    for day in range(days):
+        ids = np.arange(day * new, day * new + offers)
+        dump = raw_df.iloc[ids % len(raw_df)].reset_index(drop=True)
+        dump[c.OFFER_ID] = ["mzn" + str(i) for i in ids]
+        first_day = np.maximum((ids - offers) // new + 1, 0)
+        dump[c.VIEW_COUNT] = dump[c.VIEW_COUNT] + (day - first_day) // 7
+        yield dump
+
+
+def drop_duplicates_of_all(dfs):
+    dfs = list(dfs)
+    return pd.concat(dfs, keys=range(len(dfs)), sort=True).drop_duplicates(keep="last")
+
+
+def measure(fn, make_dfs):
+    """ Time and peak memory are measured in separate runs, as tracing slows down python code. """
+    start = time.perf_counter()
+    df = fn(make_dfs())
+    seconds = time.perf_counter() - start
+    tracemalloc.start()
+    fn(make_dfs())
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return len(df), seconds, peak / 1024 ** 2
+
+
+if __name__ == "__main__":
+    args = docopt(__doc__)
+    logging.disable(logging.INFO)
+    days, offers, new = int(args["--days"]), int(args["--offers"]), int(args["--new"])
+    raw_df = pd.read_csv(FIXTURE_PATH)
+
+    print(f"{days} dumps, {days * offers} rows")
+    print(f"{'dedup':>16} {'rows kept':>10} {'s':>8} {'peak MB':>8}")
+    for name, fn in (("all columns", drop_duplicates_of_all), ("keys, incremental", concat_dfs)):
+        rows, seconds, peak = measure(fn, lambda: iter_daily_dumps(raw_df, days, offers, new))
+        print(f"{name:>16} {rows:>10} {seconds:8.2f} {peak:8.0f}")
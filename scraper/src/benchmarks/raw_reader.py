@@ -0,0 +1,73 @@
+#!/usr/bin/env python3
+"""
+Compare reading a month of daily raw csv dumps for processing (all columns
+except COLUMNS_TO_SKIP) file after file with a header probe before every
+read (previous read_df), file after file with columns selected in a
+single pass, and with iter_dfs reading --prefetch files in threads with
+pandas c parser and with multithreaded pyarrow parser.
+Daily dumps are built as in raw_storage benchmark. Gains of threads
+depend on number of cores, which is printed.
+
+Run from src directory with `python3 -m benchmarks.raw_reader`.
+
+Usage:
+    raw_reader [--days=<n>] [--offers=<n>] [--desc-len=<n>] [--prefetch=<n>]
+
+Options:
+    --days=<n>      Number of daily dumps [default: 30]
+    --offers=<n>    Number of offers in each dump [default: 5000]
+    --desc-len=<n>  Length of offer description [default: 1000]
+    --prefetch=<n>  Number of files read at once [default: 4]
+"""
+import logging
+import os
+import tempfile
+
+import pandas as pd
+from docopt import docopt
+
+import columns as c
+import fs_client
+from benchmarks.cleaning_rules import FIXTURE_PATH
+from benchmarks.raw_dedup import iter_daily_dumps
+from benchmarks.raw_storage import NEW_OFFERS, measure, write_csv
+from fs_client import FsClient
+from pipelines.process.cleaning_task import COLUMNS_TO_SKIP
+from pipelines.raw_dataset import RAW_SCHEMA
+
+
+def read_with_probe(fs, paths):
+    rows = 0
+    for path in paths:
+        first_row = pd.read_csv(fs.get_read_path(path), nrows=1)
+        columns_to_select = [col for col in first_row.columns if col not in COLUMNS_TO_SKIP]
+        rows += len(pd.read_csv(fs.get_read_path(path), usecols=columns_to_select))
+    return rows
+
+
+def read_files(fs, paths, engine, prefetch):
+    fs_client.CSV_ENGINE = engine
+    return sum(len(df) for df in fs.iter_dfs(paths, COLUMNS_TO_SKIP, RAW_SCHEMA, prefetch=prefetch))
+
+
+if __name__ == "__main__":
+    args = docopt(__doc__)
+    logging.disable(logging.INFO)
+    days, offers, prefetch = int(args["--days"]), int(args["--offers"]), int(args["--prefetch"])
+    raw_df = pd.read_csv(FIXTURE_PATH)
+    raw_df[c.DESC] = (raw_df[c.TITLE] + " ") * (int(args["--desc-len"]) // raw_df[c.TITLE].str.len().max() + 1)
+
+    print(f"{days} dumps, {days * offers} rows, {os.cpu_count()} cores")
+    print(f"{'reader':>24} {'s':>8} {'rows':>8}")
+    with tempfile.TemporaryDirectory() as root:
+        fs = FsClient(root=root)
+        directory = write_csv(fs, iter_daily_dumps(raw_df, days, offers, NEW_OFFERS))
+        paths = sorted(fs.list_files(directory))
+        for name, read, *read_args in (
+            ("probe, sequential", read_with_probe),
+            ("single pass, sequential", read_files, "c", 1),
+            (f"c, prefetch {prefetch}", read_files, "c", prefetch),
+            (f"pyarrow, prefetch {prefetch}", read_files, "pyarrow", prefetch),
+        ):
+            seconds, rows = measure(read, fs, paths, *read_args)
+            print(f"{name:>24} {seconds:8.2f} {rows:>8}")
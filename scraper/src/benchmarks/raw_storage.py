@@ -0,0 +1,97 @@
+#!/usr/bin/env python3
+"""
+Compare raw history stored as csv files (previous format) with raw parquet
+dataset: time of writing it, size on disk and time of reading raw files
+for processing (all columns except COLUMNS_TO_SKIP) of the whole history
+and of the last --recent days only.
+Daily dumps are built as in raw_dedup benchmark, descriptions (skipped on
+read) are simulated with --desc-len characters of text.
+
+Run from src directory with `python3 -m benchmarks.raw_storage`.
+
+Usage:
+    raw_storage [--days=<n>] [--offers=<n>] [--recent=<n>] [--desc-len=<n>]
+
+Options:
+    --days=<n>      Number of daily dumps [default: 90]
+    --offers=<n>    Number of offers in each dump [default: 5000]
+    --recent=<n>    Number of last days read for processing [default: 7]
+    --desc-len=<n>  Length of offer description [default: 1000]
+"""
+from datetime import datetime, timedelta
+import logging
+import os
+import tempfile
+import time
+
+import pandas as pd
+from docopt import docopt
+
+import columns as c
+from benchmarks.cleaning_rules import FIXTURE_PATH
+from benchmarks.raw_dedup import iter_daily_dumps
+from common import RAW_DATA_PATH, RAW_DATASET_PATH
+from fs_client import FsClient
+from pipelines import raw_dataset
+from pipelines.process import cleaning_task
+
+FIRST_DAY = datetime(2021, 1, 1, 10)
+NEW_OFFERS = 200
+
+
+def write_csv(fs, dumps):
+    directory = RAW_DATA_PATH.format(data_type="sale")
+    os.makedirs(fs.get_full_path(directory))
+    for day, dump in enumerate(dumps):
+        fs.save_df(dump, directory + f"/raw_sale_{FIRST_DAY + timedelta(days=day):%Y_%m_%dT%H_%M_%S}.csv")
+    return directory
+
+
+def write_parquet(fs, dumps):
+    for day, dump in enumerate(dumps):
+        dt = FIRST_DAY + timedelta(days=day)
+        raw_dataset.save_raw_partition(dump, "sale", dt, f"raw_sale_{dt:%Y_%m_%dT%H_%M_%S}.parquet")
+    return RAW_DATASET_PATH
+
+
+def read_raw(storage_format, from_date):
+    cleaning_task.STORAGE_FORMAT = storage_format
+    paths = cleaning_task.get_raw_paths("sale", from_date)
+    return sum(len(df) for df in cleaning_task.iter_raw_dfs(paths))
+
+
+def get_size(directory):
+    return sum(
+        os.path.getsize(os.path.join(root, name))
+        for root, _, names in os.walk(directory)
+        for name in names
+    )
+
+
+def measure(fn, *args):
+    """ Returns seconds spent and result of fn. """
+    start = time.perf_counter()
+    result = fn(*args)
+    return time.perf_counter() - start, result
+
+
+if __name__ == "__main__":
+    args = docopt(__doc__)
+    logging.disable(logging.INFO)
+    days, offers, recent = int(args["--days"]), int(args["--offers"]), int(args["--recent"])
+    raw_df = pd.read_csv(FIXTURE_PATH)
+    raw_df[c.DESC] = (raw_df[c.TITLE] + " ") * (int(args["--desc-len"]) // raw_df[c.TITLE].str.len().max() + 1)
+    dumps = list(iter_daily_dumps(raw_df, days, offers, NEW_OFFERS))
+    recent_from = FIRST_DAY + timedelta(days=days - recent) - timedelta(hours=1)
+
+    print(f"{days} dumps, {days * offers} rows, reading last {recent} days")
+    print(f"{'format':>8} {'write s':>8} {'MB':>8} {'read all s':>11} {'read recent s':>14}")
+    with tempfile.TemporaryDirectory() as root:
+        # modules read raw data through their fs client
+        fs = raw_dataset.fs = cleaning_task.fs = FsClient(root=root)
+        for storage_format, write in (("csv", write_csv), ("parquet", write_parquet)):
+            write_seconds, directory = measure(write, fs, dumps)
+            size = get_size(fs.get_full_path(directory)) / 1024 ** 2
+            read_all, _ = measure(read_raw, storage_format, datetime(2000, 1, 1))
+            read_recent, _ = measure(read_raw, storage_format, recent_from)
+            print(f"{storage_format:>8} {write_seconds:8.2f} {size:8.1f} {read_all:11.2f} {read_recent:14.2f}")
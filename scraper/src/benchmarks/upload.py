@@ -0,0 +1,69 @@
+#!/usr/bin/env python3
+"""
+Compare offers/second of uploading offers one by one against bulk upload.
+Requires running server (and its database).
+
+Run from src directory with `python3 -m benchmarks.upload`.
+
+Usage:
+    upload [--server=<url>] [--rows=<n>]
+
+Options:
+    --server=<url>  Server base url [default: http://server:8000]
+    --rows=<n>  Number of synthetic offers per path [default: 5000]
+"""
+import time
+import uuid
+
+import numpy as np
+import pandas as pd
+import requests
+from docopt import docopt
+
+from pipelines.process import upload_to_db
+
+
+def get_offers(n):
+    rng = np.random.RandomState(0)
+    run_id = uuid.uuid4().hex[:8]
+    price = rng.uniform(200000, 900000, size=n)
+    size = rng.uniform(20, 120, size=n)
+    estimate = price * rng.uniform(0.8, 1.2, size=n)
+    return pd.DataFrame({
+        "url": [f"https://www.morizon.pl/oferta/{i}" for i in range(n)],
+        "added": "2021-01-22",
+        "title": "Mieszkanie, Warszawa",
+        "size": size,
+        "price": price,
+        "estimate": estimate,
+        "price_m2": price / size,
+        "lon": rng.uniform(14.1, 24.1, size=n),
+        "lat": rng.uniform(49.0, 54.8, size=n),
+        "offer_id": [f"bench-{run_id}-{i}" for i in range(n)],
+        "offer_type": "sale",
+        "price_estimate_diff": estimate - price,
+    })
+
+
+def upload_one_by_one(df, server):
+    url = f"{server}/api/v1/offers/"
+    headers = {'Content-type': 'application/json'}
+    for ix in df.index:
+        requests.post(url, headers=headers, data=df.loc[ix].to_json())
+
+
+def upload_bulk(df, server):
+    upload_to_db.URL = f"{server}/api/v1/offers/bulk"
+    with requests.Session() as session:
+        for i in range(0, len(df), upload_to_db.UPLOAD_BATCH_SIZE):
+            upload_to_db.upload_batch(session, df.iloc[i:i+upload_to_db.UPLOAD_BATCH_SIZE])
+
+
+if __name__ == "__main__":
+    args = docopt(__doc__)
+    n = int(args["--rows"])
+    for name, fn in (("one by one", upload_one_by_one), ("bulk", upload_bulk)):
+        df = get_offers(n)
+        start = time.perf_counter()
+        fn(df, args["--server"])
+        print(f"{name:>10}: {n / (time.perf_counter() - start):10.0f} offers/s")
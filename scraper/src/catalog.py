@@ -0,0 +1,116 @@
+"""
+Append-only catalog of files of a bucket, kept as json lines in
+`<bucket>/_catalog.jsonl` (in an object per writing client on S3, see
+S3FsClient.append_catalog). FsClient adds an entry (path, date from file
+name, size, mtime, content hash, rows and schema hash of dataframes) for
+every file it saves, so finding newest file of a directory or files newer
+than a date does not list and parse names of all its files.
+Later entries of the same path replace earlier ones. Directory is indexed
+again when it changed later than any of its entries (see
+FsClient.get_directory_version), so files added or removed not by
+FsClient are found too.
+"""
+import bisect
+import hashlib
+import json
+import logging
+import os
+
+log = logging.getLogger(__name__)
+
+CATALOG_NAME = "_catalog.jsonl"
+
+
+class Catalog:
+    def __init__(self, path, fs):
+        self.path = path
+        # client catalog file is read and appended with
+        self.fs = fs
+        # last entry of each path
+        self.entries = {}
+        # directory -> (sorted timestamps, paths) of its files with date in name
+        self.dated = {}
+        # directories with all files in catalog, see FsClient.index_directory
+        self.indexed = set()
+        # directory -> newest mtime of its entries or version it was indexed at
+        self.changed = {}
+        # bytes of each catalog file already read
+        self.offsets = {}
+
+    def refresh(self):
+        """ Read entries appended since last read, also by other processes. """
+        for part, size in self.fs.list_catalog_parts(self.path):
+            offset = self.offsets.get(part, 0)
+            if size is not None and size <= offset:
+                continue
+            data = self.fs.read_bytes(part, offset)
+            # last line can be still written
+            data = data[:data.rfind(b"\n") + 1]
+            self.offsets[part] = offset + len(data)
+            for line in data.splitlines():
+                self.add(json.loads(line))
+
+    def append(self, *entries):
+        self.fs.append_catalog(self.path, "".join(json.dumps(entry) + "\n" for entry in entries).encode())
+        self.refresh()
+
+    def add(self, entry):
+        if "indexed" in entry:
+            self.indexed.add(entry["indexed"])
+            self.update_changed(entry["indexed"], entry.get("version"))
+            return
+        path = entry["path"]
+        self.update_changed(os.path.dirname(path), entry.get("mtime"))
+        old = self.entries.pop(path, None)
+        if old is not None and old["timestamp"]:
+            timestamps, paths = self.dated[os.path.dirname(path)]
+            i = paths.index(path)
+            del timestamps[i], paths[i]
+        if entry.get("deleted"):
+            return
+        self.entries[path] = entry
+        if entry["timestamp"]:
+            timestamps, paths = self.dated.setdefault(os.path.dirname(path), ([], []))
+            i = bisect.bisect_right(timestamps, entry["timestamp"])
+            timestamps.insert(i, entry["timestamp"])
+            paths.insert(i, path)
+
+    def update_changed(self, directory, mtime):
+        if mtime is not None:
+            self.changed[directory] = max(self.changed.get(directory, mtime), mtime)
+
+    def get(self, path, refresh=True):
+        if refresh:
+            self.refresh()
+        return self.entries.get(path)
+
+    def is_indexed(self, directory, version=None):
+        """
+        Whether all files of directory are in catalog. Directory with version
+        (time of its last change) newer than all its entries is not.
+        """
+        self.refresh()
+        if directory not in self.indexed:
+            return False
+        return version is None or directory in self.changed and version <= self.changed[directory]
+
+    def list(self, directory):
+        """ Paths of all files of directory. """
+        self.refresh()
+        return [path for path in self.entries if os.path.dirname(path) == directory]
+
+    def newest(self, directory):
+        self.refresh()
+        _, paths = self.dated.get(directory, ([], []))
+        return paths[-1] if paths else None
+
+    def newer_than(self, directory, date):
+        """ Paths of files with date in name after date, oldest first. """
+        self.refresh()
+        timestamps, paths = self.dated.get(directory, ([], []))
+        return paths[bisect.bisect_right(timestamps, date.isoformat()):]
+
+
+def get_schema_hash(df):
+    schema = [[str(col), str(dtype)] for col, dtype in df.dtypes.items()]
+    return hashlib.sha1(json.dumps(schema).encode()).hexdigest()
@@ -0,0 +1,95 @@
+"""
+Compact types of columns of intermediate dataframes (clean, final,
+predicted, offers info), applied when they are read and before they are
+saved. A column gets its type only if no value changes: integer columns
+with missing values become float32 (exact for such small numbers), float
+columns stay float64 when any value (eg. price with cents or coordinate)
+does not fit in float32. Raw columns are not listed, cleaner maps their
+strings as they are read.
+"""
+import logging
+
+import numpy as np
+import pandas as pd
+
+import columns
+
+log = logging.getLogger(__name__)
+
+FLAG = "int8"
+# codes of categories mapped while cleaning
+CODE = "int8"
+
+COLUMN_TYPES = {
+    columns.BALCONY: FLAG,
+    columns.TARAS: FLAG,
+    columns.DIRECT: FLAG,
+    columns.WATER: FLAG,
+    columns.LIFT: FLAG,
+    columns.BASEMENT: FLAG,
+    columns.TELECOM: FLAG,
+    columns.DRIVEWAY: FLAG,
+    columns.FENCE: FLAG,
+    columns.FURNITURE: FLAG,
+    columns.KITCHEN_FURNITURE: FLAG,
+    columns.INTERNET: FLAG,
+    columns.GAS: FLAG,
+    columns.ELECTRICITY: FLAG,
+    columns.SEWERS: FLAG,
+    columns.MARKET_TYPE: CODE,
+    columns.BUILDING_TYPE: CODE,
+    columns.BUILDING_MATERIAL: CODE,
+    columns.FLAT_STATE: CODE,
+    columns.HEATING: CODE,
+    columns.FLOOR: "int16",
+    columns.FLOOR_N: "int16",
+    columns.BUILDING_HEIGHT: "int16",
+    columns.BUILDING_YEAR: "int16",
+    columns.ROOM_N: "int16",
+    columns.PARKING_SPOT: "int16",
+    columns.DESC_LEN: "int32",
+    columns.VIEW_COUNT: "int32",
+    columns.PROMOTION_COUNTER: "int32",
+    columns.PRICE: "float32",
+    columns.PRICE_M2: "float32",
+    columns.SIZE: "float32",
+    columns.LAT: "float32",
+    columns.LON: "float32",
+    columns.DATE_ADDED: "category",
+    columns.DATE_REFRESHED: "category",
+    columns.CLUSTER_ID: "int32",
+    columns.CLUSTER_MEAN_PRICE: "float32",
+    columns.CLUSTER_MEAN_PRICE_M2: "float32",
+    columns.CLUSTER_CENTER_DIST_KM: "float32",
+}
+
+
+def compact_df(df, name):
+    """ Cast columns of df to their compact types, logs memory used before and after. """
+    before = df.memory_usage(deep=True).sum()
+    df = df.assign(**{
+        col: compact_column(df[col], COLUMN_TYPES[col])
+        for col in df.columns
+        if col in COLUMN_TYPES
+    })
+    after = df.memory_usage(deep=True).sum()
+    log.info(f"Memory of {name} dataframe: {before / 1024 ** 2:.1f} MB before, {after / 1024 ** 2:.1f} MB after compacting.")
+    return df
+
+
+def compact_column(values, dtype):
+    """ Values cast to dtype, or unchanged values if cast would change any of them. """
+    if dtype == "category" or values.dtype == dtype:
+        return values.astype(dtype)
+    if not pd.api.types.is_numeric_dtype(values):
+        return values
+    if pd.api.types.is_integer_dtype(dtype) and values.isna().any():
+        dtype = "float32"
+    with np.errstate(invalid="ignore", over="ignore"):
+        compact = values.astype(dtype)
+    compact_values, original_values = compact.to_numpy("float64"), values.to_numpy("float64")
+    same = (compact_values == original_values) | (np.isnan(compact_values) & np.isnan(original_values))
+    if not same.all():
+        log.debug(f"Values of {values.name} do not fit in {dtype}, keeping {values.dtype}.")
+        return values
+    return compact
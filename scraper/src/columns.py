@@ -45,6 +45,8 @@ INTERNET = "internet__clean"
 GAS = "gas__clean"
 ELECTRICITY = "electricity__clean"
 SEWERS = "sewers__clean"
+# hash of raw offer fields, see pipelines.process.fingerprints
+ROW_HASH = "row_hash__clean"
 
 # FEATURE ENGINEERED COLUMNS
 CLUSTER_ID = "cluster_id__feature"
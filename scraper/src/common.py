@@ -6,7 +6,7 @@ import tempfile
 import columns
 import pandas as pd
 from scipy.spatial.distance import cdist
-from fs_client import FsClient
+from fs_client import get_fs_client
 
 logs_conf = {
     "level": logging.INFO,
@@ -17,12 +17,16 @@ logging.basicConfig(**logs_conf)
 logger = logging.getLogger('deps')
 logger.setLevel(logging.INFO)
 
-fs = FsClient()
+fs = get_fs_client()
 
 DATA_BUCKET = "flats-data"
 DATA_TYPES = ("sale", "rent")
 RAW_DATA_PATH = DATA_BUCKET + "/{data_type}/raw"
 FINAL_PATH = DATA_BUCKET + "/{data_type}/final"
+# raw files of all data types converted to parquet, see pipelines.raw_dataset
+RAW_DATASET_PATH = DATA_BUCKET + "/dataset/raw"
+# raw data read while processing, "csv" files or "parquet" dataset
+STORAGE_FORMAT = os.getenv("STORAGE_FORMAT", "csv")
 LOCAL_ROOT="/data"
 
 MODELS_BUCKET = "flats-models"
@@ -129,17 +133,15 @@ def get_process_from_date(data_type, last_date_of="raw"):
 
 
 def get_last_processing_date(data_type, last_date_of):
-    from fs_client import FsClient
-    fs = FsClient()
     if last_date_of == "raw":
-        paths = fs.list_dir(FINAL_PATH.format(data_type=data_type))
+        newest_path = fs.get_newest_path(FINAL_PATH.format(data_type=data_type))
     elif last_date_of == "final":
-        paths = fs.list_dir(RAW_DATA_PATH.format(data_type=data_type))
+        newest_path = fs.get_newest_path(RAW_DATA_PATH.format(data_type=data_type))
 
-    if not paths:
+    if not newest_path:
         return datetime(2000, 1, 1)
     else:
-        return select_newest_date(paths)
+        return get_date_from_filename(newest_path)
 
 
 class InvalidExtensionException(Exception):
@@ -3,11 +3,17 @@
 Runs a series or one of tasks.
 
 Usage:
-    run.sh TASK OFFER_TYPE [--use-remote] [--from-date=<date>]
+    run.sh TASK OFFER_TYPE [--use-remote] [--from-date=<date>] [--workers=<n>] [--stream [--overlap]] [--force-stage=<stage>] [--storage-format=<format>] [--fs-backend=<backend>]
 
 Options:
     --use-remote  Use remote connection, not local minio instance
+    --fs-backend BACKEND  Where data is kept, local (under /data) or s3 [default: local]
     --from-date DATE  Only consider files newer than specified date
+    --workers N  Number of processes cleaning data, 0 for one per cpu [default: 1]
+    --stream  Process data in batches passed through all stages
+    --overlap  Run streamed stages in separate threads
+    --force-stage STAGE  Run process stage and all after it even if their inputs did not change
+    --storage-format FORMAT  Raw data read by process and written by scrape, csv or parquet [default: csv]
 Arguments:
     TASK  name of the task to be executed.
     OFFER_TYPE for which offer type processing should be executed (rent/sale)
@@ -15,7 +21,13 @@ Arguments:
 Examples:
     run.sh scrape sale
     run.sh process sale --use-remote
+    run.sh process sale --workers=0
+    run.sh process sale --stream --overlap
+    run.sh process sale --force-stage=model_apply
     run.sh scrape rent --from-date="2020-01-01"
+    run.sh migrate-raw sale
+    run.sh process sale --storage-format=parquet
+    run.sh process sale --fs-backend=s3 --use-remote
 
 Tasks available:
 {tasks}
@@ -36,9 +48,14 @@ TASK_FUNCTIONS = {
     # on demand
     "coord-map": "from pipelines.on_demand.coords_map_task import coords_map_task; coords_map_task('{offer_type}')",
     "unify-raw": "from pipelines.on_demand.unify_raw_task import unify_raw_data_task; unify_raw_data_task('{offer_type}')",
+    # convert raw csv files to parquet dataset
+    "migrate-raw": "from pipelines.on_demand.migrate_raw_task import migrate_raw_task; migrate_raw_task('{offer_type}')",
     #"monitor": "from pipelines.on_demand.monitor import monitor; monitor('{offer_type}')",
 }
 
+# minio container in flats network
+LOCAL_S3_ENDPOINT_URL = "http://minio:9000"
+
 def run_command(task_function: str, offer_type: str = None):
     if offer_type:
         task_function = task_function.format(offer_type=offer_type)
@@ -63,6 +80,13 @@ if __name__ == "__main__":
 
     if not args['--use-remote']:
         os.environ["USE_MINIO"] = 'true'
+        os.environ.setdefault("S3_ENDPOINT_URL", LOCAL_S3_ENDPOINT_URL)
+
+    fs_backend = args['--fs-backend']
+    if fs_backend not in ('local', 's3'):
+        print(f'Invalid fs backend ({fs_backend}).')
+        exit(0)
+    os.environ["FS_BACKEND"] = fs_backend
 
     from_date_str = args.get('--from-date')
     if from_date_str:
@@ -71,5 +95,24 @@ if __name__ == "__main__":
         elif task == "process":
             os.environ["LAST_FINAL_DATE"] = from_date_str
 
+    workers = args.get('--workers')
+    if not workers.isdigit():
+        print(f'Invalid number of workers ({workers}).')
+        exit(0)
+    os.environ["CLEANING_WORKERS"] = workers
+
+    if args['--stream']:
+        os.environ["PROCESS_STREAM"] = 'true'
+    if args['--overlap']:
+        os.environ["PROCESS_OVERLAP"] = 'true'
+    if args['--force-stage']:
+        os.environ["FORCE_STAGE"] = args['--force-stage']
+
+    storage_format = args['--storage-format']
+    if storage_format not in ('csv', 'parquet'):
+        print(f'Invalid storage format ({storage_format}).')
+        exit(0)
+    os.environ["STORAGE_FORMAT"] = storage_format
+
     task_fn = TASK_FUNCTIONS[task]
     run_command(task_fn, offer_type=offer_type)
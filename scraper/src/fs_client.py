@@ -1,16 +1,114 @@
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+import csv
 from datetime import datetime
+import hashlib
 from joblib import dump, load
 import logging
 import os
+import shutil
+import threading
+import uuid
 
+import boto3
 import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+import pyarrow.parquet as pq
+from boto3.s3.transfer import TransferConfig
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+from catalog import CATALOG_NAME, Catalog, get_schema_hash
 
 log = logging.getLogger(__name__)
 
+# bytes read at once while hashing files
+HASH_CHUNK_SIZE = 1024 * 1024
+# parser of csv files read with schema, "c" (pandas) or "pyarrow" (multithreaded)
+CSV_ENGINE = os.getenv("CSV_ENGINE", "c")
+# number of files read ahead (in threads) by iter_dfs
+READ_PREFETCH = int(os.getenv("READ_PREFETCH", "4"))
+# "local" for files under /data or "s3" for S3 compatible storage (minio unless run with --use-remote)
+FS_BACKEND = os.getenv("FS_BACKEND", "local")
+# None means AWS
+S3_ENDPOINT_URL = os.getenv("S3_ENDPOINT_URL") or None
+# local copies of files read from or written to S3
+S3_CACHE_DIR = os.getenv("S3_CACHE_DIR", "/data/s3_cache")
+# least recently used files are removed from cache above that size
+S3_CACHE_MAX_BYTES = int(os.getenv("S3_CACHE_MAX_BYTES", str(5 * 1024 ** 3)))
+# files bigger than that are transferred in parts of that size
+S3_MULTIPART_CHUNK_SIZE = 8 * 1024 * 1024
+# parts transferred at once, also size of connection pool
+S3_MAX_CONCURRENCY = int(os.getenv("S3_MAX_CONCURRENCY", "10"))
+
+# s3 client of each endpoint, see get_s3_client
+_s3_clients = {}
+_s3_clients_lock = threading.Lock()
+
+
+def hash_file(full_path):
+    content_hash = hashlib.sha1()
+    with open(full_path, "rb") as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+            content_hash.update(chunk)
+    return content_hash.hexdigest()
+
+
+def read_csv_with_arrow(full_path, columns_to_skip, schema):
+    """
+    Read csv file with multithreaded pyarrow parser, columns present in
+    schema get its types. Integer columns are inferred like by pandas, as
+    they are written as floats when they have missing values. Header is
+    read from the same open file to select columns.
+    """
+    with open(full_path, "rb") as f:
+        header = next(csv.reader([f.readline().decode()]))
+        f.seek(0)
+        column_types = {
+            field.name: field.type
+            for field in schema
+            if field.name in header and not pa.types.is_integer(field.type)
+        }
+        table = pa_csv.read_csv(
+            f,
+            parse_options=pa_csv.ParseOptions(newlines_in_values=True),
+            convert_options=pa_csv.ConvertOptions(
+                column_types=column_types,
+                include_columns=[col for col in header if col not in (columns_to_skip or ())],
+                strings_can_be_null=True,
+            ),
+        )
+    return table.to_pandas()
+
+
+def get_fs_client():
+    """ Client of backend selected with FS_BACKEND. """
+    if FS_BACKEND == "s3":
+        return S3FsClient()
+    return FsClient()
+
+
+def get_s3_client(endpoint_url=None):
+    """
+    S3 client shared by all S3FsClients of a process, so they reuse its
+    connections (clients are thread safe).
+    """
+    with _s3_clients_lock:
+        if endpoint_url not in _s3_clients:
+            _s3_clients[endpoint_url] = boto3.session.Session().client(
+                "s3",
+                endpoint_url=endpoint_url,
+                config=Config(max_pool_connections=S3_MAX_CONCURRENCY, retries={"max_attempts": 5}),
+            )
+        return _s3_clients[endpoint_url]
+
 
 class FsClient:
     def __init__(self, root="/data"):
         self.root = root
+        # catalog of each bucket, see get_catalog
+        self.catalogs = {}
         log.info(f"Will use local filesystem as data backend at {root}")
 
     def get_full_path(self, path):
@@ -24,20 +122,241 @@ class FsClient:
             return None
         return files
 
-    def save_df(self, df, path):
+    def list_files(self, directory):
+        """ Size and modification time of each file (not directory) of directory. """
+        return {
+            path: self.stat(path)
+            for path in self.list_dir(directory) or []
+            if os.path.isfile(self.get_full_path(path))
+        }
+
+    def exists(self, path):
+        return os.path.exists(self.get_full_path(path))
+
+    def stat(self, path):
+        """ Size and modification time of file. """
+        stat = os.stat(self.get_full_path(path))
+        return stat.st_size, stat.st_mtime
+
+    def get_read_path(self, path):
+        """ Local path file can be read from. """
+        return self.get_full_path(path)
+
+    def get_write_path(self, path):
+        """ Local path file should be written to, before put. """
+        return self.get_full_path(path)
+
+    def put(self, path):
+        """ Called after file was written to its full path, see S3FsClient. """
+
+    def read_bytes(self, path, start=0):
+        """ Content of file from start byte, empty if there is no such file. """
+        full_path = self.get_full_path(path)
+        if not os.path.exists(full_path):
+            return b""
+        with open(full_path, "rb") as f:
+            f.seek(start)
+            return f.read()
+
+    def list_catalog_parts(self, path):
+        """ Files catalog at path is kept in, with their sizes (None if not known). """
+        return [(path, None)]
+
+    def append_catalog(self, path, data):
+        with open(self.get_full_path(path), "ab") as f:
+            f.write(data)
+
+    def get_hash(self, path):
+        """ Hash of file content, taken from catalog if file did not change since it was hashed. """
+        entry = self.get_catalog(path).get(path)
+        if entry is not None and entry["content_hash"] and self.is_unchanged(path, entry):
+            return entry["content_hash"]
+        content_hash = hash_file(self.get_read_path(path))
+        if entry is not None and self.is_unchanged(path, entry):
+            self.record(path, entry["rows"], entry["schema_hash"], content_hash)
+        else:
+            self.record(path, content_hash=content_hash)
+        return content_hash
+
+    def get_catalog(self, path):
+        """ Catalog of bucket (first directory) of path. """
+        bucket = path.split("/")[0]
+        if bucket not in self.catalogs:
+            self.catalogs[bucket] = Catalog(f"{bucket}/{CATALOG_NAME}", self)
+        return self.catalogs[bucket]
+
+    def record(self, path, rows=None, schema_hash=None, content_hash=None):
+        """ Add file (saved or changed) to catalog. """
+        self.get_catalog(path).append(self.get_entry(path, rows, schema_hash, content_hash))
+
+    def get_entry(self, path, rows=None, schema_hash=None, content_hash=None, stat=None):
+        size, mtime = stat or self.stat(path)
+        date = self.get_date_from_filename(path.split("/")[-1], warn=False)
+        return {
+            "path": path,
+            "timestamp": date.isoformat() if date else None,
+            "bytes": size,
+            "mtime": mtime,
+            "content_hash": content_hash,
+            "rows": rows,
+            "schema_hash": schema_hash,
+        }
+
+    def is_unchanged(self, path, entry, stat=None):
+        return tuple(stat or self.stat(path)) == (entry["bytes"], entry["mtime"])
+
+    def index_directory(self, directory):
+        """
+        Bring catalog of directory up to date with its files, for files not
+        saved by FsClient (eg. written before catalog existed).
+        """
+        catalog = self.get_catalog(directory)
+        if not self.exists(directory):
+            log.info(f"{directory} does not exist, nothing to index")
+            return
+        # taken before listing, so files added meanwhile are indexed next time
+        version = self.get_directory_version(directory)
+        stats = self.list_files(directory)
+        log.info(f"Indexing {len(stats)} files of {directory}")
+        entries = []
+        paths = catalog.list(directory)
+        for path, stat in stats.items():
+            entry = catalog.get(path, refresh=False)
+            if entry is None or not self.is_unchanged(path, entry, stat):
+                entries.append(self.get_entry(path, stat=stat))
+        for path in set(paths) - set(stats):
+            entries.append({"path": path, "deleted": True})
+        # appended at once, so they are uploaded once by remote backends
+        catalog.append(*entries, {"indexed": directory, "version": version})
+
+    def get_directory_version(self, directory):
+        """
+        Time of last file added to or removed from directory, also not by
+        FsClient (eg. model copied by hand). Files saved by FsClient are
+        recorded with mtime not older than that, so they do not make
+        catalog stale. None if directory does not exist.
+        """
+        full_path = self.get_full_path(directory)
+        return os.stat(full_path).st_mtime if os.path.isdir(full_path) else None
+
+    def get_indexed_catalog(self, directory):
+        catalog = self.get_catalog(directory)
+        if not catalog.is_indexed(directory, self.get_directory_version(directory)):
+            self.index_directory(directory)
+        return catalog
+
+    def get_newest_path(self, directory):
+        """ Path of file with newest date in name, None if there are no such files. """
+        newest_path = self.get_indexed_catalog(directory).newest(directory)
+        if newest_path is not None and not self.exists(newest_path):
+            log.info(f"{newest_path} was removed, indexing {directory} again")
+            self.index_directory(directory)
+            newest_path = self.get_catalog(directory).newest(directory)
+        return newest_path
+
+    def list_newer_than(self, directory, date):
+        """ Paths of files with date in name after date, oldest first. """
+        return self.get_indexed_catalog(directory).newer_than(directory, date)
+
+    def save_df(self, df, path, schema=None):
+        """ Save df as csv or parquet (depending on extension), schema is only used by parquet. """
         log.info(f"Saving {path}")
-        return df.to_csv(self.get_full_path(path), index=False)
+        full_path = self.get_write_path(path)
+        if path.split(".")[-1] == "parquet":
+            table = pa.Table.from_pandas(df, schema=schema, preserve_index=False)
+            pq.write_table(table, full_path)
+        else:
+            df.to_csv(full_path, index=False)
+        self.put(path)
+        self.record(path, len(df), get_schema_hash(df), hash_file(full_path))
+
+    def save_file(self, local_path, path):
+        """ Save copy of local file. """
+        log.info(f"Saving {local_path} as {path}")
+        full_path = self.get_write_path(path)
+        shutil.copyfile(local_path, full_path)
+        self.put(path)
+        self.record(path, content_hash=hash_file(full_path))
+
+    def save_to_dataset(self, df, directory, partition, name, schema=None):
+        """
+        Save df as file `name` of dataset in directory, within partition
+        directories (`key=value` for each item of partition dict).
+        """
+        partition_dir = directory + "".join(f"/{key}={value}" for key, value in partition.items())
+        os.makedirs(self.get_full_path(partition_dir), exist_ok=True)
+        path = f"{partition_dir}/{name}"
+        self.save_df(df, path, schema=schema)
+        return path
+
+    def list_dataset(self, directory, filters=None):
+        """
+        Paths of all files of dataset in directory. Partitions are pruned
+        without listing their files: filters maps partition key to function
+        called with partition value, partition is skipped if it returns False.
+        """
+        filters = filters or {}
+        if not self.exists(directory):
+            return []
+        paths = []
+        for path in self.list_dir(directory) or []:
+            name = path.split("/")[-1]
+            if "=" not in name:
+                paths.append(path)
+                continue
+            key, value = name.split("=", 1)
+            if key in filters and not filters[key](value):
+                continue
+            paths += self.list_dataset(path, filters)
+        return paths
+
+    def append_df(self, df, path):
+        """ Append rows to csv file, header is written only to a new file. """
+        for _ in self.append_dfs([df], path):
+            pass
+
+    def append_dfs(self, dfs, path):
+        """
+        Append rows of each of dfs to csv file and yield it. File is put
+        and recorded once, after the last of them (or when consumer stops),
+        so remote backends upload it once, not with every df appended.
+        """
+        header = not self.exists(path)
+        # for remote backends file is appended to its local copy
+        full_path = self.get_write_path(path) if header else self.get_read_path(path)
+        entry = None if header else self.get_catalog(path).get(path)
+        rows = 0 if entry is None else entry["rows"] or 0
+        schema_hash = None
+        try:
+            for df in dfs:
+                log.debug(f"Appending {len(df)} rows to {path}")
+                df.to_csv(full_path, mode="a", header=header, index=False)
+                header = False
+                rows += len(df)
+                schema_hash = get_schema_hash(df)
+                yield df
+        finally:
+            if schema_hash is not None:
+                self.put(path)
+                # file is hashed only when needed, see get_hash
+                self.record(path, rows, schema_hash)
 
     def save_df_with_timestamp(self, df, path, keyword, dtype, extension='csv'):
+        return self.save_df(df, self.get_timestamped_path(path, keyword, dtype, extension))
+
+    def get_timestamped_path(self, path, keyword, dtype, extension='csv'):
         """ Assumes s3 path in fomrat 'flats-data/{dtype}/clean'"""
         path = path.format(data_type=dtype)
         current_dt = datetime.now().strftime("%Y_%m_%dT%H_%M_%S")
-        path += f"/{dtype}_{keyword}_{current_dt}.{extension}"
-        return self.save_df(df, path)
+        return path + f"/{dtype}_{keyword}_{current_dt}.{extension}"
 
     def save_model(self, model, path):
         log.info(f"Saving {path}")
-        return dump(model, self.get_full_path(path), compress=3)
+        full_path = self.get_write_path(path)
+        dumped = dump(model, full_path, compress=3)
+        self.put(path)
+        self.record(path, content_hash=hash_file(full_path))
+        return dumped
 
     def save_model_with_timestamp(self, model, path, dtype, keyword):
         """ Assumes s3 path in format 'flats-models/{dtype}'"""
@@ -46,39 +365,62 @@ class FsClient:
         path += f"/{dtype}_{keyword}_{current_dt}.joblib"
         return self.upload_model(model, path)
 
-    def read_df(self, path, columns_to_skip=None):
+    def read_df(self, path, columns_to_skip=None, schema=None):
+        """ Schema (pyarrow) is used by parquet writer and by pyarrow CSV_ENGINE. """
         ext =path.split(".")[-1]
         log.info(f"Reading {path}")
+        if ext == "parquet" and columns_to_skip:
+            # only selected columns are read from parquet file
+            names = pq.read_schema(self.get_read_path(path)).names
+            columns_to_select = [c for c in names if c not in columns_to_skip]
+            return pq.read_table(self.get_read_path(path), columns=columns_to_select).to_pandas()
         if ext == "csv":
+            if schema is not None and CSV_ENGINE == "pyarrow":
+                return read_csv_with_arrow(self.get_read_path(path), columns_to_skip, schema)
             if columns_to_skip:
-                # try to sample
-                first_row =pd.read_csv(self.get_full_path(path), nrows=1)
-                columns_to_select = [c for c in first_row.columns if c not in columns_to_skip]
-                return pd.read_csv(self.get_full_path(path), usecols=columns_to_select)
-            return pd.read_csv(self.get_full_path(path))
+                # columns are selected while header is parsed
+                return pd.read_csv(self.get_read_path(path), usecols=lambda col: col not in columns_to_skip)
+            return pd.read_csv(self.get_read_path(path))
         elif ext == "parquet":
-            return pd.read_parquet(self.get_full_path(path))
+            return pd.read_parquet(self.get_read_path(path))
         else:
             raise Exception(f"Extension {ext} not handled.")
 
-
+    def iter_dfs(self, paths, columns_to_skip=None, schema=None, prefetch=READ_PREFETCH):
+        """
+        Read dfs of paths, yielding them in the same order. Up to prefetch
+        files after the one being yielded are read at once in threads.
+        """
+        if prefetch <= 1:
+            for path in paths:
+                yield self.read_df(path, columns_to_skip, schema)
+            return
+        paths = iter(paths)
+        with ThreadPoolExecutor(max_workers=prefetch) as executor:
+            reads = deque()
+            for path in paths:
+                reads.append(executor.submit(self.read_df, path, columns_to_skip, schema))
+                if len(reads) == prefetch:
+                    break
+            while reads:
+                df = reads.popleft().result()
+                path = next(paths, None)
+                if path is not None:
+                    reads.append(executor.submit(self.read_df, path, columns_to_skip, schema))
+                yield df
 
     def read_newest_df(self, directory, dtype):
-        directory = directory.format(data_type=dtype)
-        file_list = self.list_dir(directory)
-        newest_path = self.select_newest_file(file_list)
+        newest_path = self.get_newest_path(directory.format(data_type=dtype))
         if newest_path:
             return self.read_df(newest_path)
         else:
             return None
 
     def read_model(self, path):
-        return load(self.get_full_path(path))
+        return load(self.get_read_path(path))
 
     def read_newest_model(self, directory, dtype):
-        directory = directory.format(data_type=dtype)
-        file_list = self.list_dir(directory)
-        newest_path = self.select_newest_file(file_list)
+        newest_path = self.get_newest_path(directory.format(data_type=dtype))
         if newest_path:
             return self.read_model(newest_path)
         else:
@@ -99,10 +441,217 @@ class FsClient:
         return file_paths[max_pos]
 
 
-    def get_date_from_filename(self, filename):
+    def get_date_from_filename(self, filename, warn=True):
         date_numbers = "".join([x for x in filename if x.isdigit()])
         # make sure this is a valid datetime format used accross project
         if len(date_numbers) != 14:
-            log.warning(f"Not getting date from invalid file name: {filename}")
+            if warn:
+                log.warning(f"Not getting date from invalid file name: {filename}")
             return None
         return datetime.strptime(date_numbers, "%Y%m%d%H%M%S")
+
+
+class S3FsClient(FsClient):
+    """
+    Files kept in S3 compatible storage, first directory of path is its
+    bucket. Files are read from and written to local copies in cache_dir,
+    which are reused while their ETag matches the stored one and removed
+    (least recently used first) when cache grows above cache_max_bytes.
+    Files bigger than S3_MULTIPART_CHUNK_SIZE are uploaded and downloaded
+    in parts, S3_MAX_CONCURRENCY at once.
+    """
+    def __init__(
+        self,
+        cache_dir=S3_CACHE_DIR,
+        endpoint_url=S3_ENDPOINT_URL,
+        cache_max_bytes=S3_CACHE_MAX_BYTES,
+        chunk_size=S3_MULTIPART_CHUNK_SIZE,
+    ):
+        self.root = cache_dir
+        self.catalogs = {}
+        # directory -> its version, see get_directory_version
+        self.directory_versions = {}
+        # catalog path -> path and content of part this client writes, see append_catalog
+        self.catalog_parts = {}
+        self.started = datetime.utcnow()
+        self.client = get_s3_client(endpoint_url)
+        self.cache_max_bytes = cache_max_bytes
+        self.transfer_config = TransferConfig(
+            multipart_threshold=chunk_size,
+            multipart_chunksize=chunk_size,
+            max_concurrency=S3_MAX_CONCURRENCY,
+        )
+        log.info(f"Will use S3 ({endpoint_url or 'AWS'}) as data backend, cached at {cache_dir}")
+
+    def split_path(self, path):
+        """ Bucket and key of path. """
+        bucket, _, key = path.partition("/")
+        return bucket, key
+
+    def list_objects(self, directory):
+        """ Paths of subdirectories (with None) and files (with their object) of directory. """
+        bucket, prefix = self.split_path(directory)
+        for page in self.client.get_paginator("list_objects_v2").paginate(
+            Bucket=bucket, Prefix=prefix + "/", Delimiter="/"
+        ):
+            for common_prefix in page.get("CommonPrefixes", []):
+                yield f"{bucket}/{common_prefix['Prefix'].rstrip('/')}", None
+            for obj in page.get("Contents", []):
+                yield f"{bucket}/{obj['Key']}", obj
+
+    def list_dir(self, directory):
+        files = [path for path, _ in self.list_objects(directory)]
+        if not files:
+            log.info(f"Did not find any files in {directory}.")
+            return None
+        return files
+
+    def list_files(self, directory):
+        return {
+            path: (obj["Size"], obj["LastModified"].timestamp())
+            for path, obj in self.list_objects(directory)
+            if obj is not None
+        }
+
+    def get_directory_version(self, directory):
+        """
+        Objects have no parent to take time of change from, newest object of
+        directory is listed once per client, so objects uploaded not by
+        FsClient are found by the next run.
+        """
+        if directory not in self.directory_versions:
+            mtimes = [mtime for _, mtime in self.list_files(directory).values()]
+            self.directory_versions[directory] = max(mtimes, default=None)
+        return self.directory_versions[directory]
+
+    def head(self, path):
+        """ Object metadata, None if there is no such object. """
+        bucket, key = self.split_path(path)
+        try:
+            return self.client.head_object(Bucket=bucket, Key=key)
+        except ClientError as e:
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey"):
+                return None
+            raise
+
+    def exists(self, path):
+        if self.head(path) is not None:
+            return True
+        # directories exist as long as they have files
+        bucket, prefix = self.split_path(path)
+        return self.client.list_objects_v2(Bucket=bucket, Prefix=prefix + "/", MaxKeys=1)["KeyCount"] > 0
+
+    def stat(self, path):
+        head = self.head(path)
+        if head is None:
+            raise FileNotFoundError(path)
+        return head["ContentLength"], head["LastModified"].timestamp()
+
+    def get_read_path(self, path):
+        """ Local copy of file, downloaded unless cached copy is up to date. """
+        head = self.head(path)
+        if head is None:
+            raise FileNotFoundError(path)
+        full_path = self.get_full_path(path)
+        if os.path.exists(full_path) and self.read_cached_etag(full_path) == head["ETag"]:
+            # mark as recently used, see evict_cache
+            os.utime(full_path)
+            return full_path
+        log.info(f"Downloading {path} ({head['ContentLength']} bytes)")
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        bucket, key = self.split_path(path)
+        self.client.download_file(bucket, key, full_path, Config=self.transfer_config)
+        self.write_cached_etag(full_path, head["ETag"])
+        self.evict_cache(keep=full_path)
+        return full_path
+
+    def get_write_path(self, path):
+        full_path = self.get_full_path(path)
+        os.makedirs(os.path.dirname(full_path), exist_ok=True)
+        return full_path
+
+    def put(self, path):
+        """ Upload local copy of file. """
+        full_path = self.get_full_path(path)
+        log.info(f"Uploading {path} ({os.path.getsize(full_path)} bytes)")
+        bucket, key = self.split_path(path)
+        self.client.upload_file(full_path, bucket, key, Config=self.transfer_config)
+        self.write_cached_etag(full_path, self.head(path)["ETag"])
+        self.evict_cache(keep=full_path)
+
+    def read_bytes(self, path, start=0):
+        bucket, key = self.split_path(path)
+        try:
+            response = self.client.get_object(Bucket=bucket, Key=key, Range=f"bytes={start}-")
+        except ClientError as e:
+            # no such object or nothing after start
+            if e.response["Error"]["Code"] in ("404", "NoSuchKey", "416", "InvalidRange"):
+                return b""
+            raise
+        return response["Body"].read()
+
+    def list_catalog_parts(self, path):
+        """
+        Catalog object written before catalog parts, then parts in order
+        of their names (start of client that writes them).
+        """
+        bucket, key = self.split_path(path)
+        prefix = key.rsplit(".", 1)[0]
+        parts = []
+        for page in self.client.get_paginator("list_objects_v2").paginate(Bucket=bucket, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                if obj["Key"] == key or obj["Key"].startswith(prefix + "/"):
+                    parts.append((f"{bucket}/{obj['Key']}", obj["Size"]))
+        return parts
+
+    def append_catalog(self, path, data):
+        """
+        Objects cannot be appended to, and clients writing the same object
+        at once would overwrite entries of each other. Each client writes
+        its entries to its own part (`_catalog/<start>-<uuid>.jsonl`),
+        whole part is written again with every append.
+        """
+        if path not in self.catalog_parts:
+            bucket, key = self.split_path(path)
+            name = f"{self.started:%Y_%m_%dT%H_%M_%S_%f}-{uuid.uuid4().hex}.jsonl"
+            self.catalog_parts[path] = f"{bucket}/{key.rsplit('.', 1)[0]}/{name}", b""
+        part, written = self.catalog_parts[path]
+        bucket, key = self.split_path(part)
+        self.client.put_object(Bucket=bucket, Key=key, Body=written + data)
+        self.catalog_parts[path] = part, written + data
+
+    def read_cached_etag(self, full_path):
+        etag_path = full_path + ".etag"
+        if not os.path.exists(etag_path):
+            return None
+        with open(etag_path) as f:
+            return f.read()
+
+    def write_cached_etag(self, full_path, etag):
+        with open(full_path + ".etag", "w") as f:
+            f.write(etag)
+
+    def evict_cache(self, keep=None):
+        """ Remove least recently used local copies (except keep) until cache is below cache_max_bytes. """
+        cached = []
+        for directory, _, names in os.walk(self.root):
+            for name in names:
+                if not name.endswith(".etag"):
+                    full_path = os.path.join(directory, name)
+                    try:
+                        stat = os.stat(full_path)
+                    except FileNotFoundError:
+                        # temporary file of download finished in other thread
+                        continue
+                    cached.append((stat.st_mtime, stat.st_size, full_path))
+        total = sum(size for _, size, _ in cached)
+        for _, size, full_path in sorted(cached):
+            if total <= self.cache_max_bytes:
+                break
+            if full_path == keep:
+                continue
+            log.debug(f"Evicting {full_path} from cache")
+            os.remove(full_path)
+            if os.path.exists(full_path + ".etag"):
+                os.remove(full_path + ".etag")
+            total -= size
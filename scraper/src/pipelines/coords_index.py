@@ -0,0 +1,29 @@
+"""
+Spatial index over coords encoding map centers.
+Allows to find closest center for a whole dataframe in one batch query.
+"""
+import numpy as np
+from sklearn.neighbors import BallTree
+
+import columns as c
+
+# keep in line with radius used in get_haversine_dist
+EARTH_RADIUS_KM = 6367
+
+
+class CoordsIndex:
+    def __init__(self, coords_map):
+        centers = coords_map[[c.LAT, c.LON]].to_numpy(dtype=float)
+        self.tree = BallTree(np.radians(centers), metric="haversine")
+
+    def query(self, lon, lat):
+        """
+        Find closest center for each of lon/lat pairs.
+        Returns positions of centers in coords map and distances (in km).
+        """
+        points = np.column_stack([
+            np.asarray(lat, dtype=float),
+            np.asarray(lon, dtype=float),
+        ])
+        dist, ind = self.tree.query(np.radians(points), k=1)
+        return ind[:, 0], np.round(dist[:, 0] * EARTH_RADIUS_KM, 3)
@@ -0,0 +1,38 @@
+import logging
+
+from common import RAW_DATA_PATH, fs
+from pipelines.raw_dataset import get_raw_dataset_paths, save_raw_partition
+from pipelines.utils import name_from_path
+
+log = logging.getLogger(__name__)
+
+
+def migrate_raw_task(data_type):
+    """
+    Convert raw csv files of data_type to raw parquet dataset. Files
+    already converted are skipped, so it can be run again after scraping.
+    """
+    log.info(f"Starting raw files migration for {data_type} data.")
+    raw_paths = fs.list_dir(RAW_DATA_PATH.format(data_type=data_type)) or []
+    migrated = {name_from_path(path) for path in get_raw_dataset_paths(data_type)}
+    for i, path in enumerate(sorted(raw_paths)):
+        scrape_dt = fs.get_date_from_filename(path)
+        name = get_dataset_name(path)
+        if scrape_dt is None or name in migrated:
+            log.info(f"Skipping file {i+1}/{len(raw_paths)}: {path}")
+            continue
+        log.info(f"Migrating file {i+1}/{len(raw_paths)}: {path}")
+        raw_df = fs.read_df(path)
+        dataset_path = save_raw_partition(raw_df, data_type, scrape_dt, name)
+        migrated_rows = len(fs.read_df(dataset_path))
+        if migrated_rows != len(raw_df):
+            raise MigrationError(f"{dataset_path} has {migrated_rows} rows, {path} has {len(raw_df)}")
+    log.info(f"Finished migrating raw files for {data_type} data.")
+
+
+def get_dataset_name(raw_path):
+    return name_from_path(raw_path).rsplit(".", 1)[0] + ".parquet"
+
+
+class MigrationError(Exception):
+    pass
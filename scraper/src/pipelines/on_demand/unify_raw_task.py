@@ -84,7 +84,7 @@ def is_structure_correct(raw_df):
 
 def fix_raw_df(raw_df):
     # if columns does not exist create it with empty values
-    get_column = lambda df, col: df.get(col, pd.Series(index=df.index, name=col))
+    get_column = lambda df, col: df.get(col, pd.Series(index=df.index, name=col, dtype="float64"))
     for col in RAW_COLUMNS:
         raw_df[col] = get_column(raw_df, col)
     for col in raw_df.columns:
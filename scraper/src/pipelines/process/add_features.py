@@ -6,8 +6,6 @@ import logging
 import pandas as pd
 import numpy as np
 from geopy.distance import great_circle
-from shapely.geometry import MultiPoint
-from shapely.ops import nearest_points
 
 import columns as c
 from common import (
@@ -16,7 +14,8 @@ from common import (
     COORDS_MAP_MODELS_PATH,
     fs,
 )
-from pipelines.utils import add_point_col, unzip_point_to_lon_and_lat, read_df, save_df
+from pipelines.coords_index import CoordsIndex
+from pipelines.utils import read_df, save_df
 
 log = logging.getLogger(__name__)
 
@@ -35,53 +34,24 @@ def features(data_type):
 def add_coords_features(df, coords_map):
     log.info("Adding coordinates features ...")
 
-    coords_map = add_point_col(coords_map)
-    coords_map_multipoint = MultiPoint(coords_map['point'])
-    df = add_point_col(df)
     log.info(f'Finding closest center for each flat ... (df.shape = {df.shape})')
-    df['closest_center'] = df.apply(
-        lambda row: nearest_points(row['point'], coords_map_multipoint)[1], axis=1)
-    df = add_distance_col(df)
-    # unzip points to two columns in map and df - merge on these two columns
-    df = unzip_point_to_lon_and_lat(df, 'closest_center')
-    center_colnames = ['unziped_lat_closest_center', 'unziped_lon_closest_center']
-
-    log.info(f'Shape before merging map: {df.shape}')
-    df = pd.merge(df,
-                  coords_map,
-                  left_on=center_colnames,
-                  right_on=[c.LAT, c.LON],
-                  how='left',
-                  suffixes=('', 'duplicate')
-                  )
-    log.info(f'Shape after merging map: {df.shape}')
-
-    for col in df.columns:
-        if 'duplicate' in col or col in center_colnames + ['point']:
-            df = df.drop(col, axis=1)
+    center_pos, center_dist = CoordsIndex(coords_map).query(df[c.LON], df[c.LAT])
+    df[c.CLUSTER_CENTER_DIST_KM] = center_dist
+    # take attributes of closest center by its position in coords map,
+    # columns already present in df (eg. lat/lon) are not overwritten
+    for col in coords_map.columns:
+        if col not in df.columns:
+            df[col] = coords_map[col].to_numpy()[center_pos]
 
     df = df.pipe(add_coords_factor_col)
 
-    cols_to_round = [c.CLUSTER_MEAN_PRICE_M2, c.CLUSTER_CENTER_DIST_KM]
-    df.loc[:,cols_to_round] = df.loc[:,cols_to_round].round(2)
+    for col in (c.CLUSTER_MEAN_PRICE_M2, c.CLUSTER_CENTER_DIST_KM):
+        df[col] = df[col].round(2)
 
     log.info(f'Output df.shape: {df.shape}')
     return df
 
 
-def add_distance_col(df):
-    log.info('Calculating distance between flats and "centers" ...')
-    df['lon1'] = df['closest_center'].map(lambda point: point.x)
-    df['lat1'] = df['closest_center'].map(lambda point: point.y)
-
-    df['lon2'] = df['point'].map(lambda point: point.x)
-    df['lat2'] = df['point'].map(lambda point: point.y)
-
-    df[c.CLUSTER_CENTER_DIST_KM] = get_haversine_dist(df['lon1'], df['lat1'], df['lon2'], df['lat2'])
-
-    return df
-
-
 def get_haversine_dist(lon1, lat1, lon2, lat2):
     """
     Calculate the great circle distance between two points
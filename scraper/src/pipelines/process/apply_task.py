@@ -31,18 +31,23 @@ def model_apply(data_type):
     final_df = read_df(LOCAL_ROOT, keyword='final', dtype=data_type)
 
     log.info(f'Applying model for {data_type}...')
-    if data_type == 'sale':
-        final_df = final_df.dropna(subset=SALE_MODEL_INPUTS)
-        final_df[columns.SALE_PRED] = get_predictions(model, final_df, SALE_MODEL_INPUTS)
-        final_df[columns.SALE_DIFF] = final_df[columns.PRICE_M2] - final_df[columns.SALE_PRED]
-    elif data_type == 'rent':
-        final_df = final_df.dropna(subset=RENT_MODEL_INPUTS)
-        final_df[columns.RENT_PRED] = get_predictions(model, final_df, RENT_MODEL_INPUTS)
-        final_df[columns.RENT_DIFF] = final_df[columns.PRICE_M2] - final_df[columns.RENT_PRED]
+    final_df = apply_model(final_df, model, data_type)
     save_df(final_df, LOCAL_ROOT, keyword='predicted', dtype=data_type)
     log.info(f"Successfully applied model for {data_type}.")
     log.info("Finished apply model pipeline.")
 
+def apply_model(df, model, data_type):
+    """ Add predictions to rows with all model inputs. """
+    if data_type == 'sale':
+        df = df.dropna(subset=SALE_MODEL_INPUTS)
+        df[columns.SALE_PRED] = get_predictions(model, df, SALE_MODEL_INPUTS)
+        df[columns.SALE_DIFF] = df[columns.PRICE_M2] - df[columns.SALE_PRED]
+    elif data_type == 'rent':
+        df = df.dropna(subset=RENT_MODEL_INPUTS)
+        df[columns.RENT_PRED] = get_predictions(model, df, RENT_MODEL_INPUTS)
+        df[columns.RENT_DIFF] = df[columns.PRICE_M2] - df[columns.RENT_PRED]
+    return df
+
 def get_predictions(model, df, input_cols):
     batches = [df[i:i+CHUNK_SIZE] for i in range(0, df.shape[0],CHUNK_SIZE)]
     predictions = []
@@ -3,19 +3,33 @@ Load concated data and output clean data (categorical variables mapped to
 numerical format). Does not drop any rows.
 """
 import datetime
+import hashlib
+import json
 import logging
+import multiprocessing
+import os
+import time
+from collections import ChainMap, defaultdict
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
 
+import numpy as np
 import pandas as pd
 
 import columns
 from common import (
+    CLEANING_REQUIRED_COLUMNS,
     RAW_DATA_PATH,
     LOCAL_ROOT,
+    STORAGE_FORMAT,
     select_newest_date,
     get_process_from_date,
     fs,
 )
-from pipelines.process.cleaning_utils import MorizonCleaner
+from fs_client import READ_PREFETCH
+from pipelines.process.cleaning_utils import CLEANER_VERSION, MorizonCleaner
+from pipelines.process.fingerprints import skip_unchanged_offers
+from pipelines.raw_dataset import RAW_SCHEMA, get_raw_dataset_paths
 from pipelines.utils import save_df
 
 log = logging.getLogger(__name__)
@@ -24,54 +38,325 @@ log = logging.getLogger(__name__)
 CHUNK_SIZE = 1000
 # skip concating memory heavy columns
 COLUMNS_TO_SKIP = (columns.DESC, columns.IMAGE_LINK)
+# already mapped raw values of each column, kept between runs
+VALUE_CACHE_PATH = LOCAL_ROOT + "/{data_type}_cleaning_cache.json"
+# cleaned output of each raw file, reused while raw file and cleaner are the same
+CLEAN_CACHE_PATH = LOCAL_ROOT + "/clean_cache/{data_type}"
+# cache entries not used for that long are removed
+CLEAN_CACHE_MAX_AGE = datetime.timedelta(days=30)
+# number of processes cleaning batches, 0 means one per cpu
+CLEANING_WORKERS = int(os.getenv("CLEANING_WORKERS", "1"))
+
+# batches and value cache of a worker process, set up by init_worker
+_worker_batches = None
+_worker_value_cache = None
 
 def clean(data_type):
+    """ Returns number of cleaned rows. """
     log.info("Starting data cleaning pipeline...")
-    clean_morizon_data(data_type)
+    cleaned_rows = clean_morizon_data(data_type)
     log.info(f"Successfully cleaned data for {data_type}.")
     log.info("Finished data cleaning pipeline.")
+    return cleaned_rows
 
 
 def clean_morizon_data(data_type):
     """
     Clean most current file from in_path directory
     for each spider. Save the output to out_path directory.
+    Raw files cleaned in previous runs are taken from clean cache,
+    offers which did not change since last upload are skipped.
     """
     from_date = get_process_from_date(data_type, last_date_of="final")
     log.info(f'Will concat raw files newer than {from_date}')
-    df = get_df_to_process(data_type, from_date)
-    batches = [df[i:i+CHUNK_SIZE] for i in range(0, df.shape[0],CHUNK_SIZE)]
+    raw_paths = get_raw_paths(data_type, from_date)
+    value_cache = read_value_cache(data_type)
+    cache_dir = CLEAN_CACHE_PATH.format(data_type=data_type)
+    cache_paths = []
+    # cleaning workers are forked, which is not safe while reader threads
+    # run (they can hold locks, eg. of logging handlers), so files are not
+    # read ahead then
+    prefetch = 1 if get_workers_count(CLEANING_WORKERS) > 1 else READ_PREFETCH
+    # raw files are read one by one, only rows kept by concat_dfs stay in memory
+    raw_dfs = cache_clean_dfs(
+        zip(raw_paths, iter_raw_dfs(raw_paths, prefetch)), value_cache, cache_dir, cache_paths
+    )
+    df = concat_dfs(raw_dfs).pipe(skip_unchanged_offers, data_type)
+    # cleaner drops url and title, they are merged back in prepare_final
+    save_df(get_offers_info(df), LOCAL_ROOT, keyword='offers_info', dtype=data_type)
+    # rows duplicated across raw files or unchanged were dropped from concatenated df
+    cleaned_df = read_kept_clean_rows(cache_paths, df.index)
+    save_value_cache(data_type, value_cache)
+    evict_clean_cache(cache_dir)
+
+    log.info(f'Before cleaning dataframe shape: {df.shape}')
+    log.info(f'Cleaned dataframe shape: {cleaned_df.shape}')
+    save_df(cleaned_df, LOCAL_ROOT, keyword='clean', dtype=data_type)
+    return cleaned_df.shape[0]
+
+
+def get_offers_info(df):
+    """ Url and title of each offer, taken from its last raw row. """
+    return df[[columns.OFFER_ID, columns.URL, columns.TITLE]].drop_duplicates(
+        subset=columns.OFFER_ID, keep="last"
+    )
+
+
+def cache_clean_dfs(raw_files, value_cache, cache_dir, cache_paths):
+    """
+    Clean every raw df of (path, raw df) pairs on its own, keeping its
+    index, and save the output in cache_dir. Raw dfs already found there
+    (same file name, content and CLEANER_VERSION) are not cleaned again.
+    Yields raw dfs once their output is cached and appends path of each
+    cache entry to cache_paths, see read_kept_clean_rows.
+
+    Raw files are cleaned in full, including rows which concat_dfs drops
+    as superseded and offers skipped as unchanged, as cache entry of a raw
+    file is reused by later runs, which keep other rows of it. Only one
+    raw file is cleaned at a time and its output is not kept in memory.
+    """
+    os.makedirs(cache_dir, exist_ok=True)
+    misses = 0
+    for raw_path, raw_df in raw_files:
+        cache_path = os.path.join(cache_dir, get_clean_cache_name(raw_path, raw_df))
+        if read_cached_clean_df(cache_path) is None:
+            misses += 1
+            clean_raw_df(raw_df, value_cache).to_pickle(cache_path)
+        cache_paths.append(cache_path)
+        yield raw_df
+    log.info(f"Clean cache: {len(cache_paths) - misses} hits, {misses} misses.")
+
+
+def clean_raw_df(raw_df, value_cache):
+    raw_df = add_missing_columns(raw_df)
+    batches = [raw_df[i:i+CHUNK_SIZE] for i in range(0, raw_df.shape[0], CHUNK_SIZE)]
+    # empty raw file has nothing to clean
+    if not batches:
+        return pd.DataFrame()
+    return pd.concat(clean_batches(batches, value_cache), sort=True)
+
+
+def add_missing_columns(raw_df):
+    """
+    Required columns missing from raw file are cleaned as empty, as they
+    used to be when concatenated raw dfs were cleaned.
+    """
+    missing_columns = [c for c in CLEANING_REQUIRED_COLUMNS if c not in raw_df.columns]
+    return raw_df.reindex(columns=[*raw_df.columns, *missing_columns])
+
+
+def read_kept_clean_rows(cache_paths, index):
+    """
+    Cleaned rows of concatenated raw df with given index (number of raw
+    file, index within it), read from cache entries of raw files one by one.
+    """
+    file_numbers = index.get_level_values(0)
+    kept_rows = index.get_level_values(1)
+    cleaned_dfs = []
+    for file_n, cache_path in enumerate(cache_paths):
+        cleaned = pd.read_pickle(cache_path)
+        cleaned_dfs.append(cleaned.loc[cleaned.index.isin(kept_rows[file_numbers == file_n])])
+    return pd.concat(cleaned_dfs, sort=True)
+
+
+def clean_batches(batches, value_cache):
+    workers = get_workers_count(CLEANING_WORKERS)
+    if workers > 1 and len(batches) > 1:
+        return clean_batches_in_parallel(batches, value_cache, workers)
     cleaned_dfs = []
     for batch_n, batch in enumerate(batches):
         log.info(f"Processing batch number {batch_n} ...")
-        clean_batch = MorizonCleaner(batch).clean()
+        clean_batch = MorizonCleaner(batch, value_cache).clean()
         cleaned_dfs.append(clean_batch)
-    cleaned_df = pd.concat(cleaned_dfs, sort=True)
+    return cleaned_dfs
 
-    log.info(f'Before cleaning dataframe shape: {df.shape}')
-    log.info(f'Cleaned dataframe shape: {cleaned_df.shape}')
-    save_df(cleaned_df, LOCAL_ROOT, keyword='clean', dtype=data_type)
 
+def get_clean_cache_name(raw_path, raw_df):
+    content_hash = hashlib.sha1(",".join(raw_df.columns).encode())
+    content_hash.update(pd.util.hash_pandas_object(raw_df).to_numpy().tobytes())
+    return f"{os.path.basename(raw_path)}.{content_hash.hexdigest()[:16]}.v{CLEANER_VERSION}.pkl"
 
 
+def read_cached_clean_df(cache_path):
+    if not os.path.exists(cache_path):
+        return None
+    try:
+        cleaned = pd.read_pickle(cache_path)
+    except Exception as e:
+        log.warning(f"Could not read clean cache entry {cache_path}: {e}")
+        return None
+    # mark entry as recently used, see evict_clean_cache
+    os.utime(cache_path)
+    return cleaned
 
-def get_df_to_process(data_type, from_date):
-    raw_paths = fs.list_dir(RAW_DATA_PATH.format(data_type=data_type))
-    raw_paths = [r for r in raw_paths if fs.get_date_from_filename(r) is not None]
-    raw_paths = [r for r in raw_paths if fs.get_date_from_filename(r) > from_date]
+
+def evict_clean_cache(cache_dir):
+    oldest_mtime = (datetime.datetime.now() - CLEAN_CACHE_MAX_AGE).timestamp()
+    evicted = 0
+    for name in os.listdir(cache_dir):
+        path = os.path.join(cache_dir, name)
+        if os.path.getmtime(path) < oldest_mtime:
+            os.remove(path)
+            evicted += 1
+    log.info(f"Evicted {evicted} clean cache entries not used for {CLEAN_CACHE_MAX_AGE.days} days.")
+
+
+def get_workers_count(workers):
+    if workers == 0:
+        return os.cpu_count() or 1
+    return workers
+
+
+def clean_batches_in_parallel(batches, value_cache, workers):
+    """
+    Clean batches in a pool of worker processes, returns cleaned batches
+    in the same order. Workers are forked, so they inherit batches instead
+    of receiving them pickled, only batch numbers are sent to them.
+    Value cache entries mapped by workers are merged into value_cache.
+    """
+    log.info(f"Cleaning {len(batches)} batches with {workers} worker processes...")
+    stats = defaultdict(lambda: {"batches": 0, "rows": 0, "seconds": 0.0})
+    cleaned_dfs = []
+    with ProcessPoolExecutor(
+        max_workers=workers,
+        mp_context=multiprocessing.get_context("fork"),
+        initializer=init_worker,
+        initargs=(batches, value_cache),
+    ) as executor:
+        for clean_batch, new_values, pid, rows, seconds in executor.map(
+            clean_batch_in_worker, range(len(batches))
+        ):
+            cleaned_dfs.append(clean_batch)
+            for column, values in new_values.items():
+                value_cache.setdefault(column, {}).update(values)
+            stats[pid]["batches"] += 1
+            stats[pid]["rows"] += rows
+            stats[pid]["seconds"] += seconds
+    for pid, worker_stats in sorted(stats.items()):
+        rows_per_second = worker_stats["rows"] / max(worker_stats["seconds"], 1e-9)
+        log.info(
+            f"Worker {pid} cleaned {worker_stats['rows']} rows in {worker_stats['batches']} batches"
+            f" ({rows_per_second:.0f} rows/s)."
+        )
+    return cleaned_dfs
+
+
+def init_worker(batches, value_cache):
+    global _worker_batches, _worker_value_cache
+    _worker_batches = batches
+    _worker_value_cache = value_cache
+
+
+def clean_batch_in_worker(batch_n):
+    """
+    Clean a single batch in a worker process. Returns cleaned batch, cache
+    entries mapped while cleaning it, worker pid, number of rows and time spent.
+    """
+    start = time.perf_counter()
+    batch = _worker_batches[batch_n]
+    log.info(f"Processing batch number {batch_n} ...")
+    # new entries land in first map of each chain, so they can be sent back
+    batch_cache = {
+        column: ChainMap({}, values) for column, values in _worker_value_cache.items()
+    }
+    clean_batch = MorizonCleaner(batch, batch_cache).clean()
+    new_values = {}
+    for column, values in batch_cache.items():
+        values = values.maps[0] if isinstance(values, ChainMap) else values
+        if values:
+            _worker_value_cache.setdefault(column, {}).update(values)
+            new_values[column] = values
+    return clean_batch, new_values, os.getpid(), len(batch), time.perf_counter() - start
+
+
+def read_value_cache(data_type):
+    path = VALUE_CACHE_PATH.format(data_type=data_type)
+    if not os.path.exists(path):
+        log.info("No cleaning value cache found, will map all values.")
+        return {}
+    with open(path) as f:
+        cache = json.load(f)
+    if cache["version"] != CLEANER_VERSION:
+        log.info(f"Cleaning value cache is outdated (version {cache['version']}), dropping it.")
+        return {}
+    sizes = {column: len(values) for column, values in cache["columns"].items()}
+    log.info(f"Read cleaning value cache with {sizes} values per column.")
+    return cache["columns"]
+
+
+def save_value_cache(data_type, value_cache):
+    path = VALUE_CACHE_PATH.format(data_type=data_type)
+    with open(path, "w") as f:
+        json.dump({"version": CLEANER_VERSION, "columns": value_cache}, f)
+    log.info(f"Saved cleaning value cache to {path}.")
+
+
+def get_raw_paths(data_type, from_date):
+    if STORAGE_FORMAT == "parquet":
+        raw_paths = get_raw_dataset_paths(data_type, from_date)
+    else:
+        # oldest first, as concat_dfs needs
+        raw_paths = fs.list_newer_than(RAW_DATA_PATH.format(data_type=data_type), from_date)
     log.info(f'Found {len(raw_paths)} raw files newer than {from_date}')
-    return concat_dfs(raw_paths)
+    return raw_paths
+
 
+def iter_raw_dfs(paths, prefetch=READ_PREFETCH):
+    return fs.iter_dfs(paths, columns_to_skip=COLUMNS_TO_SKIP, schema=RAW_SCHEMA, prefetch=prefetch)
 
-def concat_dfs(paths):
+
+def concat_dfs(dfs):
     """
-    Concat all files and drop all duplicates.
+    Concat all dfs (oldest first) and drop all duplicates, keeping last of
+    them. Rows are compared by their keys (see get_row_keys), rows of older
+    dfs superseded by a newer one are dropped as soon as it is read.
+    Index of the result is (number of df, index within that df).
     """
-    dfs = []
-    for path in paths:
-        df = fs.read_df(path, columns_to_skip=COLUMNS_TO_SKIP)
-        dfs.append(df)
-    concatinated_df = pd.concat(dfs, sort=True).drop_duplicates(keep="last")
+    kept_dfs, kept_keys = [], []
+    # key of each kept row -> number of df it is kept in
+    owners = {}
+    for df_n, df in enumerate(dfs):
+        keys = get_row_keys(df)
+        last = ~keys.duplicated(keep="last").to_numpy()
+        keys = keys[last]
+        superseded = defaultdict(list)
+        for key in keys.tolist():
+            old_n = owners.get(key)
+            if old_n is not None:
+                superseded[old_n].append(key)
+            owners[key] = df_n
+        for old_n, old_keys in superseded.items():
+            kept = ~kept_keys[old_n].isin(old_keys).to_numpy()
+            kept_dfs[old_n] = kept_dfs[old_n][kept]
+            kept_keys[old_n] = kept_keys[old_n][kept]
+        kept_dfs.append(df[last])
+        kept_keys.append(keys)
+    concatinated_df = pd.concat(kept_dfs, keys=range(len(kept_dfs)), sort=True)
     log.info("Successfully concatinated raw dfs.")
     log.info(f"shape: {concatinated_df.shape}")
     return concatinated_df
+
+
+def get_row_keys(df):
+    """
+    64 bit hash of offer id and all other values of each row. Rows equal
+    after concatenation with other dfs get the same key: numbers are hashed
+    as floats (int column of one file can be float in another) and missing
+    values are skipped (column can be missing from other file).
+    """
+    keys = np.zeros(len(df), dtype="uint64")
+    for col in df.columns:
+        values = df[col]
+        if pd.api.types.is_numeric_dtype(values):
+            values = values.astype("float64")
+        # only distinct values are hashed, missing ones get code -1
+        codes, uniques = pd.factorize(values)
+        unique_hashes = pd.util.hash_array(np.asarray(uniques), categorize=False)
+        unique_hashes = pd.util.hash_array(unique_hashes ^ hash_column_name(col))
+        keys += np.append(unique_hashes, np.uint64(0))[codes]
+    return pd.Series(keys, index=df.index)
+
+
+@lru_cache(maxsize=None)
+def hash_column_name(col):
+    return pd.util.hash_array(np.array([col], dtype=object))[0]
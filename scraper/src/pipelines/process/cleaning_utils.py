@@ -6,7 +6,9 @@ A lot of hardcoded column specific values are present in code below,
 as this is more of a configuration as code file.
 """
 from datetime import datetime
+from functools import lru_cache
 import logging
+import re
 
 import pandas as pd
 import numpy as np
@@ -45,14 +47,26 @@ MODE_MAP = {
     columns.LON: 21.0122286,
 }
 
+# bump whenever any mapping changes, so cached mapped values are dropped
+CLEANER_VERSION = 1
+# replacements of polish letters matching what unidecode does
+POLISH_TRANSLATION = str.maketrans("ąćęłńóśźżĄĆĘŁŃÓŚŹŻ", "acelnoszzACELNOSZZ")
+# what int() accepts as a string
+INT_PATTERN = r"\s*[+-]?\d+(?:_\d+)*\s*$"
+
 log = logging.getLogger(__name__)
 
 
 class MorizonCleaner(object):
-    def __init__(self, df):
-
+    def __init__(self, df, value_cache=None):
+        """
+        value_cache holds already mapped raw values per column
+        ({column: {raw value: mapped value}}), it is updated while cleaning
+        and can be reused across batches and runs (see CLEANER_VERSION).
+        """
         log.info("Initialized MorizonCleaner ...")
         self.df = df
+        self.value_cache = {} if value_cache is None else value_cache
         self.required_columns = CLEANING_REQUIRED_COLUMNS
 
         # verify columns match
@@ -129,18 +143,14 @@ class MorizonCleaner(object):
         concrete_slab = ["plyta", "płyta"]
 
         def mapping(value):
-            value = value.lower()
-            if value == "no_info":
-                return "no_info"
-            for b in brick:
-                if b in value:
-                    return "brick"
-            for c in concrete_slab:
-                if c in value:
-                    return "concrete_slab"
-            return "other"
-
-        self.df[column_name] = self.df[column_name].apply(mapping)
+            return first_match(
+                value.str.lower(),
+                [equals("no_info"), contains(*brick), contains(*concrete_slab)],
+                ["no_info", "brick", "concrete_slab"],
+                default="other",
+            )
+
+        self.df[column_name] = self.map_unique(column_name, mapping)
 
     def building_type(self, column_name):
         block = [
@@ -171,104 +181,69 @@ class MorizonCleaner(object):
         house = ["do", "niski", "wielo", "bliz"]
 
         def mapping(value):
-            value = unidecode.unidecode(str(value)).lower()
-            for b in block:
-                if b in value:
-                    return "block"
-            for h in hist:
-                if h in value:
-                    return "hist"
-            for a in apart:
-                if a in value:
-                    return "apart"
-            for h in house:
-                if h in value:
-                    return "house"
-            return "other"
-
-        self.df[column_name] = self.df[column_name].apply(mapping)
+            return first_match(
+                transliterate(value.astype(str)).str.lower(),
+                [contains(*block), contains(*hist), contains(*apart), contains(*house)],
+                ["block", "hist", "apart", "house"],
+                default="other",
+            )
+
+        self.df[column_name] = self.map_unique(column_name, mapping)
 
     def building_year(self, column_name):
-        self.df[column_name] = self.df[column_name].apply(
-            lambda x: x if type(x) in (float, int) else "no_info"
-        )
+        is_number = self.df[column_name].map(type).isin((float, int))
+        self.df[column_name] = self.df[column_name].where(is_number, "no_info").infer_objects()
 
     def conviniences(self, column_name):
-        def check_if_not(pol_word, string):
+        def check_if_not(pol_word):
             # Verify if parameter is negated
-            string = string.lower()
-            if f"{pol_word} (nie)" in string or f"{pol_word} (brak)" in string:
-                return 0
-            elif pol_word in string:
-                return 1
-            else:
-                return "no_info"
-
-        def create_lift(value):
-            value = value.lower()
-            if "brak windy" in value:
-                return 0
-            elif "winda" in value:
-                return 1
-            else:
-                return "no_info"
+            return (
+                [([f"{pol_word} (nie)", f"{pol_word} (brak)"], 0), ([pol_word], 1)],
+                "no_info",
+            )
 
         def create_parking(value):
-            value = value.lower()
             pol_park = "miejsce parkingowe"
-            if pol_park in value:
-                # find value in parenthesis following polpark
-                try:
-                    parens = value.split(pol_park + " (")[1].split(")")[0]
-                except IndexError:
-                    return 1
-                try:
-                    parking_n = int(parens)
-                except ValueError:
-                    try:
-                        parking_n = int(parens.split(",")[0])
-                    except ValueError:
-                        parking_n = 1
-                return parking_n
-            else:
-                return "no_info"
+            # value in parenthesis following first pol_park
+            parens = value.str.extract(f"{pol_park} \\(([^)]*)", expand=False)
+            before_comma = parens.str.split(",").str[0]
+            return select(
+                [
+                    ~value.str.contains(pol_park, regex=False, na=False),
+                    parens.isna(),
+                    is_int(parens),
+                    is_int(before_comma),
+                ],
+                ["no_info", 1, to_int(parens), to_int(before_comma)],
+                default=1,
+            )
 
-        self.df[columns.LIFT] = self.df[column_name].apply(create_lift)
-        self.df[columns.BASEMENT] = self.df[column_name].apply(
-            lambda v: check_if_not("piwnica", v)
-        )
-        self.df[columns.TELECOM] = self.df[column_name].apply(
-            lambda v: check_if_not("domofon", v)
-        )
-        self.df[columns.DRIVEWAY] = self.df[column_name].apply(
-            lambda v: check_if_not("podjazd", v)
-        )
-        self.df[columns.FENCE] = self.df[column_name].apply(
-            lambda v: check_if_not("ogrodzenie", v)
-        )
-        self.df[columns.PARKING_SPOT] = self.df[column_name].apply(create_parking)
+        def mapping(value):
+            value = value.str.lower()
+            flags = match_keywords(value, {
+                columns.LIFT: ([(["brak windy"], 0), (["winda"], 1)], "no_info"),
+                columns.BASEMENT: check_if_not("piwnica"),
+                columns.TELECOM: check_if_not("domofon"),
+                columns.DRIVEWAY: check_if_not("podjazd"),
+                columns.FENCE: check_if_not("ogrodzenie"),
+            })
+            flags[columns.PARKING_SPOT] = create_parking(value)
+            return flags
+
+        for new_column, values in self.map_unique(column_name, mapping).items():
+            self.df[new_column] = values
         self.df = self.df.drop(column_name, axis=1)
 
 
     def equipment(self, column_name):
-        def furniture(value):
-            value = value.lower()
-            if "meble (nie)" in value:
-                return 0
-            elif "meble" in value:
-                return 1
-            else:
-                return "no_info"
-
-        def kitchen_furniture(value):
-            value = value.lower()
-            if "kuchnia umeblowana" in value:
-                return 1
-            else:
-                return "no_info"
+        def mapping(value):
+            return match_keywords(value.str.lower(), {
+                columns.FURNITURE: ([(["meble (nie)"], 0), (["meble"], 1)], "no_info"),
+                columns.KITCHEN_FURNITURE: ([(["kuchnia umeblowana"], 1)], "no_info"),
+            })
 
-        self.df[columns.FURNITURE] = self.df[column_name].apply(furniture)
-        self.df[columns.KITCHEN_FURNITURE] = self.df[column_name].apply(kitchen_furniture)
+        for new_column, values in self.map_unique(column_name, mapping).items():
+            self.df[new_column] = values
         self.df = self.df.drop(column_name, axis=1)
 
     def flat_state(self, column_name):
@@ -305,122 +280,98 @@ class MorizonCleaner(object):
         to_renovation = ["remontu", "odnowienia"]
 
         def mapping(value):
-            value = unidecode.unidecode(str(value)).lower()
-            for vg in very_good:
-                if vg in value:
-                    return 4
-            for g in good:
-                if g in value:
-                    return 3
-            for r in raw:
-                if r in value:
-                    return 2
-            for tr in to_renovation:
-                if tr in value:
-                    return 1
-            return 3
-
-        self.df[column_name] = self.df[column_name].apply(mapping)
-
-    def floor(self, column_name):
-        def floor_n(value):
-            value = value.split(" / ")
-            if len(value) in (1, 2):
-                if value[0] == "parter":
-                    return 0
-                elif value[0] == "no_info":
-                    return "no_info"
-                else:
-                    try:
-                        return int(value[0])
-                    except ValueError:
-                        return "no_info"
-            else:
-                raise ValueError(f'"{value}" value is not expected in this column')
+            return first_match(
+                transliterate(value.astype(str)).str.lower(),
+                [contains(*very_good), contains(*good), contains(*raw), contains(*to_renovation)],
+                [4, 3, 2, 1],
+                default=3,
+            )
 
-        def max_floor_n(value):
-            value = value.split(" / ")
-            if len(value) == 2:
-                return int(value[1])
-            else:
-                return "no_info"
+        self.df[column_name] = self.map_unique(column_name, mapping)
 
-        self.df[columns.FLOOR_N] = self.df[column_name].apply(max_floor_n)
-        self.df[column_name] = self.df[column_name].apply(floor_n)
+    def floor(self, column_name):
+        def mapping(value):
+            value = value.str.split(" / ")
+            parts_n = value.str.len()
+            floor, max_floor = value.str[0], value.str[1]
+
+            if (parts_n > 2).any():
+                unexpected = value[parts_n > 2].iloc[0]
+                raise ValueError(f'"{unexpected}" value is not expected in this column')
+            invalid_max_floor = (parts_n == 2) & ~is_int(max_floor)
+            if invalid_max_floor.any():
+                unexpected = max_floor[invalid_max_floor].iloc[0]
+                raise ValueError(f"invalid literal for int() with base 10: '{unexpected}'")
+            return {
+                columns.FLOOR_N: select(
+                    [parts_n == 2], [to_int(max_floor)], default="no_info"
+                ),
+                column_name: select(
+                    [floor == "parter", floor == "no_info", is_int(floor)],
+                    [0, "no_info", to_int(floor)],
+                    default="no_info",
+                ),
+            }
+
+        for new_column, values in self.map_unique(column_name, mapping).items():
+            self.df[new_column] = values
 
     def heating(self, column_name):
-        def heating_type(value):
-            if value == "no_info":
-                return "no_info"
-            elif "Ogrzewanie (brak)" in value:
-                return "no_heating"
-            elif "miejsk" in value:
-                return "urban"
-            elif value == "Ogrzewanie":
-                return "urban"
-            elif "elektry" in value:
-                return "electric"
-            elif "gaz" in value:
-                return "gas"
-            elif "piec" in value or "węgl" in value:
-                return "coal"
-            elif "komin" in value:
-                return "fireplace"
-            elif "Ogrzewanie" in value:
-                return "other"
-            else:
-                return "no_info"
-
-        self.df[column_name] = self.df[column_name].apply(heating_type)
+        def mapping(value):
+            return first_match(
+                value,
+                [
+                    equals("no_info"),
+                    contains("Ogrzewanie (brak)"),
+                    contains("miejsk"),
+                    equals("Ogrzewanie"),
+                    contains("elektry"),
+                    contains("gaz"),
+                    contains("piec", "węgl"),
+                    contains("komin"),
+                    contains("Ogrzewanie"),
+                ],
+                [
+                    "no_info",
+                    "no_heating",
+                    "urban",
+                    "urban",
+                    "electric",
+                    "gas",
+                    "coal",
+                    "fireplace",
+                    "other",
+                ],
+                default="no_info",
+            )
+
+        self.df[column_name] = self.map_unique(column_name, mapping)
 
     def media(self, column_name):
-        def internet(value):
-            value = value.lower()
-            if "internet (brak" in value:
-                return 0
-            elif "internet" in value:
-                return 1
-            else:
-                return "no_info"
+        def check_if_lacking(pol_word):
+            return [([f"{pol_word} (brak"], 0), ([pol_word], 1)], "no_info"
 
-        def water(value):
-            value = value.lower()
-            if "woda" in value:
-                return 1
-            else:
-                return 0
-
-        def gas(value):
-            value = value.lower()
-            if "gaz (brak" in value:
-                return 0
-            elif "gaz" in value:
-                return 1
-            else:
-                return "no_info"
-
-        def electricity(value):
-            value = value.lower()
-            if "prąd" in value:
-                return 1
-            else:
-                return 0
-
-        def sewers(value):
-            value = value.lower()
-            if "kanalizacja" in value:
-                return 1
-            else:
-                return 0
+        def check_if_present(pol_word):
+            return [([pol_word], 1)], 0
 
-        self.df[columns.INTERNET] = self.df[column_name].apply(internet)
-        self.df[columns.WATER] = self.df[column_name].apply(water)
-        self.df[columns.GAS] = self.df[column_name].apply(gas)
-        self.df[columns.ELECTRICITY] = self.df[column_name].apply(electricity)
-        self.df[columns.SEWERS] = self.df[column_name].apply(sewers)
+        def mapping(value):
+            return match_keywords(value.str.lower(), {
+                columns.INTERNET: check_if_lacking("internet"),
+                columns.WATER: check_if_present("woda"),
+                columns.GAS: check_if_lacking("gaz"),
+                columns.ELECTRICITY: check_if_present("prąd"),
+                columns.SEWERS: check_if_present("kanalizacja"),
+            })
+
+        for new_column, values in self.map_unique(column_name, mapping).items():
+            self.df[new_column] = values
         self.df = self.df.drop(column_name, axis=1)
 
 
+    def map_unique(self, column_name, mapping):
+        cache = self.value_cache.setdefault(column_name, {})
+        return map_unique(self.df[column_name], mapping, cache)
+
     def replace_no_info_with_mode(self, df):
         """
         Replace with 0 if binary (no info == lack of feature)
@@ -442,7 +393,10 @@ class MorizonCleaner(object):
     def find_cols_with_no_info(self):
         no_info_cols = []
         for col in self.df.select_dtypes(include=["object"]):
-            if self.df[col].str.contains("no_info").any():
+            # checking distinct values is enough, within a batch they can
+            # all be missing or already mapped to numbers
+            values = pd.Series(self.df[col].dropna().unique()).astype(str)
+            if values.str.contains("no_info", regex=False).any():
                 no_info_cols.append(col)
         log.info(f"Found {len(no_info_cols)} with no_info value")
         return no_info_cols
@@ -504,6 +458,181 @@ class MorizonCleaner(object):
         return df
 
 
+def map_unique(series, mapping, cache=None):
+    """
+    Run whole column mapping only on distinct values of series and
+    broadcast its result (Series or dict of Series) back to all rows.
+    Values found in cache (raw value -> mapped value) are not mapped again,
+    newly mapped string values are added to it.
+    Result dtypes are inferred the same way Series.apply would do it.
+    """
+    cache = {} if cache is None else cache
+    codes, uniques = pd.factorize(series)
+    uniques = uniques.astype(object)
+    if (codes == -1).any():
+        # missing values get code -1, which points at appended NaN
+        uniques = np.append(uniques, np.nan)
+
+    new_values = [v for v in uniques if not isinstance(v, str) or v not in cache]
+    results, output_columns = {}, None
+    if new_values or not len(uniques):
+        mapped = mapping(pd.Series(new_values, dtype=object))
+        if isinstance(mapped, dict):
+            output_columns = list(mapped)
+            mapped = [dict(zip(mapped, row)) for row in zip(*(v.tolist() for v in mapped.values()))]
+        else:
+            mapped = mapped.tolist()
+        results = dict(zip(new_values, mapped))
+    elif isinstance(cache[uniques[0]], dict):
+        output_columns = list(cache[uniques[0]])
+    log.debug(f"Mapped {len(new_values)} of {len(uniques)} distinct values of {series.name}")
+
+    for value, result in results.items():
+        if isinstance(value, str):
+            cache[value] = result
+    results = [results[v] if v in results else cache[v] for v in uniques]
+
+    def broadcast(values):
+        array = np.empty(len(values), dtype=object)
+        array[:] = values
+        return pd.Series(array[codes], index=series.index).infer_objects()
+
+    if output_columns is not None:
+        return {column: broadcast([r[column] for r in results]) for column in output_columns}
+    return broadcast(results)
+
+
+def first_match(series, conditions, choices, default):
+    """
+    Vectorized chain of if/elif/else checks of string values.
+    Conditions (see contains and equals) are compiled into a single regex
+    whose alternatives are tried in order, so every value is scanned once
+    and gets choice of the first condition it satisfies.
+    """
+    match = compile_conditions(tuple(conditions)).match
+    no_match = len(conditions)
+
+    def condition_n(value):
+        found = match(value) if isinstance(value, str) else None
+        return int(found.lastgroup[1:]) if found else no_match
+
+    outcomes = np.array(list(choices) + [default], dtype=object)
+    result = outcomes[series.map(condition_n).to_numpy(dtype=int)]
+    return pd.Series(result, index=series.index)
+
+
+@lru_cache(maxsize=None)
+def compile_conditions(conditions):
+    # empty named group marks which alternative matched
+    return re.compile(
+        "|".join(f"{condition}(?P<c{n}>)" for n, condition in enumerate(conditions)),
+        re.DOTALL,
+    )
+
+
+def match_keywords(series, outputs):
+    """
+    Single pass alternative of calling first_match for many columns derived
+    from the same strings, when every condition is a list of words.
+    outputs: {column: ([(words, choice), ...], default)} with conditions in
+    priority order, choice of the first condition with any word present in
+    value is taken. All words are found with one regex scan of every value.
+    Returns {column: Series}.
+    """
+    words = {word for conditions, _ in outputs.values() for words, _ in conditions for word in words}
+    findall, implied_words = compile_keywords(tuple(sorted(words)))
+
+    def choose(conditions, default, found):
+        for words, choice in conditions:
+            if not found.isdisjoint(words):
+                return choice
+        return default
+
+    # values usually contain one of few combinations of words
+    choices_by_found = {}
+    rows = []
+    for value in series:
+        found = frozenset(findall(value)) if isinstance(value, str) else frozenset()
+        if found not in choices_by_found:
+            found_words = set().union(*(implied_words[word] for word in found))
+            choices_by_found[found] = tuple(
+                choose(conditions, default, found_words) for conditions, default in outputs.values()
+            )
+        rows.append(choices_by_found[found])
+
+    columns_values = zip(*rows) if rows else [()] * len(outputs)
+    return {
+        column: pd.Series(list(values), index=series.index, dtype=object)
+        for column, values in zip(outputs, columns_values)
+    }
+
+
+@lru_cache(maxsize=None)
+def compile_keywords(words):
+    """
+    Zero width regex matching at every position of a value, so overlapping
+    words are found too. Where several words start at the same position
+    only the longest is matched, words contained in it are implied.
+    Returns findall of the pattern and {word: words implied by its match}.
+    """
+    words = sorted(words, key=len, reverse=True)
+    pattern = re.compile(f"(?=({'|'.join(re.escape(word) for word in words)}))")
+    implied_words = {word: frozenset(other for other in words if other in word) for word in words}
+    return pattern.findall, implied_words
+
+
+def contains(*words):
+    """ Condition of `any(word in value for word in words)` """
+    return f"(?=.*?(?:{'|'.join(re.escape(word) for word in words)}))"
+
+
+def equals(word):
+    """ Condition of `value == word` """
+    return f"(?={re.escape(word)}\\Z)"
+
+
+def select(conditions, choices, default):
+    """
+    Vectorized chain of if/elif/else over boolean Series. For every row
+    choice of the first true condition is taken. Choices may be scalars or
+    Series aligned with conditions.
+    """
+    index = conditions[0].index
+    result = np.full(len(index), default, dtype=object)
+    # assign in reversed order, so that the first matching condition wins
+    for condition, choice in reversed(list(zip(conditions, choices))):
+        mask = condition.to_numpy(dtype=bool)
+        if isinstance(choice, pd.Series):
+            choice = choice.to_numpy(dtype=object)[mask]
+        result[mask] = choice
+    return pd.Series(result, index=index)
+
+
+def transliterate(series):
+    """
+    Same as unidecode for each value, but polish letters (by far the most
+    common non ascii characters) are replaced with a single translate.
+    """
+    series = series.str.translate(POLISH_TRANSLATION)
+    non_ascii = series.str.contains(r"[^\x00-\x7f]", na=False)
+    if non_ascii.any():
+        series[non_ascii] = series[non_ascii].map(unidecode.unidecode)
+    return series
+
+
+def is_int(series):
+    """ Whether value would be accepted by int() """
+    return series.str.match(INT_PATTERN, na=False)
+
+
+def to_int(series):
+    """ Python ints (None where value is not an int) """
+    valid = is_int(series)
+    result = pd.Series(None, index=series.index, dtype=object)
+    result[valid] = [int(value) for value in series[valid]]
+    return result
+
+
 class InvalidCleaningMapError(Exception):
     pass
 
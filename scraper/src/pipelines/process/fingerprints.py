@@ -0,0 +1,138 @@
+"""
+Persistent store of offer fingerprints (offer id -> hash of its raw fields,
+cleaner, model and coords map versions), used to skip offers which did not
+change since they were last uploaded.
+"""
+import logging
+import os
+
+import numpy as np
+import pandas as pd
+
+import columns
+from common import (
+    CLEANING_REQUIRED_COLUMNS,
+    COORDS_MAP_MODELS_PATH,
+    LOCAL_ROOT,
+    MODELS_PATH,
+    fs,
+)
+from pipelines.process.cleaning_utils import CLEANER_VERSION
+
+log = logging.getLogger(__name__)
+
+# fingerprints of already uploaded offers
+FINGERPRINTS_PATH = LOCAL_ROOT + "/{data_type}_fingerprints.csv"
+# fingerprints of offers being processed, committed after successful upload
+PENDING_FINGERPRINTS_PATH = LOCAL_ROOT + "/{data_type}_fingerprints_pending.csv"
+
+
+def skip_unchanged_offers(df, data_type):
+    """
+    Drop rows of offers whose last row has fingerprint already present
+    in the store (only last row of an offer is uploaded) and save
+    fingerprints of the remaining offers as pending.
+    """
+    row_hashes = get_row_hashes(df, get_versions(data_type))
+    last_hashes = pd.Series(row_hashes.to_numpy(), index=df[columns.OFFER_ID].to_numpy())
+    last_hashes = last_hashes[~last_hashes.index.duplicated(keep="last")]
+    stored = read_fingerprints(FINGERPRINTS_PATH.format(data_type=data_type))
+    unchanged = last_hashes.index[stored.reindex(last_hashes.index) == last_hashes]
+    skipped = df[columns.OFFER_ID].isin(unchanged).to_numpy()
+    log.info(
+        f"Skipping {len(unchanged)} of {len(last_hashes)} offers ({skipped.sum()} of {len(df)} rows)"
+        " which did not change since last upload."
+    )
+    save_pending_fingerprints(last_hashes.drop(unchanged), data_type)
+    return df[~skipped]
+
+
+def skip_unchanged_rows(dfs, data_type):
+    """
+    Version of skip_unchanged_offers for dfs read one at a time (oldest
+    first). Yields each df without rows whose fingerprint is the one their
+    offer already has, stored or of its row yielded last, which also drops
+    rows repeated in newer dfs. Only fingerprint of each offer is kept in
+    memory. Offer which changed and changed back is not skipped, as its
+    rows are yielded before the last one is read, the last one still ends
+    up in the database. Fingerprints of offers with rows yielded are saved
+    as pending after the last df.
+    """
+    versions = get_versions(data_type)
+    fingerprints = read_fingerprints(FINGERPRINTS_PATH.format(data_type=data_type)).to_dict()
+    changed = set()
+    rows = kept_rows = 0
+    for df in dfs:
+        kept = np.zeros(len(df), dtype=bool)
+        offer_ids = df[columns.OFFER_ID].tolist()
+        for i, (offer_id, row_hash) in enumerate(zip(offer_ids, get_row_hashes(df, versions).tolist())):
+            if fingerprints.get(offer_id) != row_hash:
+                fingerprints[offer_id] = row_hash
+                changed.add(offer_id)
+                kept[i] = True
+        rows += len(df)
+        kept_rows += kept.sum()
+        yield df[kept]
+    log.info(
+        f"Skipped {rows - kept_rows} of {rows} rows which were repeated or did not change since last upload,"
+        f" {len(changed)} offers changed."
+    )
+    pending = pd.Series({offer_id: fingerprints[offer_id] for offer_id in changed}, dtype="int64")
+    save_pending_fingerprints(pending, data_type)
+
+
+def save_pending_fingerprints(fingerprints, data_type):
+    """ Save offer id -> row hash Series, to be committed after upload. """
+    pending = fingerprints.rename_axis(columns.OFFER_ID).rename(columns.ROW_HASH)
+    pending.to_csv(PENDING_FINGERPRINTS_PATH.format(data_type=data_type), header=True)
+
+
+def commit_fingerprints(data_type):
+    """ Add pending fingerprints to the store, once offers are uploaded. """
+    pending_path = PENDING_FINGERPRINTS_PATH.format(data_type=data_type)
+    if not os.path.exists(pending_path):
+        log.warning("No pending offer fingerprints to commit.")
+        return
+    path = FINGERPRINTS_PATH.format(data_type=data_type)
+    stored = read_fingerprints(path)
+    pending = read_fingerprints(pending_path)
+    fingerprints = pd.concat([stored, pending])
+    fingerprints = fingerprints[~fingerprints.index.duplicated(keep="last")]
+    fingerprints.rename_axis(columns.OFFER_ID).rename(columns.ROW_HASH).to_csv(path, header=True)
+    os.remove(pending_path)
+    log.info(f"Committed {len(pending)} offer fingerprints, {len(fingerprints)} stored.")
+
+
+def read_fingerprints(path):
+    """ Offer id -> row hash Series, last one for repeated offers. """
+    if not os.path.exists(path):
+        return pd.Series(dtype="int64")
+    df = pd.read_csv(path, dtype={columns.OFFER_ID: str, columns.ROW_HASH: "int64"})
+    df = df.drop_duplicates(subset=columns.OFFER_ID, keep="last")
+    return df.set_index(columns.OFFER_ID)[columns.ROW_HASH]
+
+
+def get_row_hashes(df, versions):
+    """
+    Hash of all raw columns used in cleaning combined with versions.
+    Numbers are hashed as floats, so an int column of one raw file
+    matches the same values read as floats from another.
+    """
+    hashed = pd.DataFrame(index=df.index)
+    for col in sorted(c for c in CLEANING_REQUIRED_COLUMNS if c in df.columns):
+        values = df[col]
+        if pd.api.types.is_numeric_dtype(values):
+            values = values.astype("float64")
+        hashed[col] = values
+    hashed[columns.ROW_HASH] = versions
+    hashes = pd.util.hash_pandas_object(hashed, index=False)
+    # stored as signed, which is what read_csv infers back
+    return pd.Series(hashes.to_numpy().view("int64"), index=df.index)
+
+
+def get_versions(data_type):
+    """ Cleaner version and names of newest model and coords map files. """
+    versions = [f"cleaner_v{CLEANER_VERSION}"]
+    for path in (MODELS_PATH, COORDS_MAP_MODELS_PATH):
+        versions.append(os.path.basename(fs.get_newest_path(path.format(data_type=data_type)) or ""))
+    return "|".join(versions)
@@ -7,39 +7,38 @@ from unidecode import unidecode
 import pandas as pd
 
 import columns
-from common import FINAL_PATH, LOCAL_ROOT, get_process_from_date, fs
+from common import FINAL_PATH, LOCAL_ROOT, fs
 from pipelines.utils import read_df
-from pipelines.process.cleaning_task import get_df_to_process
 
 log = logging.getLogger(__name__)
 
 def prepare_final(dtype):
+    """ Returns path of saved final file. """
     log.info("Starting prepare data task ...")
     df = read_and_merge_required_dfs(dtype)
     top = prepare_offers(df, dtype)
     log.info(f'Final shape {top.shape}')
-    fs.save_df_with_timestamp(
-         top,
-         FINAL_PATH,
-         keyword='final',
-         dtype=dtype,
-    )
+    path = fs.get_timestamped_path(FINAL_PATH, keyword='final', dtype=dtype)
+    fs.save_df(top, path)
+    return path
 
 
 def read_and_merge_required_dfs(dtype):
     predicted_df = read_df(LOCAL_ROOT, keyword='predicted', dtype=dtype)
     log.info(f'Predicted shape {predicted_df.shape}')
-    from_date = get_process_from_date(dtype, last_date_of="final")
-    concated_df = get_df_to_process(dtype, from_date)
-    log.info(f'Concated shape {concated_df.shape}')
+    offers_info = read_df(LOCAL_ROOT, keyword='offers_info', dtype=dtype)
+    log.info(f'Offers info shape {offers_info.shape}')
+    return merge_offers_info(predicted_df, offers_info)
 
-    df = predicted_df.merge(
-        concated_df[[columns.OFFER_ID,
-                     columns.URL,
-                     columns.TITLE]],
+def merge_offers_info(df, offers_info):
+    """
+    Add url and title saved while cleaning (see cleaning_task.get_offers_info),
+    keep last row of each offer.
+    """
+    return df.merge(
+        offers_info,
         on=columns.OFFER_ID,
         how='left').drop_duplicates(subset=columns.OFFER_ID, keep="last")
-    return df
 
 def prepare_offers(df, dtype):
     pred_col = columns.SALE_PRED if dtype == 'sale' else columns.RENT_PRED
@@ -1,18 +1,124 @@
 import logging
+import os
 
-from pipelines.process.cleaning_task import clean
+from common import (
+    COORDS_MAP_MODELS_PATH,
+    LOCAL_ROOT,
+    MODELS_PATH,
+    get_process_from_date,
+    fs,
+)
+from pipelines import coords_index
+from pipelines.process import (
+    add_features,
+    apply_task,
+    cleaning_task,
+    cleaning_utils,
+    fingerprints,
+    prepare_final_data,
+    upload_to_db,
+)
+from pipelines.process.cleaning_task import clean, get_raw_paths
 from pipelines.process.add_features import features
 from pipelines.process.prepare_final_data import prepare_final
 from pipelines.process.apply_task import model_apply
 from pipelines.process.upload_to_db import upload
+from pipelines.process.fingerprints import FINGERPRINTS_PATH, commit_fingerprints
+from pipelines.process.stages import StageManifest, get_hash, hash_modules, hash_values
+from pipelines.process.streaming import process_stream
+from pipelines.utils import get_df_path
 
 log = logging.getLogger(__name__)
 
+# pass batches through all stages instead of saving whole dataframes
+PROCESS_STREAM = os.getenv("PROCESS_STREAM") == "true"
+# run streamed stages in separate threads
+PROCESS_OVERLAP = os.getenv("PROCESS_OVERLAP") == "true"
+# stages in order of execution
+STAGES = ["clean", "features", "model_apply", "prepare_final", "upload"]
+# run this stage and all after it even if their inputs did not change
+FORCE_STAGE = os.getenv("FORCE_STAGE") or None
+
 def process_task(dtype):
     log.info("Started processing")
-    clean(dtype)
-    features(dtype)
-    model_apply(dtype)
-    prepare_final(dtype)
-    upload(dtype)
+    if PROCESS_STREAM:
+        uploaded = process_stream(dtype, overlap=PROCESS_OVERLAP)
+    else:
+        uploaded = process_stages(dtype)
+    if uploaded is None:
+        log.info("No new or changed offers to process.")
+    elif uploaded:
+        commit_fingerprints(dtype)
+    else:
+        log.warning("Not all offers were uploaded, they will be processed again next time.")
     log.info("Finished processing")
+
+
+def process_stages(dtype):
+    """
+    Run stages one after another, skipping ones already run with the same
+    inputs (see StageManifest). Returns whether all offers were uploaded
+    or None if there was nothing to process.
+    """
+    manifest = StageManifest(dtype, STAGES, force_stage=FORCE_STAGE)
+    from_date = get_process_from_date(dtype, last_date_of="final")
+    raw_hash = hash_values(f"{path}:{fs.get_hash(path)}" for path in sorted(get_raw_paths(dtype, from_date)))
+
+    inputs = {
+        "raw": raw_hash,
+        "fingerprints": get_hash(FINGERPRINTS_PATH.format(data_type=dtype)),
+        # offers are fingerprinted with newest model and coords map, new ones re-score all offers
+        "versions": fingerprints.get_versions(dtype),
+        "code": hash_modules(cleaning_task, cleaning_utils, fingerprints),
+    }
+    clean_path = get_df_path(LOCAL_ROOT, keyword='clean', dtype=dtype)
+    if not manifest.is_fresh("clean", inputs):
+        manifest.record("clean", inputs, clean_path, rows=clean(dtype))
+    if not manifest.get("clean", "rows"):
+        return None
+
+    inputs = {
+        "clean": get_hash(clean_path),
+        "coords_map": get_newest_file_hash(COORDS_MAP_MODELS_PATH, dtype),
+        "code": hash_modules(add_features, coords_index),
+    }
+    final_path = get_df_path(LOCAL_ROOT, keyword='final', dtype=dtype)
+    if not manifest.is_fresh("features", inputs):
+        features(dtype)
+        manifest.record("features", inputs, final_path)
+
+    inputs = {
+        "final": get_hash(final_path),
+        "model": get_newest_file_hash(MODELS_PATH, dtype),
+        "code": hash_modules(apply_task),
+    }
+    predicted_path = get_df_path(LOCAL_ROOT, keyword='predicted', dtype=dtype)
+    if not manifest.is_fresh("model_apply", inputs):
+        model_apply(dtype)
+        manifest.record("model_apply", inputs, predicted_path)
+
+    inputs = {
+        "predicted": get_hash(predicted_path),
+        "offers_info": get_hash(get_df_path(LOCAL_ROOT, keyword='offers_info', dtype=dtype)),
+        "code": hash_modules(prepare_final_data),
+    }
+    if not manifest.is_fresh("prepare_final", inputs):
+        manifest.record("prepare_final", inputs, prepare_final(dtype))
+
+    inputs = {
+        "final": get_hash(manifest.get("prepare_final", "output")),
+        "code": hash_modules(upload_to_db),
+    }
+    if manifest.is_fresh("upload", inputs):
+        return True
+    uploaded = upload(dtype)
+    if uploaded:
+        manifest.record("upload", inputs)
+    return uploaded
+
+
+def get_newest_file_hash(directory, dtype):
+    newest_path = fs.get_newest_path(directory.format(data_type=dtype))
+    if newest_path is None:
+        return None
+    return f"{newest_path}:{fs.get_hash(newest_path)}"
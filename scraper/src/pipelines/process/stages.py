@@ -0,0 +1,93 @@
+"""
+Manifest of process task stages. Each stage records hashes of its inputs
+and its output artifact, so a rerun skips stages whose inputs did not
+change and resumes from the first invalidated one.
+"""
+import hashlib
+import json
+import logging
+import os
+
+from common import LOCAL_ROOT, fs
+from fs_client import hash_file
+
+log = logging.getLogger(__name__)
+
+STAGES_MANIFEST_PATH = LOCAL_ROOT + "/{data_type}_stages.json"
+
+
+class StageManifest:
+    def __init__(self, data_type, stages, force_stage=None):
+        """
+        stages are names of stages in order of execution, force_stage
+        and all stages after it are run regardless of the manifest.
+        """
+        if force_stage is not None and force_stage not in stages:
+            raise UnknownStageError(f"Unknown stage {force_stage}, expected one of {stages}.")
+        self.path = STAGES_MANIFEST_PATH.format(data_type=data_type)
+        self.forced = set(stages[stages.index(force_stage):]) if force_stage else set()
+        self.entries = {}
+        if os.path.exists(self.path):
+            with open(self.path) as f:
+                self.entries = json.load(f)
+
+    def is_fresh(self, stage, inputs):
+        """ Whether stage was already run with the same inputs and its output is intact. """
+        entry = self.entries.get(stage)
+        if stage in self.forced:
+            log.info(f"Stage {stage} is forced to run.")
+            return False
+        if entry is None:
+            log.info(f"Stage {stage} was not run yet, will run it.")
+            return False
+        if entry["inputs"] != inputs:
+            log.info(f"Stage {stage} inputs changed, will run it.")
+            return False
+        output = entry["output"]
+        if output is not None and get_hash(output) != entry["output_hash"]:
+            log.info(f"Stage {stage} output {output} is missing or changed, will run it.")
+            return False
+        log.info(f"Skipping stage {stage}, its inputs did not change.")
+        return True
+
+    def record(self, stage, inputs, output=None, **details):
+        """
+        Save inputs and output of successful stage run. Output is absolute
+        local path, path within fs (eg. flats-data/...) or None.
+        """
+        self.entries[stage] = {
+            "inputs": inputs,
+            "output": output,
+            "output_hash": get_hash(output) if output is not None else None,
+            **details,
+        }
+        with open(self.path, "w") as f:
+            json.dump(self.entries, f, indent=2)
+
+    def get(self, stage, key):
+        return self.entries[stage][key]
+
+
+class UnknownStageError(Exception):
+    pass
+
+
+def get_hash(path):
+    """ Hash of local (absolute path) or fs file, None if it does not exist. """
+    if os.path.isabs(path):
+        return hash_file(path) if os.path.exists(path) else None
+    return fs.get_hash(path) if fs.exists(path) else None
+
+
+def hash_values(values):
+    """ Single hash of many string values, eg. hashes of a few files. """
+    combined = hashlib.sha1()
+    for value in values:
+        combined.update(str(value).encode())
+        combined.update(b"\0")
+    return combined.hexdigest()
+
+
+def hash_modules(*modules):
+    """ Hash of source code of modules. """
+    return hash_values(hash_file(module.__file__) for module in modules)
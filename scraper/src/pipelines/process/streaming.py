@@ -0,0 +1,154 @@
+"""
+Streaming version of process task. Raw files are read one at a time and
+their offers flow through clean, features, model apply, prepare final
+and upload stages in batches, without saving whole intermediate
+dataframes, so first offers are uploaded before last raw file is read.
+Stages can also run in separate threads connected with bounded queues,
+so eg. uploading overlaps with cleaning.
+
+Memory used is bounded by raw files read ahead (see FsClient.iter_dfs)
+and batches in flight (one per stage, STREAM_QUEUE_SIZE more between
+overlapping stages), plus fingerprint of each offer (see
+skip_unchanged_rows) and cleaning value cache, independently of number
+of raw rows.
+"""
+import logging
+import os
+import threading
+from queue import Queue
+
+import numpy as np
+
+import columns
+from column_types import compact_df
+from common import (
+    COORDS_MAP_MODELS_PATH,
+    FINAL_PATH,
+    MODELS_PATH,
+    RENT_MODEL_INPUTS,
+    SALE_MODEL_INPUTS,
+    get_process_from_date,
+    fs,
+)
+from pipelines.process.add_features import add_coords_features
+from pipelines.process.apply_task import apply_model
+from pipelines.process.cleaning_task import (
+    add_missing_columns,
+    get_raw_paths,
+    iter_raw_dfs,
+    read_value_cache,
+    save_value_cache,
+)
+from pipelines.process.cleaning_utils import MorizonCleaner
+from pipelines.process.fingerprints import skip_unchanged_rows
+from pipelines.process.prepare_final_data import prepare_offers
+from pipelines.process.upload_to_db import upload_batches
+
+log = logging.getLogger(__name__)
+
+# number of offers flowing through stages at once
+STREAM_BATCH_SIZE = int(os.getenv("STREAM_BATCH_SIZE", "5000"))
+# max number of batches waiting between two overlapping stages
+STREAM_QUEUE_SIZE = 2
+
+
+def process_stream(data_type, overlap=False):
+    """ Returns whether all offers were uploaded. """
+    log.info(f"Started streaming processing (batch size {STREAM_BATCH_SIZE}, overlap {overlap})")
+    model = fs.read_newest_model(MODELS_PATH, dtype=data_type)
+    if model is None:
+        log.warning(f'Did not find any model for {data_type}')
+        return False
+    coords_map = fs.read_newest_df(COORDS_MAP_MODELS_PATH, dtype=data_type)
+    from_date = get_process_from_date(data_type, last_date_of="final")
+    raw_dfs = skip_unchanged_rows(iter_raw_dfs(get_raw_paths(data_type, from_date)), data_type)
+    value_cache = read_value_cache(data_type)
+    final_path = fs.get_timestamped_path(FINAL_PATH, keyword='final', dtype=data_type)
+
+    stages = [
+        lambda batches: clean_stream(batches, value_cache),
+        lambda batches: features_stream(batches, coords_map),
+        lambda batches: apply_stream(batches, model, data_type),
+        lambda batches: prepare_final_stream(batches, data_type, final_path),
+    ]
+    batches = (df[i:i+STREAM_BATCH_SIZE] for df in raw_dfs for i in range(0, len(df), STREAM_BATCH_SIZE))
+    for stage in stages:
+        batches = stage(batches)
+        if overlap:
+            batches = threaded(batches)
+    uploaded = upload_batches(batches)
+    save_value_cache(data_type, value_cache)
+    log.info("Finished streaming processing.")
+    return uploaded
+
+
+def clean_stream(batches, value_cache):
+    """
+    Url and title dropped by cleaner are joined back to cleaned rows, as
+    rows of an offer are skipped until they change (see
+    skip_unchanged_rows), they are the ones of its last raw row.
+    """
+    for batch_n, batch in enumerate(batches):
+        log.info(f"Cleaning batch number {batch_n} ...")
+        batch = add_missing_columns(batch)
+        cleaned = MorizonCleaner(batch, value_cache).clean()
+        if not cleaned.empty:
+            yield compact_df(cleaned, "clean batch").join(batch[[columns.URL, columns.TITLE]])
+
+
+def features_stream(batches, coords_map):
+    for batch in batches:
+        yield add_coords_features(batch, coords_map)
+
+
+def apply_stream(batches, model, data_type):
+    model_inputs = SALE_MODEL_INPUTS if data_type == 'sale' else RENT_MODEL_INPUTS
+    for batch in batches:
+        # cleaner drops columns empty within batch, their rows can't be predicted
+        for col in model_inputs:
+            if col not in batch.columns:
+                batch[col] = np.nan
+        predicted = apply_model(batch, model, data_type)
+        if not predicted.empty:
+            yield predicted
+
+
+def prepare_final_stream(batches, data_type, final_path):
+    """
+    Same offer can end up in a few batches, last of them overwrites
+    previous ones in the database. Final file is uploaded once, after
+    the last batch.
+    """
+    tops = (
+        prepare_offers(batch.drop_duplicates(subset=columns.OFFER_ID, keep="last"), data_type)
+        for batch in batches
+    )
+    yield from fs.append_dfs(tops, final_path)
+
+
+def threaded(batches, queue_size=STREAM_QUEUE_SIZE):
+    """
+    Consume batches in a separate thread, yield them through a bounded
+    queue in the same order. Exception raised by the producing thread
+    is raised again in the consuming one.
+    """
+    queue = Queue(maxsize=queue_size)
+    done = object()
+
+    def produce():
+        try:
+            for batch in batches:
+                queue.put((batch, None))
+        except Exception as e:
+            queue.put((None, e))
+        finally:
+            queue.put((done, None))
+
+    threading.Thread(target=produce, daemon=True).start()
+    while True:
+        batch, error = queue.get()
+        if error is not None:
+            raise error
+        if batch is done:
+            return
+        yield batch
@@ -8,22 +8,60 @@ from common import FINAL_PATH, fs
 
 log = logging.getLogger(__name__)
 
+URL = "http://server:8000/api/v1/offers/bulk?mode=upsert"
+# number of offers sent in a single request
+UPLOAD_BATCH_SIZE = 5000
+
 def upload(dtype):
+    """ Returns whether all offers were uploaded. """
     log.info("Started uploading data to database...")
     df = fs.read_newest_df(
         FINAL_PATH,
         dtype=dtype,
     )
-    size = len(df)
     log.info(f"Final dataframe shape: {df.shape}")
-    url = "http://server:8000/api/v1/offers/"
-    headers = {'Content-type': 'application/json'}
-    already_uploaded = 0
-    for ix in df.index:
-        row_as_json = df.loc[ix].to_json()
-        response = requests.post(url, headers=headers, data=str(row_as_json))
-        already_uploaded += 1
-        if already_uploaded % 500 == 0:
-            log.info(f"Already uploaded {already_uploaded}/{size} offers")
-
-    log.info("Successfully uploaded data to database")
+    batches = (df.iloc[i:i+UPLOAD_BATCH_SIZE] for i in range(0, len(df), UPLOAD_BATCH_SIZE))
+    return upload_batches(batches, total=len(df))
+
+
+def upload_batches(batches, total=None):
+    """
+    Upload offers batch by batch, returns whether all were uploaded.
+    Offers rejected by server as invalid are logged, they do not fail
+    the upload, as sending them again would not change anything.
+    """
+    counts = {"inserted": 0, "updated": 0, "unchanged": 0, "invalid": 0}
+    failed_batches = 0
+    uploaded = 0
+    with requests.Session() as session:
+        for batch in batches:
+            batch_counts = upload_batch(session, batch)
+            if not batch_counts:
+                failed_batches += 1
+            invalid_offer_ids = batch_counts.pop("invalid_offer_ids", [])
+            if invalid_offer_ids:
+                log.warning(f"Server skipped {len(invalid_offer_ids)} invalid offers: {invalid_offer_ids}")
+            for key, count in batch_counts.items():
+                counts[key] = counts.get(key, 0) + count
+            uploaded += len(batch)
+            progress = f"{uploaded}/{total}" if total is not None else uploaded
+            log.info(f"Already uploaded {progress} offers ({counts})")
+
+    if failed_batches:
+        log.warning(f"Failed to upload {failed_batches} batches ({counts})")
+        return False
+    log.info(f"Successfully uploaded data to database ({counts})")
+    return True
+
+
+def upload_batch(session, df):
+    """ Send offers as NDJSON, one offer per line. """
+    response = session.post(
+        URL,
+        headers={'Content-type': 'application/x-ndjson'},
+        data=df.to_json(orient='records', lines=True),
+    )
+    if not response.ok:
+        log.warning(f"Failed to upload batch of {len(df)} offers: {response.text}")
+        return {}
+    return response.json()
@@ -0,0 +1,72 @@
+"""
+Raw data saved as parquet dataset, partitioned by data type and scrape
+date (`data_type=sale/scrape_date=2021-01-01/<raw file name>.parquet`).
+All files have the same schema (RAW_SCHEMA), so columns do not change
+their types between files and can be read selectively.
+"""
+import logging
+
+import pyarrow as pa
+
+import columns
+from common import RAW_DATASET_PATH, fs
+from pipelines.on_demand.unify_raw_task import RAW_COLUMNS, fix_raw_df
+from pipelines.utils import name_from_path
+
+log = logging.getLogger(__name__)
+
+# raw columns parsed by scraper as numbers, all others are kept as strings
+RAW_NUMERIC_TYPES = {
+    columns.BUILDING_HEIGHT: pa.float64(),
+    columns.BUILDING_YEAR: pa.float64(),
+    columns.PRICE: pa.float64(),
+    columns.PRICE_M2: pa.float64(),
+    columns.SIZE: pa.float64(),
+    columns.ROOM_N: pa.float64(),
+    columns.LAT: pa.float64(),
+    columns.LON: pa.float64(),
+    columns.DIRECT: pa.int64(),
+    columns.DESC_LEN: pa.int64(),
+    columns.VIEW_COUNT: pa.int64(),
+    columns.PROMOTION_COUNTER: pa.int64(),
+}
+RAW_SCHEMA = pa.schema([(col, RAW_NUMERIC_TYPES.get(col, pa.string())) for col in RAW_COLUMNS])
+SCRAPE_DATE_FORMAT = "%Y-%m-%d"
+
+
+def save_raw_partition(df, data_type, scrape_dt, name):
+    """ Save raw df scraped at scrape_dt as file `name` of raw dataset. """
+    partition = {"data_type": data_type, "scrape_date": scrape_dt.strftime(SCRAPE_DATE_FORMAT)}
+    return fs.save_to_dataset(to_raw_schema(df), RAW_DATASET_PATH, partition, name, schema=RAW_SCHEMA)
+
+
+def to_raw_schema(df):
+    """ Raw df with all RAW_COLUMNS (missing ones are empty), with strings where schema has them. """
+    df = fix_raw_df(df.copy())
+    for field in RAW_SCHEMA:
+        if field.type == pa.string():
+            values = df[field.name]
+            df[field.name] = values.astype(str).where(values.notna(), None)
+    return df
+
+
+def get_raw_dataset_paths(data_type, from_date=None):
+    """
+    Paths of raw dataset files of data_type scraped after from_date, oldest
+    first. Partitions of other data types and older dates are not listed.
+    """
+    filters = {"data_type": lambda value: value == data_type}
+    if from_date is not None:
+        from_day = from_date.strftime(SCRAPE_DATE_FORMAT)
+        filters["scrape_date"] = lambda value: value >= from_day
+    dated_paths = []
+    for path in fs.list_dataset(RAW_DATASET_PATH, filters):
+        scrape_dt = get_scrape_dt(path)
+        if scrape_dt is not None and (from_date is None or scrape_dt > from_date):
+            dated_paths.append((scrape_dt, path))
+    return [path for _, path in sorted(dated_paths)]
+
+
+def get_scrape_dt(path):
+    """ Partition directories have digits too, date is taken from file name only. """
+    return fs.get_date_from_filename(name_from_path(path))
@@ -1,6 +1,5 @@
 from datetime import datetime, timedelta
 import logging
-import shutil
 import os
 
 from scrapy.crawler import CrawlerProcess
@@ -10,10 +9,14 @@ import scrapy
 from common import (
     RAW_DATA_PATH,
     SCRAPING_TEMPDIR_PATH,
+    STORAGE_FORMAT,
     get_current_dt,
+    get_date_from_filename,
     select_newest_date,
     fs,
 )
+from pipelines.on_demand.migrate_raw_task import get_dataset_name
+from pipelines.raw_dataset import save_raw_partition
 from spider.morizon_spider.spiders.morizon_spider import MorizonSpider
 from spider.morizon_spider.spiders.morizon_spider_rent import MorizonSpiderRent
 
@@ -43,5 +46,8 @@ def mv_scraped_file(data_type):
     output_path = SCRAPING_TEMPDIR_PATH.format(data_type=data_type)
     current_dt = get_current_dt()
     target_path  = RAW_DATA_PATH.format(data_type=data_type) + f"/raw_{data_type}_{current_dt}.csv"
-    shutil.copyfile(output_path, "/data/"+target_path)
+    fs.save_file(output_path, target_path)
+    if STORAGE_FORMAT == "parquet":
+        scrape_dt = get_date_from_filename(target_path)
+        save_raw_partition(fs.read_df(target_path), data_type, scrape_dt, get_dataset_name(target_path))
     os.remove(output_path)
@@ -0,0 +1,35 @@
+import columns as c
+from pipelines.process import add_features
+
+import pandas as pd
+
+
+def get_coords_map():
+    return pd.DataFrame({
+        c.LAT: [52.2297, 50.0647, 54.3520],
+        c.LON: [21.0122, 19.9450, 18.6466],
+        c.CLUSTER_MEAN_PRICE_M2: [12000.0, 10000.0, 9000.0],
+        c.CLUSTER_MEAN_PRICE: [600000.0, 500000.0, 450000.0],
+        c.CLUSTER_ID: [3, 2, 1],
+    })
+
+
+def test_add_coords_features_assigns_closest_center():
+    df = pd.DataFrame({
+        # Gdansk, Warsaw, Krakow
+        c.LAT: [54.35, 52.23, 50.06],
+        c.LON: [18.65, 21.01, 19.94],
+        c.PRICE: [1, 2, 3],
+    })
+    output = add_features.add_coords_features(df, get_coords_map())
+    assert list(output[c.CLUSTER_ID]) == [1, 3, 2]
+    assert list(output[c.PRICE]) == [1, 2, 3]
+    assert (output[c.CLUSTER_CENTER_DIST_KM] < 1).all()
+
+
+def test_add_coords_features_distance_matches_haversine():
+    df = pd.DataFrame({c.LAT: [52.0], c.LON: [21.0]})
+    coords_map = get_coords_map()
+    output = add_features.add_coords_features(df, coords_map)
+    expected = add_features.get_haversine_dist(21.0122, 52.2297, 21.0, 52.0)
+    assert output[c.CLUSTER_CENTER_DIST_KM][0] == round(expected, 2)
@@ -0,0 +1,78 @@
+import os
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+import fs_client
+from fs_client import FsClient
+
+RAW_DIR = "flats-data/sale/raw"
+
+
+@pytest.fixture
+def fs(tmp_path):
+    os.makedirs(tmp_path / RAW_DIR)
+    return FsClient(root=str(tmp_path))
+
+
+def save_raw(fs, day, rows=1):
+    path = f"{RAW_DIR}/raw_sale_2021_01_{day:02d}T10_00_00.csv"
+    fs.save_df(pd.DataFrame({"a": range(rows)}), path)
+    return path
+
+
+def test_newest_and_newer_files_are_found_without_listing(fs, monkeypatch):
+    paths = {day: save_raw(fs, day) for day in (2, 3, 1)}
+    assert fs.get_newest_path(RAW_DIR) == paths[3]
+
+    monkeypatch.setattr(fs, "list_dir", lambda directory: pytest.fail("directory was listed"))
+    assert fs.get_newest_path(RAW_DIR) == paths[3]
+    assert fs.list_newer_than(RAW_DIR, datetime(2021, 1, 1, 12)) == [paths[2], paths[3]]
+    assert fs.get_catalog(RAW_DIR).get(paths[1])["rows"] == 1
+    # catalog file is shared by clients of the same root
+    other_path = save_raw(FsClient(root=fs.root), 4)
+    assert fs.get_newest_path(RAW_DIR) == other_path
+
+
+def test_files_not_saved_by_client_are_indexed(fs):
+    pd.DataFrame({"a": [1]}).to_csv(fs.get_full_path(f"{RAW_DIR}/raw_sale_2021_01_01T10_00_00.csv"))
+    assert fs.get_newest_path(RAW_DIR) == f"{RAW_DIR}/raw_sale_2021_01_01T10_00_00.csv"
+
+    newest_path = save_raw(fs, 2)
+    assert fs.get_newest_path(RAW_DIR) == newest_path
+    os.remove(fs.get_full_path(newest_path))
+    assert fs.get_newest_path(RAW_DIR) == f"{RAW_DIR}/raw_sale_2021_01_01T10_00_00.csv"
+    assert fs.get_newest_path("flats-data/sale/final") is None
+
+
+def test_hash_is_taken_from_catalog_until_file_changes(fs, monkeypatch):
+    path = save_raw(fs, 1)
+    content_hash = fs_client.hash_file(fs.get_full_path(path))
+    monkeypatch.setattr(fs_client, "hash_file", lambda full_path: pytest.fail("file was hashed"))
+    assert fs.get_hash(path) == content_hash
+
+    monkeypatch.undo()
+    save_raw(fs, 1, rows=2)
+    assert fs.get_hash(path) != content_hash
+    assert fs.get_catalog(path).get(path)["rows"] == 2
+
+
+def test_files_changed_not_by_client_after_indexing_are_found(fs, monkeypatch):
+    first_path = save_raw(fs, 1)
+    assert fs.get_newest_path(RAW_DIR) == first_path
+    # files saved by client do not make directory indexed again
+    newest_path = save_raw(fs, 2)
+    with monkeypatch.context() as m:
+        m.setattr(fs, "list_dir", lambda directory: pytest.fail("directory was listed"))
+        assert fs.get_newest_path(RAW_DIR) == newest_path
+
+    hand_path = f"{RAW_DIR}/raw_sale_2021_01_03T10_00_00.csv"
+    pd.DataFrame({"a": [1]}).to_csv(fs.get_full_path(hand_path))
+    # directory mtime can have coarse resolution
+    os.utime(fs.get_full_path(RAW_DIR), (0, fs.stat(newest_path)[1] + 1))
+    assert fs.get_newest_path(RAW_DIR) == hand_path
+    assert fs.list_newer_than(RAW_DIR, datetime(2021, 1, 1, 12)) == [newest_path, hand_path]
+    os.remove(fs.get_full_path(newest_path))
+    os.utime(fs.get_full_path(RAW_DIR), (0, fs.stat(hand_path)[1] + 2))
+    assert fs.list_newer_than(RAW_DIR, datetime(2021, 1, 1, 12)) == [hand_path]
@@ -0,0 +1,176 @@
+import gc
+import os
+import threading
+import weakref
+
+import pandas as pd
+
+import columns
+from fs_client import FsClient
+from pipelines.process import cleaning_task
+from pipelines.process.cleaning_task import (
+    cache_clean_dfs,
+    clean_batches_in_parallel,
+    concat_dfs,
+    get_offers_info,
+    read_kept_clean_rows,
+)
+from pipelines.process.prepare_final_data import merge_offers_info
+from pipelines.process.cleaning_utils import MorizonCleaner
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def test_parallel_clean_matches_sequential_clean():
+    df = pd.read_csv(os.path.join(FIXTURES_DIR, "raw_sale.csv"))
+    df = df.sample(len(df) * 3, replace=True, random_state=0)
+    batches = [df[i:i+100] for i in range(0, len(df), 100)]
+
+    sequential_cache = {}
+    sequential = [MorizonCleaner(batch, sequential_cache).clean() for batch in batches]
+    parallel_cache = {}
+    parallel = clean_batches_in_parallel(batches, parallel_cache, workers=2)
+
+    assert len(parallel) == len(sequential)
+    for parallel_batch, sequential_batch in zip(parallel, sequential):
+        pd.testing.assert_frame_equal(parallel_batch, sequential_batch)
+    assert parallel_cache == sequential_cache
+
+
+def clean_raw_dfs(raw_paths, raw_dfs, cache_dir):
+    cache_paths = []
+    assert list(cache_clean_dfs(zip(raw_paths, raw_dfs), {}, cache_dir, cache_paths)) == raw_dfs
+    return [pd.read_pickle(cache_path) for cache_path in cache_paths]
+
+
+def test_clean_raw_dfs_cleans_only_new_or_changed_files(tmp_path, monkeypatch):
+    df = pd.read_csv(os.path.join(FIXTURES_DIR, "raw_sale.csv"))
+    raw_paths = ["sale_raw_1.csv", "sale_raw_2.csv"]
+    raw_dfs = [df[:100].reset_index(drop=True), df[100:].reset_index(drop=True)]
+    cleaned = clean_raw_dfs(raw_paths, raw_dfs, str(tmp_path))
+
+    cleaned_batches = []
+
+    def clean_batches(batches, value_cache):
+        cleaned_batches.extend(batches)
+        return [MorizonCleaner(batch).clean() for batch in batches]
+
+    monkeypatch.setattr(cleaning_task, "clean_batches", clean_batches)
+    cached = clean_raw_dfs(raw_paths, raw_dfs, str(tmp_path))
+    assert cleaned_batches == []
+    for cached_df, cleaned_df in zip(cached, cleaned):
+        pd.testing.assert_frame_equal(cached_df, cleaned_df)
+
+    raw_dfs[1] = raw_dfs[1][:50]
+    changed = clean_raw_dfs(raw_paths, raw_dfs, str(tmp_path))
+    assert sum(len(batch) for batch in cleaned_batches) == 50
+    # dtypes are inferred per batch
+    pd.testing.assert_frame_equal(changed[1], cleaned[1][:50], check_dtype=False)
+
+
+def test_only_kept_rows_are_read_from_clean_cache(tmp_path):
+    df = pd.read_csv(os.path.join(FIXTURES_DIR, "raw_sale.csv"))
+    # second file repeats part of the first one and lacks a column
+    raw_dfs = [df[:100].reset_index(drop=True), df[50:150].drop(columns=[columns.HEATING]).reset_index(drop=True)]
+    cache_paths = []
+    concatenated = concat_dfs(cache_clean_dfs(zip(["1.csv", "2.csv"], raw_dfs), {}, str(tmp_path), cache_paths))
+
+    kept = concatenated[concatenated[columns.OFFER_ID].isin(df[columns.OFFER_ID][:100])]
+    cleaned = read_kept_clean_rows(cache_paths, kept.index)
+    assert len(cleaned) == len(kept) < len(concatenated)
+    assert cleaned.index.tolist() == kept.index.get_level_values(1).tolist()
+
+
+def test_raw_files_are_released_while_cleaning(tmp_path, monkeypatch):
+    df = pd.read_csv(os.path.join(FIXTURES_DIR, "raw_sale.csv"))
+    raw_paths = [f"sale_raw_{n}.csv" for n in range(5)]
+    read_dfs = []
+
+    def iter_raw_dfs(paths, prefetch):
+        for n, _ in enumerate(paths):
+            gc.collect()
+            # only the previous raw df can still be referenced
+            assert all(ref() is None for ref in read_dfs[:-1])
+            raw_df = df.sample(100, random_state=n).reset_index(drop=True)
+            read_dfs.append(weakref.ref(raw_df))
+            yield raw_df
+
+    saved = {}
+    monkeypatch.setattr(cleaning_task, "get_process_from_date", lambda *args, **kwargs: None)
+    monkeypatch.setattr(cleaning_task, "get_raw_paths", lambda data_type, from_date: raw_paths)
+    monkeypatch.setattr(cleaning_task, "iter_raw_dfs", iter_raw_dfs)
+    monkeypatch.setattr(cleaning_task, "skip_unchanged_offers", lambda df, data_type: df)
+    monkeypatch.setattr(cleaning_task, "read_value_cache", lambda data_type: {})
+    monkeypatch.setattr(cleaning_task, "save_value_cache", lambda data_type, value_cache: None)
+    monkeypatch.setattr(cleaning_task, "save_df", lambda df, path, keyword, dtype: saved.update({keyword: df}))
+    monkeypatch.setattr(cleaning_task, "CLEAN_CACHE_PATH", str(tmp_path / "{data_type}"))
+
+    rows = cleaning_task.clean_morizon_data("sale")
+    assert len(read_dfs) == len(raw_paths)
+    assert rows == len(saved["clean"]) == saved["offers_info"][columns.OFFER_ID].nunique()
+
+
+def test_workers_are_not_forked_while_raw_files_are_read_ahead(tmp_path, monkeypatch):
+    df = pd.read_csv(os.path.join(FIXTURES_DIR, "raw_sale.csv"))
+    fs = FsClient(root=str(tmp_path))
+    raw_paths = [f"flats-data/sale/raw/sale_raw_2021_01_0{n}T10_00_00.csv" for n in range(1, 6)]
+    os.makedirs(fs.get_full_path("flats-data/sale/raw"))
+    for n, raw_path in enumerate(raw_paths):
+        fs.save_df(df.sample(200, random_state=n), raw_path)
+
+    saved = {}
+    monkeypatch.setattr(cleaning_task, "fs", fs)
+    monkeypatch.setattr(cleaning_task, "get_process_from_date", lambda *args, **kwargs: None)
+    monkeypatch.setattr(cleaning_task, "get_raw_paths", lambda data_type, from_date: raw_paths)
+    monkeypatch.setattr(cleaning_task, "skip_unchanged_offers", lambda df, data_type: df)
+    monkeypatch.setattr(cleaning_task, "read_value_cache", lambda data_type: {})
+    monkeypatch.setattr(cleaning_task, "save_value_cache", lambda data_type, value_cache: None)
+    monkeypatch.setattr(cleaning_task, "save_df", lambda df, path, keyword, dtype: saved.update({keyword: df}))
+    monkeypatch.setattr(cleaning_task, "READ_PREFETCH", 4)
+    monkeypatch.setattr(cleaning_task, "CHUNK_SIZE", 50)
+
+    threads_at_fork = []
+
+    def clean_batches_in_parallel(batches, value_cache, workers):
+        threads_at_fork.append([thread for thread in threading.enumerate() if thread is not threading.main_thread()])
+        return parallel_clean(batches, value_cache, workers)
+
+    parallel_clean = cleaning_task.clean_batches_in_parallel
+    monkeypatch.setattr(cleaning_task, "clean_batches_in_parallel", clean_batches_in_parallel)
+    monkeypatch.setattr(cleaning_task, "CLEANING_WORKERS", 2)
+    monkeypatch.setattr(cleaning_task, "CLEAN_CACHE_PATH", str(tmp_path / "parallel/{data_type}"))
+    cleaning_task.clean_morizon_data("sale")
+    assert len(threads_at_fork) == len(raw_paths)
+    assert not any(threads_at_fork)
+    parallel = saved["clean"]
+
+    monkeypatch.setattr(cleaning_task, "CLEANING_WORKERS", 1)
+    monkeypatch.setattr(cleaning_task, "CLEAN_CACHE_PATH", str(tmp_path / "sequential/{data_type}"))
+    cleaning_task.clean_morizon_data("sale")
+    pd.testing.assert_frame_equal(parallel, saved["clean"])
+
+
+def test_offers_info_gives_url_and_title_of_last_raw_row():
+    raw_df = pd.DataFrame({
+        columns.OFFER_ID: ["a", "b", "a"],
+        columns.URL: ["url a1", "url b", "url a2"],
+        columns.TITLE: ["title a1", "title b", "title a2"],
+        columns.PRICE: [1, 2, 3],
+    })
+    predicted_df = pd.DataFrame({columns.OFFER_ID: ["a", "b", "a"], columns.PRICE: [1, 2, 3]})
+    df = merge_offers_info(predicted_df, get_offers_info(raw_df))
+    assert df[columns.URL].tolist() == ["url b", "url a2"]
+    assert df[columns.TITLE].tolist() == ["title b", "title a2"]
+    assert df[columns.PRICE].tolist() == [2, 3]
+
+
+def test_concat_dfs_drops_same_rows_as_drop_duplicates_of_all_columns():
+    df = pd.read_csv(os.path.join(FIXTURES_DIR, "raw_sale.csv"))
+    dfs = [df.sample(200, replace=True, random_state=n).reset_index(drop=True) for n in range(4)]
+    # other file without a column, ints read as floats and changed rows
+    dfs[1] = dfs[1].drop(columns=[columns.HEATING])
+    dfs[2] = dfs[2].astype({columns.VIEW_COUNT: float})
+    dfs[3].loc[:50, columns.VIEW_COUNT] += 1
+
+    expected = pd.concat(dfs, keys=range(len(dfs)), sort=True).drop_duplicates(keep="last")
+    pd.testing.assert_frame_equal(concat_dfs(iter(dfs)), expected)
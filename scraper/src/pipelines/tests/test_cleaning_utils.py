@@ -0,0 +1,55 @@
+import json
+import os
+
+import pandas as pd
+
+from pipelines.process.cleaning_utils import MorizonCleaner, map_unique, match_keywords
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def read_fixture(name):
+    with open(os.path.join(FIXTURES_DIR, name)) as f:
+        return f.read()
+
+
+def test_clean_matches_golden_output():
+    # golden output was produced by row by row (Series.apply) cleaner
+    df = pd.read_csv(os.path.join(FIXTURES_DIR, "raw_sale.csv"))
+    output = MorizonCleaner(df).clean().to_csv(index=False)
+    assert output == read_fixture("clean_sale.csv")
+
+
+def test_clean_with_warm_value_cache_matches_golden_output():
+    df = pd.read_csv(os.path.join(FIXTURES_DIR, "raw_sale.csv"))
+    value_cache = {}
+    MorizonCleaner(df, value_cache).clean()
+    # cache is persisted as json between runs
+    value_cache = json.loads(json.dumps(value_cache))
+    output = MorizonCleaner(df, value_cache).clean().to_csv(index=False)
+    assert output == read_fixture("clean_sale.csv")
+
+
+def test_map_unique_maps_only_values_missing_from_cache():
+    mapped_values = []
+
+    def mapping(values):
+        mapped_values.extend(values.dropna())
+        return values.str.upper()
+
+    cache = {"a": "cached"}
+    output = map_unique(pd.Series(["a", "b", "a", "b"]), mapping, cache)
+    assert list(output) == ["cached", "B", "cached", "B"]
+    assert mapped_values == ["b"]
+    assert cache == {"a": "cached", "b": "B"}
+
+
+def test_match_keywords_handles_negations_and_overlapping_words():
+    outputs = {
+        "gas": ([(["gaz (brak"], 0), (["gaz"], 1)], "no_info"),
+        "sewers": ([(["kanalizacja"], 1)], 0),
+    }
+    values = pd.Series(["gaz, gaz (brak)", "gaz", "woda", "gaz (brakanalizacja"])
+    output = match_keywords(values, outputs)
+    assert list(output["gas"]) == [0, 1, "no_info", 0]
+    assert list(output["sewers"]) == [0, 0, 0, 1]
@@ -0,0 +1,38 @@
+import numpy as np
+import pandas as pd
+
+import columns
+from column_types import compact_df
+
+
+def test_columns_get_compact_types_without_changing_values():
+    df = pd.DataFrame({
+        columns.LIFT: [0.0, 1.0, 1.0],
+        columns.MARKET_TYPE: [1.0, np.nan, 0.0],
+        columns.VIEW_COUNT: [10, 2000, 300],
+        columns.PRICE: [445000.0, 1391000.0, 374000.0],
+        columns.DATE_ADDED: ["2021-01-05", "2021-01-05", "2021-01-21"],
+        columns.OFFER_ID: ["mzn1", "mzn2", "mzn3"],
+    })
+    compact = compact_df(df, "clean")
+    assert compact.dtypes.astype(str).to_dict() == {
+        columns.LIFT: "int8",
+        columns.MARKET_TYPE: "float32",
+        columns.VIEW_COUNT: "int32",
+        columns.PRICE: "float32",
+        columns.DATE_ADDED: "category",
+        columns.OFFER_ID: "object",
+    }
+    pd.testing.assert_frame_equal(compact, df, check_dtype=False, check_categorical=False)
+    assert compact.memory_usage(deep=True).sum() < df.memory_usage(deep=True).sum()
+
+
+def test_columns_which_do_not_fit_are_kept():
+    df = pd.DataFrame({
+        columns.LIFT: [0.0, 1.0, "no_info"],
+        columns.FLOOR: [1.0, 2.5, 100000.0],
+        columns.BUILDING_TYPE: [1, 2, 300],
+        columns.PRICE_M2: [73172.01, 4792.16, 6769.67],
+        columns.LAT: [50.92884, 49.823847, 54.433902],
+    })
+    pd.testing.assert_frame_equal(compact_df(df, "clean"), df)
@@ -0,0 +1,76 @@
+import os
+
+import pandas as pd
+import pytest
+
+import columns
+from pipelines.process import fingerprints
+from pipelines.process.fingerprints import commit_fingerprints, skip_unchanged_offers, skip_unchanged_rows
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    monkeypatch.setattr(fingerprints, "FINGERPRINTS_PATH", str(tmp_path / "{data_type}.csv"))
+    monkeypatch.setattr(fingerprints, "PENDING_FINGERPRINTS_PATH", str(tmp_path / "{data_type}_pending.csv"))
+    versions = {"sale": "v1"}
+    monkeypatch.setattr(fingerprints, "get_versions", lambda data_type: versions[data_type])
+    return versions
+
+
+def test_skip_unchanged_offers_after_commit(store):
+    df = pd.read_csv(os.path.join(FIXTURES_DIR, "raw_sale.csv"))
+    assert len(skip_unchanged_offers(df, "sale")) == len(df)
+    # nothing is skipped until fingerprints are committed after upload
+    assert len(skip_unchanged_offers(df, "sale")) == len(df)
+    commit_fingerprints("sale")
+    assert skip_unchanged_offers(df, "sale").empty
+    # same numbers read as floats, eg. when other raw file has missing values
+    assert skip_unchanged_offers(df.astype({columns.VIEW_COUNT: float}), "sale").empty
+
+    changed = df.copy()
+    changed.loc[3, columns.PRICE] += 1
+    assert skip_unchanged_offers(changed, "sale").index.tolist() == [3]
+
+    store["sale"] = "v2"
+    assert len(skip_unchanged_offers(df, "sale")) == len(df)
+
+
+def test_only_last_row_of_offer_is_compared(store):
+    df = pd.read_csv(os.path.join(FIXTURES_DIR, "raw_sale.csv"))[:2]
+    df[columns.OFFER_ID] = "offer"
+    skip_unchanged_offers(df, "sale")
+    commit_fingerprints("sale")
+    assert skip_unchanged_offers(df, "sale").empty
+    assert len(skip_unchanged_offers(df[::-1], "sale")) == 2
+
+
+def test_rows_repeated_or_unchanged_are_skipped_file_by_file(store):
+    df = pd.read_csv(os.path.join(FIXTURES_DIR, "raw_sale.csv"))
+    first, second = df[:60].reset_index(drop=True), df[40:100].reset_index(drop=True)
+    kept = list(skip_unchanged_rows([first, second], "sale"))
+    assert [len(kept_df) for kept_df in kept] == [60, 40]
+    assert kept[1].index.tolist() == list(range(20, 60))
+
+    commit_fingerprints("sale")
+    changed = second.copy()
+    changed.loc[5, columns.PRICE] += 1
+    kept = list(skip_unchanged_rows([first, changed], "sale"))
+    assert [kept_df.index.tolist() for kept_df in kept] == [[], [5]]
+    pending = fingerprints.read_fingerprints(fingerprints.PENDING_FINGERPRINTS_PATH.format(data_type="sale"))
+    assert pending.index.tolist() == [changed.loc[5, columns.OFFER_ID]]
+
+
+def test_offer_changed_back_ends_with_its_last_row(store):
+    df = pd.read_csv(os.path.join(FIXTURES_DIR, "raw_sale.csv"))[:1]
+    list(skip_unchanged_rows([df], "sale"))
+    commit_fingerprints("sale")
+    changed = df.copy()
+    changed[columns.PRICE] += 1
+    kept = list(skip_unchanged_rows([changed, df], "sale"))
+    # uploaded in this order, so the database ends with the unchanged row
+    assert [kept_df[columns.PRICE].tolist() for kept_df in kept] == [
+        changed[columns.PRICE].tolist(),
+        df[columns.PRICE].tolist(),
+    ]
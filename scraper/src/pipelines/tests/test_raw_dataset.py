@@ -0,0 +1,81 @@
+import os
+from datetime import datetime
+
+import pandas as pd
+import pytest
+
+import columns
+import fs_client
+from fs_client import FsClient
+from pipelines import raw_dataset
+from pipelines.process.cleaning_task import COLUMNS_TO_SKIP
+from pipelines.raw_dataset import RAW_SCHEMA, get_raw_dataset_paths, save_raw_partition
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+@pytest.fixture
+def fs(tmp_path, monkeypatch):
+    fs = FsClient(root=str(tmp_path))
+    monkeypatch.setattr(raw_dataset, "fs", fs)
+    return fs
+
+
+@pytest.fixture
+def raw_df():
+    return pd.read_csv(os.path.join(FIXTURES_DIR, "raw_sale.csv"))
+
+
+def test_raw_partition_is_read_as_csv_with_selected_columns(fs, raw_df):
+    path = save_raw_partition(raw_df, "sale", datetime(2021, 1, 1, 10), "raw_sale_2021_01_01T10_00_00.parquet")
+    assert path.endswith("data_type=sale/scrape_date=2021-01-01/raw_sale_2021_01_01T10_00_00.parquet")
+
+    df = fs.read_df(path, columns_to_skip=COLUMNS_TO_SKIP)
+    assert not set(COLUMNS_TO_SKIP) & set(df.columns)
+    # raw columns missing from csv are empty
+    assert df[columns.WATER].isna().all()
+    pd.testing.assert_frame_equal(df[raw_df.columns], raw_df)
+
+
+def test_raw_schema_is_the_same_in_all_partitions(fs, raw_df):
+    # numbers of other file are read as floats, some columns are missing
+    other_df = raw_df.astype({columns.VIEW_COUNT: float}).drop(columns=[columns.BUILDING_TYPE])
+    other_df.loc[0, columns.FLOOR] = 3
+    paths = [
+        save_raw_partition(raw_df, "sale", datetime(2021, 1, 1, 10), "raw_sale_2021_01_01T10_00_00.parquet"),
+        save_raw_partition(other_df, "sale", datetime(2021, 1, 2, 10), "raw_sale_2021_01_02T10_00_00.parquet"),
+    ]
+    dfs = [fs.read_df(path) for path in paths]
+    pd.testing.assert_series_equal(dfs[0].dtypes, dfs[1].dtypes)
+    assert dfs[1].loc[0, columns.FLOOR] == "3"
+
+
+def test_raw_dataset_paths_are_filtered_by_data_type_and_date(fs, raw_df):
+    for data_type, dt in (
+        ("sale", datetime(2021, 1, 2, 10)),
+        ("sale", datetime(2021, 1, 1, 10)),
+        ("sale", datetime(2021, 1, 1, 20)),
+        ("rent", datetime(2021, 1, 2, 10)),
+    ):
+        save_raw_partition(raw_df[:10], data_type, dt, f"raw_{data_type}_{dt:%Y_%m_%dT%H_%M_%S}.parquet")
+
+    names = [path.split("/")[-1] for path in get_raw_dataset_paths("sale", datetime(2021, 1, 1, 12))]
+    assert names == ["raw_sale_2021_01_01T20_00_00.parquet", "raw_sale_2021_01_02T10_00_00.parquet"]
+    assert len(get_raw_dataset_paths("sale")) == 3
+    assert get_raw_dataset_paths("rent", datetime(2021, 1, 3)) == []
+
+
+@pytest.mark.parametrize("engine", ["c", "pyarrow"])
+def test_raw_csv_files_are_read_in_order(fs, raw_df, engine, monkeypatch):
+    monkeypatch.setattr(fs_client, "CSV_ENGINE", engine)
+    os.makedirs(fs.get_full_path("flats-data/sale/raw"))
+    paths = []
+    for day in range(1, 6):
+        path = f"flats-data/sale/raw/raw_sale_2021_01_{day:02d}T10_00_00.csv"
+        fs.save_df(raw_df[:day * 10], path)
+        paths.append(path)
+
+    dfs = list(fs.iter_dfs(paths, columns_to_skip=COLUMNS_TO_SKIP, schema=RAW_SCHEMA, prefetch=3))
+    assert [len(df) for df in dfs] == [10, 20, 30, 40, 50]
+    expected = raw_df.drop(columns=[col for col in COLUMNS_TO_SKIP if col in raw_df])[:50]
+    pd.testing.assert_frame_equal(dfs[-1], expected)
@@ -0,0 +1,141 @@
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime
+import os
+import time
+
+import boto3
+import numpy as np
+import pandas as pd
+import pytest
+
+import fs_client
+from fs_client import S3FsClient
+
+moto = pytest.importorskip("moto")
+
+BUCKET = "flats-data"
+RAW_DIR = f"{BUCKET}/sale/raw"
+FINAL_PATH = f"{BUCKET}/sale/final/sale_final_2021_01_01T10_00_00.csv"
+# smallest part size accepted by S3
+CHUNK_SIZE = 5 * 1024 * 1024
+
+
+@pytest.fixture
+def s3(monkeypatch):
+    for name in ("AWS_ACCESS_KEY_ID", "AWS_SECRET_ACCESS_KEY", "AWS_SECURITY_TOKEN", "AWS_SESSION_TOKEN"):
+        monkeypatch.setenv(name, "testing")
+    monkeypatch.setenv("AWS_DEFAULT_REGION", "us-east-1")
+    # newer botocore sends parts with checksums in a framing moto does not decode
+    monkeypatch.setenv("AWS_REQUEST_CHECKSUM_CALCULATION", "when_required")
+    # clients are shared per process, they have to be created within mock
+    monkeypatch.setattr(fs_client, "_s3_clients", {})
+    with moto.mock_s3():
+        client = boto3.client("s3")
+        client.create_bucket(Bucket=BUCKET)
+        yield client
+
+
+def make_fs(tmp_path, name="cache", **kwargs):
+    return S3FsClient(cache_dir=str(tmp_path / name), chunk_size=CHUNK_SIZE, **kwargs)
+
+
+def raw_path(day):
+    return f"{RAW_DIR}/raw_sale_2021_01_{day:02d}T10_00_00.csv"
+
+
+def test_df_is_read_from_cache_until_object_changes(s3, tmp_path, monkeypatch):
+    fs = make_fs(tmp_path)
+    df = pd.DataFrame({"a": [1, 2], "b": ["x", "y"]})
+    fs.save_df(df, raw_path(1))
+    assert s3.head_object(Bucket=BUCKET, Key="sale/raw/raw_sale_2021_01_01T10_00_00.csv")
+
+    with monkeypatch.context() as m:
+        m.setattr(fs.client, "download_file", lambda *args, **kwargs: pytest.fail("file was downloaded"))
+        pd.testing.assert_frame_equal(fs.read_df(raw_path(1)), df)
+
+    # same object written by client with other cache
+    changed_df = df.assign(a=[3, 4])
+    make_fs(tmp_path, "other_cache").save_df(changed_df, raw_path(1))
+    pd.testing.assert_frame_equal(fs.read_df(raw_path(1)), changed_df)
+
+
+def test_big_files_are_transferred_in_parts(s3, tmp_path):
+    df = pd.DataFrame(np.random.RandomState(0).rand(150000, 5), columns=list("abcde"))
+    make_fs(tmp_path).save_df(df, raw_path(1))
+    etag = s3.head_object(Bucket=BUCKET, Key="sale/raw/raw_sale_2021_01_01T10_00_00.csv")["ETag"]
+    # etag of multipart upload ends with number of parts
+    assert etag.strip('"').endswith("-3")
+
+    pd.testing.assert_frame_equal(make_fs(tmp_path, "other_cache").read_df(raw_path(1)), df)
+
+
+def test_least_recently_used_files_are_evicted_from_cache(s3, tmp_path):
+    df = pd.DataFrame({"a": range(1000)})
+    file_size = len(df.to_csv(index=False))
+    fs = make_fs(tmp_path, cache_max_bytes=2.5 * file_size)
+    for day in (1, 2, 3):
+        fs.save_df(df, raw_path(day))
+        fs.read_df(raw_path(1))
+    cached = [day for day in (1, 2, 3) if os.path.exists(fs.get_full_path(raw_path(day)))]
+    assert cached == [1, 3]
+    pd.testing.assert_frame_equal(fs.read_df(raw_path(2)), df)
+
+
+def test_newest_files_are_found_in_catalog_shared_by_clients(s3, tmp_path):
+    fs = make_fs(tmp_path)
+    df = pd.DataFrame({"a": [1]})
+    for day in (2, 3, 1):
+        fs.save_df(df, raw_path(day))
+    # file not saved by client is found when directory is indexed
+    s3.put_object(Bucket=BUCKET, Key="sale/final/sale_final_2021_01_04T10_00_00.csv", Body=b"a\n1\n")
+
+    other_fs = make_fs(tmp_path, "other_cache")
+    assert other_fs.get_newest_path(RAW_DIR) == raw_path(3)
+    assert other_fs.list_newer_than(RAW_DIR, datetime(2021, 1, 1, 12)) == [raw_path(2), raw_path(3)]
+    assert other_fs.read_newest_df(f"{BUCKET}/{{data_type}}/final", dtype="sale").equals(df)
+    fs.save_df(df, raw_path(4))
+    assert other_fs.get_newest_path(RAW_DIR) == raw_path(4)
+    # object uploaded not by client after directory was indexed is found by
+    # next client, LastModified has resolution of a second
+    time.sleep(1)
+    s3.put_object(Bucket=BUCKET, Key="sale/raw/raw_sale_2021_01_05T10_00_00.csv", Body=b"a\n1\n")
+    assert other_fs.get_newest_path(RAW_DIR) == raw_path(4)
+    assert make_fs(tmp_path, "next_cache").get_newest_path(RAW_DIR) == raw_path(5)
+
+
+def test_dataset_partitions_are_listed_as_directories(s3, tmp_path):
+    fs = make_fs(tmp_path)
+    df = pd.DataFrame({"a": [1]})
+    for day in (1, 2):
+        fs.save_to_dataset(df, f"{BUCKET}/dataset", {"data_type": "sale", "scrape_date": f"2021-01-0{day}"}, "data.parquet")
+    paths = fs.list_dataset(f"{BUCKET}/dataset", {"scrape_date": lambda value: value > "2021-01-01"})
+    assert paths == [f"{BUCKET}/dataset/data_type=sale/scrape_date=2021-01-02/data.parquet"]
+    pd.testing.assert_frame_equal(fs.read_df(paths[0], columns_to_skip=["b"]), df)
+
+
+def test_clients_saving_at_once_keep_all_catalog_entries(s3, tmp_path):
+    df = pd.DataFrame({"a": [1]})
+    clients = [make_fs(tmp_path, f"cache_{i}") for i in range(3)]
+
+    def save(i):
+        for day in range(1, 8):
+            clients[i].save_df(df, f"{RAW_DIR}/raw_sale_2021_01_{day:02d}T{i:02d}_00_00.csv")
+
+    with ThreadPoolExecutor(len(clients)) as executor:
+        list(executor.map(save, range(len(clients))))
+    assert len(make_fs(tmp_path, "reader").get_catalog(RAW_DIR).list(RAW_DIR)) == 7 * len(clients)
+
+
+def test_appended_file_is_uploaded_once(s3, tmp_path, monkeypatch):
+    fs = make_fs(tmp_path)
+    dfs = [pd.DataFrame({"a": [i, i + 1]}) for i in range(0, 6, 2)]
+    puts = []
+    put = fs.put
+    monkeypatch.setattr(fs, "put", lambda path: puts.append(path) or put(path))
+    for df in fs.append_dfs(dfs, FINAL_PATH):
+        assert not puts
+    assert puts == [FINAL_PATH]
+
+    fs.append_df(pd.DataFrame({"a": [6]}), FINAL_PATH)
+    pd.testing.assert_frame_equal(make_fs(tmp_path, "other_cache").read_df(FINAL_PATH), pd.DataFrame({"a": range(7)}))
+    assert fs.get_catalog(FINAL_PATH).get(FINAL_PATH)["rows"] == 7
@@ -0,0 +1,72 @@
+import os
+
+import pytest
+
+from common import COORDS_MAP_MODELS_PATH, MODELS_PATH
+from fs_client import FsClient
+from pipelines.process import fingerprints, process, stages
+from pipelines.process.stages import StageManifest, UnknownStageError
+
+STAGES = ["clean", "features", "upload"]
+
+
+@pytest.fixture(autouse=True)
+def manifest_path(tmp_path, monkeypatch):
+    monkeypatch.setattr(stages, "STAGES_MANIFEST_PATH", str(tmp_path / "{data_type}_stages.json"))
+
+
+def test_stage_is_fresh_until_inputs_or_output_change(tmp_path):
+    output = tmp_path / "clean.csv"
+    output.write_text("a,b\n1,2\n")
+    manifest = StageManifest("sale", STAGES)
+    assert not manifest.is_fresh("clean", {"raw": "1"})
+    manifest.record("clean", {"raw": "1"}, str(output), rows=1)
+
+    manifest = StageManifest("sale", STAGES)
+    assert manifest.is_fresh("clean", {"raw": "1"})
+    assert manifest.get("clean", "rows") == 1
+    assert not manifest.is_fresh("clean", {"raw": "2"})
+    output.write_text("a,b\n1,3\n")
+    assert not manifest.is_fresh("clean", {"raw": "1"})
+
+
+def test_forced_stage_and_all_after_it_are_not_fresh():
+    manifest = StageManifest("sale", STAGES)
+    for stage in STAGES:
+        manifest.record(stage, {})
+
+    manifest = StageManifest("sale", STAGES, force_stage="features")
+    assert [manifest.is_fresh(stage, {}) for stage in STAGES] == [True, False, False]
+    with pytest.raises(UnknownStageError):
+        StageManifest("sale", STAGES, force_stage="scrape")
+
+
+def test_new_model_reruns_clean_which_skipped_all_offers(tmp_path, monkeypatch):
+    fs = FsClient(root=str(tmp_path))
+    models_dir = MODELS_PATH.format(data_type="sale")
+    os.makedirs(fs.get_full_path(models_dir))
+    os.makedirs(fs.get_full_path(COORDS_MAP_MODELS_PATH.format(data_type="sale")))
+    fs.save_model({"version": 1}, models_dir + "/sale_model_2021_01_01T00_00_00.joblib")
+    for module in (process, fingerprints):
+        monkeypatch.setattr(module, "fs", fs)
+    monkeypatch.setattr(process, "LOCAL_ROOT", str(tmp_path))
+    monkeypatch.setattr(fingerprints, "FINGERPRINTS_PATH", str(tmp_path / "{data_type}_fingerprints.csv"))
+    monkeypatch.setattr(process, "FINGERPRINTS_PATH", str(tmp_path / "{data_type}_fingerprints.csv"))
+    monkeypatch.setattr(process, "get_process_from_date", lambda *args, **kwargs: None)
+    monkeypatch.setattr(process, "get_raw_paths", lambda dtype, from_date: [])
+    cleaned = []
+
+    def clean(dtype):
+        # all offers were already uploaded with current versions
+        cleaned.append(fingerprints.get_versions(dtype))
+        return 0
+
+    monkeypatch.setattr(process, "clean", clean)
+    assert process.process_stages("sale") is None
+    assert process.process_stages("sale") is None
+    assert len(cleaned) == 1
+
+    fs.save_model({"version": 2}, models_dir + "/sale_model_2021_02_01T00_00_00.joblib")
+    assert process.process_stages("sale") is None
+    assert len(cleaned) == 2
+    assert "sale_model_2021_02_01T00_00_00.joblib" in cleaned[-1]
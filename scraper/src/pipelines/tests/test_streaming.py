@@ -0,0 +1,79 @@
+import gc
+import os
+import weakref
+
+import numpy as np
+import pandas as pd
+import pytest
+
+import columns
+from fs_client import FsClient
+from pipelines.process import fingerprints, streaming
+from pipelines.process.streaming import threaded
+
+FIXTURES_DIR = os.path.join(os.path.dirname(__file__), "fixtures")
+
+
+def test_threaded_keeps_batches_order():
+    assert list(threaded(iter(range(10)), queue_size=1)) == list(range(10))
+
+
+def test_threaded_raises_producer_error():
+    def batches():
+        yield 1
+        raise ValueError("broken batch")
+
+    output = threaded(batches())
+    assert next(output) == 1
+    with pytest.raises(ValueError, match="broken batch"):
+        next(output)
+
+
+class ConstantModel:
+    def predict(self, inputs):
+        return np.full(len(inputs), 10000.0)
+
+
+def test_raw_files_are_streamed_one_at_a_time(tmp_path, monkeypatch):
+    df = pd.read_csv(os.path.join(FIXTURES_DIR, "raw_sale.csv"))
+    raw_paths = [f"sale_raw_{n}.csv" for n in range(4)]
+    read_dfs = []
+
+    def iter_raw_dfs(paths):
+        for n, _ in enumerate(paths):
+            gc.collect()
+            # only the previous raw df can still be referenced
+            assert all(ref() is None for ref in read_dfs[:-1])
+            raw_df = df.sample(100, random_state=n).reset_index(drop=True)
+            read_dfs.append(weakref.ref(raw_df))
+            yield raw_df
+
+    fs = FsClient(root=str(tmp_path))
+    os.makedirs(fs.get_full_path("flats-data/sale/final"))
+    coords_map = pd.DataFrame({
+        columns.LAT: [52.2, 50.06],
+        columns.LON: [21.0, 19.94],
+        columns.CLUSTER_MEAN_PRICE_M2: [12000.0, 10000.0],
+    })
+    uploaded = []
+    monkeypatch.setattr(streaming, "fs", fs)
+    monkeypatch.setattr(fs, "read_newest_model", lambda directory, dtype: ConstantModel())
+    monkeypatch.setattr(fs, "read_newest_df", lambda directory, dtype: coords_map)
+    monkeypatch.setattr(streaming, "get_process_from_date", lambda *args, **kwargs: None)
+    monkeypatch.setattr(streaming, "get_raw_paths", lambda data_type, from_date: raw_paths)
+    monkeypatch.setattr(streaming, "iter_raw_dfs", iter_raw_dfs)
+    monkeypatch.setattr(streaming, "read_value_cache", lambda data_type: {})
+    monkeypatch.setattr(streaming, "save_value_cache", lambda data_type, value_cache: None)
+    monkeypatch.setattr(fingerprints, "FINGERPRINTS_PATH", str(tmp_path / "{data_type}.csv"))
+    monkeypatch.setattr(fingerprints, "PENDING_FINGERPRINTS_PATH", str(tmp_path / "{data_type}_pending.csv"))
+    monkeypatch.setattr(fingerprints, "get_versions", lambda data_type: "v1")
+    monkeypatch.setattr(streaming, "upload_batches", lambda batches: uploaded.extend(batches) or True)
+    monkeypatch.setattr(streaming, "STREAM_BATCH_SIZE", 30)
+
+    assert streaming.process_stream("sale")
+    assert len(read_dfs) == len(raw_paths)
+    offers = pd.concat(uploaded).drop_duplicates(subset="offer_id", keep="last")
+    assert not offers.empty
+    # url dropped by cleaner is joined back from raw rows
+    urls = df.drop_duplicates(subset=columns.OFFER_ID).set_index(columns.OFFER_ID)[columns.URL]
+    assert offers["url"].tolist() == urls[offers["offer_id"]].tolist()
@@ -0,0 +1,19 @@
+import pandas as pd
+
+from pipelines.process import upload_to_db
+
+
+def test_invalid_offers_do_not_fail_upload(monkeypatch):
+    responses = iter([
+        {"inserted": 2, "updated": 0, "unchanged": 0, "invalid": 1, "invalid_offer_ids": ["mzn3"]},
+        {"inserted": 1, "updated": 0, "unchanged": 0, "invalid": 0, "invalid_offer_ids": []},
+    ])
+    monkeypatch.setattr(upload_to_db, "upload_batch", lambda session, df: next(responses))
+    batches = [pd.DataFrame({"offer_id": ["mzn1", "mzn2", "mzn3"]}), pd.DataFrame({"offer_id": ["mzn4"]})]
+    assert upload_to_db.upload_batches(batches)
+
+
+def test_failed_batch_fails_upload(monkeypatch):
+    responses = iter([{"inserted": 1}, {}])
+    monkeypatch.setattr(upload_to_db, "upload_batch", lambda session, df: next(responses))
+    assert not upload_to_db.upload_batches([pd.DataFrame({"offer_id": ["mzn1"]})] * 2)
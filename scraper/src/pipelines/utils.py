@@ -6,6 +6,7 @@ import pandas as pd
 from shapely.geometry import MultiPoint, Point
 
 import columns as c
+from column_types import compact_df
 
 log = logging.getLogger(__name__)
 
@@ -41,17 +42,20 @@ def add_point_col(df: pd.DataFrame) -> pd.DataFrame:
     df['point'] = [Point(x, y) for x, y in zip(df[c.LON], df[c.LAT])]
     return df
 
+def get_df_path(path, keyword, dtype, extension="csv"):
+    return path + f"/{dtype}_{keyword}.{extension}"
+
 def read_df(path, keyword, dtype, extension="csv"):
-    path += f"/{dtype}_{keyword}.{extension}"
+    path = get_df_path(path, keyword, dtype, extension)
     if extension != 'csv':
         raise InvalidExtensionException
     log.info(f"Reading {keyword} {dtype} dataframe from {path}")
-    return pd.read_csv(path)
+    return compact_df(pd.read_csv(path), keyword)
 
 def save_df(df, path, keyword, dtype, extension="csv"):
-    path += f"/{dtype}_{keyword}.{extension}"
+    path = get_df_path(path, keyword, dtype, extension)
     extension = path.split(".")[-1]
     if extension != 'csv':
         raise InvalidExtensionException
     log.info(f"Saving {keyword} {dtype} dataframe to {path}")
-    return df.to_csv(path, index=False)
+    return compact_df(df, keyword).to_csv(path, index=False)
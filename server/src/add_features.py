@@ -1,73 +1,93 @@
 """
 Add coord-related features.
 """
+import logging
+import threading
+
 import pandas as pd
 import numpy as np
 
 from geopy.distance import great_circle
-from shapely.geometry import MultiPoint, Point
-from shapely.ops import nearest_points
 
+from coords_index import CoordsIndex
 from fs_client import FsClient
 import columns as c
 
+log = logging.getLogger(__name__)
+
+COORDS_MAP_PATH = "flats-models/{data_type}/coords_encoding"
+# how often (in seconds) to check if a newer coords map was saved
+COORDS_MAP_CHECK_INTERVAL = 60
+
 fs = FsClient()
-coords_map = fs.read_newest_df(
-    "flats-models/{data_type}/coords_encoding",
-    dtype="sale"
-)
+coords_features = None
+# set to stop thread started by start_coords_features_refresh
+stop_refresh = threading.Event()
 
 
-def get_coords_factor(lon, lat):
-    df = pd.DataFrame(
-        {
-            c.LON: [lon],
-            c.LAT: [lat],
-        }
-    )
-    df = df.pipe(add_coords_features, coords_map=coords_map)
-    return df[c.CLUSTER_COORDS_FACTOR][0]
+class CoordsFeatures:
+    """
+    Coords map with spatial index and per center attributes precomputed,
+    so single point lookups do not need to touch pandas.
+    """
+    def __init__(self, coords_map, path=None):
+        self.path = path
+        self.index = CoordsIndex(coords_map)
+        self.mean_price_m2 = coords_map[c.CLUSTER_MEAN_PRICE_M2].to_numpy(dtype=float)
 
+    def get_coords_factor(self, lon, lat):
+        center_pos, center_dist = self.index.query([lon], [lat])
+        mean_price_m2 = self.mean_price_m2[center_pos[0]]
+        return mean_price_m2 + (mean_price_m2 / (center_dist[0] + 1))
 
-def add_coords_features(df, coords_map):
-    coords_map = add_point_col(coords_map)
-    coords_map_multipoint = MultiPoint(coords_map['point'])
-    df = add_point_col(df)
-    df['closest_center'] = df.apply(
-        lambda row: nearest_points(row['point'], coords_map_multipoint)[1], axis=1)
-    df = add_distance_col(df)
-    # unzip points to two columns in map and df - merge on these two columns
-    df = unzip_point_to_lon_and_lat(df, 'closest_center')
-    center_colnames = ['unziped_lat_closest_center', 'unziped_lon_closest_center']
-
-    df = pd.merge(df,
-                  coords_map,
-                  left_on=center_colnames,
-                  right_on=[c.LAT, c.LON],
-                  how='left',
-                  suffixes=('', 'duplicate')
-                  )
-
-    for col in df.columns:
-        if 'duplicate' in col or col in center_colnames + ['point']:
-            df = df.drop(col, axis=1)
 
-    df = df.pipe(add_coords_factor_col)
+def refresh_coords_features(data_type="sale"):
+    """ (Re)build coords features if there is a newer coords map. """
+    global coords_features
+    directory = COORDS_MAP_PATH.format(data_type=data_type)
+    newest_path = fs.get_newest_path(directory)
+    if coords_features is None or coords_features.path != newest_path:
+        coords_features = CoordsFeatures(fs.read_df(newest_path), path=newest_path)
+    return coords_features
 
-    cols_to_round = [c.CLUSTER_MEAN_PRICE_M2, c.CLUSTER_CENTER_DIST_KM]
-    df.loc[:,cols_to_round] = df.loc[:,cols_to_round].round(2)
 
-    return df
+def refresh_coords_features_every(interval):
+    while not stop_refresh.wait(interval):
+        try:
+            refresh_coords_features()
+        except Exception:
+            log.exception("Failed to refresh coords features, keeping loaded ones")
 
 
-def add_distance_col(df):
-    df['lon1'] = df['closest_center'].map(lambda point: point.x)
-    df['lat1'] = df['closest_center'].map(lambda point: point.y)
+def start_coords_features_refresh(interval=COORDS_MAP_CHECK_INTERVAL):
+    """
+    Check for a newer coords map every interval seconds in a background
+    thread, so requests only read coords features loaded before.
+    """
+    stop_refresh.clear()
+    thread = threading.Thread(target=refresh_coords_features_every, args=(interval,), daemon=True)
+    thread.start()
+    return thread
 
-    df['lon2'] = df['point'].map(lambda point: point.x)
-    df['lat2'] = df['point'].map(lambda point: point.y)
 
-    df[c.CLUSTER_CENTER_DIST_KM] = get_haversine_dist(df['lon1'], df['lat1'], df['lon2'], df['lat2'])
+def get_coords_factor(lon, lat):
+    """ Coords factor from coords features loaded at startup or by refresh thread. """
+    return coords_features.get_coords_factor(lon, lat)
+
+
+def add_coords_features(df, coords_map):
+    center_pos, center_dist = CoordsIndex(coords_map).query(df[c.LON], df[c.LAT])
+    df[c.CLUSTER_CENTER_DIST_KM] = center_dist
+    # take attributes of closest center by its position in coords map,
+    # columns already present in df (eg. lat/lon) are not overwritten
+    for col in coords_map.columns:
+        if col not in df.columns:
+            df[col] = coords_map[col].to_numpy()[center_pos]
+
+    df = df.pipe(add_coords_factor_col)
+
+    for col in (c.CLUSTER_MEAN_PRICE_M2, c.CLUSTER_CENTER_DIST_KM):
+        df[col] = df[col].round(2)
 
     return df
 
@@ -91,16 +111,3 @@ def add_coords_factor_col(df: pd.DataFrame) -> pd.DataFrame:
     df[c.CLUSTER_COORDS_FACTOR] = df[c.CLUSTER_MEAN_PRICE_M2] + (df[c.CLUSTER_MEAN_PRICE_M2] / (df[c.CLUSTER_CENTER_DIST_KM] + 1))
     return df
 
-
-def unzip_point_to_lon_and_lat(df: pd.DataFrame, col_to_unzip: str, drop: bool = True):
-    df[f'unziped_lat_{col_to_unzip}'] = df[col_to_unzip].apply(lambda point: point.y)
-    df[f'unziped_lon_{col_to_unzip}'] = df[col_to_unzip].apply(lambda point: point.x)
-    if drop:
-        df = df.drop(col_to_unzip, axis=1)
-    return df
-
-
-def add_point_col(df: pd.DataFrame) -> pd.DataFrame:
-    """ Zips lon and lat columns to create a series of coords "points". """
-    df['point'] = [Point(x, y) for x, y in zip(df[c.LON], df[c.LAT])]
-    return df
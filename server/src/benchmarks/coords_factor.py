@@ -0,0 +1,61 @@
+#!/usr/bin/env python3
+"""
+Micro-benchmark of coords factor lookup used by /api/v1/predict/:
+one-row dataframe through add_coords_features (previous path) against
+precomputed CoordsFeatures.
+
+Run from src directory with `python -m benchmarks.coords_factor`.
+"""
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+import columns as c
+from add_features import CoordsFeatures, add_coords_features
+
+N_CENTERS = 2000
+N_CALLS = 2000
+
+
+def get_coords_map(n):
+    rng = np.random.RandomState(0)
+    return pd.DataFrame({
+        c.LAT: rng.uniform(49.0, 54.8, size=n),
+        c.LON: rng.uniform(14.1, 24.1, size=n),
+        c.CLUSTER_MEAN_PRICE_M2: rng.uniform(4000, 15000, size=n),
+        c.CLUSTER_MEAN_PRICE: rng.uniform(200000, 900000, size=n),
+        c.CLUSTER_ID: np.arange(1, n + 1),
+    })
+
+
+def dataframe_coords_factor(coords_map, lon, lat):
+    df = pd.DataFrame({c.LON: [lon], c.LAT: [lat]})
+    df = df.pipe(add_coords_features, coords_map=coords_map)
+    return df[c.CLUSTER_COORDS_FACTOR][0]
+
+
+def measure(fn, points):
+    timings = []
+    for lon, lat in points:
+        start = time.perf_counter()
+        fn(lon, lat)
+        timings.append(time.perf_counter() - start)
+    return np.percentile(np.array(timings) * 1e6, [50, 99])
+
+
+if __name__ == "__main__":
+    n_calls = int(sys.argv[1]) if len(sys.argv) > 1 else N_CALLS
+    coords_map = get_coords_map(N_CENTERS)
+    features = CoordsFeatures(coords_map)
+    rng = np.random.RandomState(1)
+    points = list(zip(rng.uniform(14.1, 24.1, n_calls), rng.uniform(49.0, 54.8, n_calls)))
+
+    results = {
+        "dataframe": measure(lambda lon, lat: dataframe_coords_factor(coords_map, lon, lat), points),
+        "precomputed": measure(features.get_coords_factor, points),
+    }
+    print(f"{'path':>12} {'p50 us':>10} {'p99 us':>10}")
+    for name, (p50, p99) in results.items():
+        print(f"{name:>12} {p50:10.1f} {p99:10.1f}")
@@ -0,0 +1,89 @@
+#!/usr/bin/env python3
+"""
+Seed N synthetic offers and record latency of crud.get_offers for filter
+combinations sent by the client, without and with indexes declared on
+Offer model.
+
+WARNING: truncates offers table of database pointed by DATABASE_URL.
+
+Run from src directory with
+`DATABASE_URL=... python -m benchmarks.offer_filters [ROWS]`.
+"""
+import datetime
+import os
+import statistics
+import sys
+import time
+
+from benchmarks.offers_pagination import seed
+from database import SessionLocal, engine
+import crud
+import migrations
+import models
+
+DEFAULT_ROWS = 1_000_000
+N_QUERIES = 10
+# every client request contains offer type and added range
+BASE_FILTERS = {
+    "offer_type": "sale",
+    "from_date": datetime.date.today() - datetime.timedelta(days=3),
+    "to_date": datetime.date.today(),
+}
+FILTER_COMBINATIONS = {
+    "type + added": {},
+    "+ price": {"min_price": 300000, "max_price": 500000},
+    "+ size": {"min_size": 40, "max_size": 60},
+    "+ estimate diff": {"min_price_estimate_diff": 50000},
+    "+ all": {"min_price": 300000, "max_price": 500000, "min_size": 40,
+              "max_size": 60, "min_price_estimate_diff": 50000},
+}
+ORDERINGS = {
+    "by id": {},
+    "by estimate diff": {"sort_by": "price_estimate_diff", "descending": True},
+}
+
+
+def drop_declared_indexes():
+    with engine.begin() as connection:
+        for index in models.Offer.__table__.indexes:
+            connection.execute(f"DROP INDEX IF EXISTS {index.name}")
+        connection.execute("ANALYZE offers")
+
+
+def create_declared_indexes():
+    migrations.create_missing_indexes(engine)
+    with engine.begin() as connection:
+        connection.execute("ANALYZE offers")
+
+
+def measure(db, filters):
+    timings = []
+    for _ in range(N_QUERIES):
+        start = time.perf_counter()
+        crud.get_offers(db, limit=1000, **filters)
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+if __name__ == "__main__":
+    if "DATABASE_URL" not in os.environ:
+        print(__doc__)
+        sys.exit(1)
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else DEFAULT_ROWS
+    models.Base.metadata.create_all(bind=engine)
+    seed(n)
+
+    results = {}
+    for state, prepare in (("no indexes", drop_declared_indexes), ("indexes", create_declared_indexes)):
+        prepare()
+        db = SessionLocal()
+        for filters_name, filters in FILTER_COMBINATIONS.items():
+            for ordering_name, ordering in ORDERINGS.items():
+                key = (filters_name, ordering_name)
+                results.setdefault(key, {})[state] = measure(db, {**BASE_FILTERS, **filters, **ordering})
+        db.close()
+
+    print(f"rows: {n}, median of {N_QUERIES} queries (limit 1000)")
+    print(f"{'filters':>16} {'ordering':>17} {'no indexes ms':>14} {'indexes ms':>11}")
+    for (filters_name, ordering_name), timings in results.items():
+        print(f"{filters_name:>16} {ordering_name:>17} {timings['no indexes']:14.1f} {timings['indexes']:11.1f}")
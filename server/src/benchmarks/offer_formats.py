@@ -0,0 +1,45 @@
+#!/usr/bin/env python3
+"""
+Compare response size and latency of GET /api/v1/offers/ per 10k offers
+for every response format, with and without gzip.
+Uses offers already present in the database behind the server (see
+offers_pagination.seed to fill it).
+
+Run from src directory with
+`python -m benchmarks.offer_formats SERVER_URL`.
+"""
+import statistics
+import sys
+import time
+
+import requests
+
+N_REQUESTS = 20
+LIMIT = 10000
+FORMATS = ["json", "columnar", "binary"]
+ENCODINGS = ["identity", "gzip"]
+
+
+def measure(url, params, encoding):
+    timings = []
+    for _ in range(N_REQUESTS):
+        start = time.perf_counter()
+        response = requests.get(url, params=params, headers={"Accept-Encoding": encoding})
+        response.raise_for_status()
+        timings.append((time.perf_counter() - start) * 1000)
+    size = int(response.headers.get("content-length", len(response.content)))
+    return size, statistics.median(timings)
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    url = sys.argv[1].rstrip("/") + "/api/v1/offers/"
+
+    print(f"{'format':>10} {'encoding':>10} {'KB':>10} {'ms':>8}")
+    for format in FORMATS:
+        for encoding in ENCODINGS:
+            params = {"limit": LIMIT, "format": format}
+            size, ms = measure(url, params, encoding)
+            print(f"{format:>10} {encoding:>10} {size / 1024:10.1f} {ms:8.1f}")
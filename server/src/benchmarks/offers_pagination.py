@@ -0,0 +1,84 @@
+#!/usr/bin/env python3
+"""
+Load test of GET /api/v1/offers/ pagination for growing offers table.
+Measures latency of the first page and of a page from the middle of the
+table for each sort key.
+
+WARNING: truncates offers table of database pointed by DATABASE_URL.
+
+Run from src directory with
+`DATABASE_URL=... python -m benchmarks.offers_pagination SERVER_URL [ROWS...]`.
+"""
+import os
+import statistics
+import sys
+import time
+
+import requests
+from sqlalchemy import text
+
+from database import engine
+import models
+from pagination import encode_cursor
+
+DEFAULT_SIZES = [10_000, 100_000, 1_000_000]
+N_REQUESTS = 20
+LIMIT = 1000
+
+SEED_QUERY = """
+INSERT INTO offers (lon, lat, url, added, title, size, price, price_m2,
+                    estimate, offer_type, offer_id, price_estimate_diff)
+SELECT
+    14.1 + random() * 10, 49.0 + random() * 5.8,
+    'https://www.morizon.pl/oferta/' || i,
+    current_date - (random() * 90)::int,
+    'Mieszkanie', 20 + random() * 100, p, p / 50, p * 1.1,
+    CASE WHEN i % 2 = 0 THEN 'sale' ELSE 'rent' END,
+    'bench-' || i, (random() - 0.5) * 200000
+FROM generate_series(1, :n) AS i, LATERAL (SELECT 200000 + random() * 700000 AS p) price
+"""
+
+
+def seed(n):
+    with engine.begin() as connection:
+        connection.execute("TRUNCATE offers")
+        connection.execute(text(SEED_QUERY), n=n)
+        connection.execute("ANALYZE offers")
+
+
+def middle_cursor(n, sort_by, descending):
+    direction = "DESC" if descending else "ASC"
+    with engine.connect() as connection:
+        row = connection.execute(
+            f"SELECT id, {sort_by} FROM offers ORDER BY {sort_by} {direction}, id {direction} "
+            f"OFFSET {n // 2} LIMIT 1"
+        ).fetchone()
+    return encode_cursor(row, sort_by, descending)
+
+
+def measure(url, params):
+    timings = []
+    for _ in range(N_REQUESTS):
+        start = time.perf_counter()
+        requests.get(url, params=params).raise_for_status()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+if __name__ == "__main__":
+    if "DATABASE_URL" not in os.environ or len(sys.argv) < 2:
+        print(__doc__)
+        sys.exit(1)
+    url = sys.argv[1].rstrip("/") + "/api/v1/offers/"
+    sizes = [int(n) for n in sys.argv[2:]] or DEFAULT_SIZES
+    models.Base.metadata.create_all(bind=engine)
+
+    orderings = [("id", False), ("added", True), ("price_estimate_diff", True)]
+    print(f"{'rows':>10} {'sort_by':>20} {'first page ms':>14} {'middle page ms':>15}")
+    for n in sizes:
+        seed(n)
+        for sort_by, descending in orderings:
+            params = {"sort_by": sort_by, "descending": descending, "limit": LIMIT}
+            first = measure(url, params)
+            middle = measure(url, dict(params, cursor=middle_cursor(n, sort_by, descending)))
+            print(f"{n:>10} {sort_by:>20} {first:14.1f} {middle:15.1f}")
@@ -0,0 +1,90 @@
+"""
+Offers aggregated into clusters per map tile, used at low zoom levels
+instead of drawing every single offer.
+
+Tiles follow slippy map (web mercator) numbering used by Leaflet. Each tile
+is split into CLUSTER_GRID x CLUSTER_GRID bins and offers falling into the
+same bin form one cluster. Results are cached in process memory until
+offers table changes (see invalidate_cache).
+"""
+from collections import OrderedDict
+import math
+import threading
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+import crud
+import models
+
+# bins per tile side, 8 gives 32px bins on 256px tiles
+CLUSTER_GRID = 8
+MAX_CACHED_TILES = 10000
+
+_cache = OrderedDict()
+# sync endpoints run in a threadpool, cache is shared by their threads
+_cache_lock = threading.Lock()
+# bumped by invalidate_cache, clusters queried before it are not cached
+_cache_generation = 0
+
+
+def tile_bounds(zoom: int, x: int, y: int):
+    """ Returns (min_lat, min_lon, max_lat, max_lon) of a tile. """
+    n = 2 ** zoom
+
+    def tile_lat(tile_y):
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * tile_y / n))))
+
+    def tile_lon(tile_x):
+        return tile_x / n * 360 - 180
+
+    return tile_lat(y + 1), tile_lon(x), tile_lat(y), tile_lon(x + 1)
+
+
+def get_clusters(db: Session, zoom: int, x: int, y: int, **filters):
+    key = (zoom, x, y, tuple(sorted(filters.items())))
+    with _cache_lock:
+        if key in _cache:
+            _cache.move_to_end(key)
+            return _cache[key]
+        generation = _cache_generation
+
+    clusters = query_clusters(db, zoom, x, y, **filters)
+    with _cache_lock:
+        # offers changed while querying, clusters can be already outdated
+        if generation == _cache_generation:
+            _cache[key] = clusters
+            if len(_cache) > MAX_CACHED_TILES:
+                _cache.popitem(last=False)
+    return clusters
+
+
+def invalidate_cache():
+    """ Has to be called after offers are added or changed (once committed). """
+    global _cache_generation
+    with _cache_lock:
+        _cache_generation += 1
+        _cache.clear()
+
+
+def query_clusters(db: Session, zoom: int, x: int, y: int, **filters):
+    offer = models.Offer
+    n_bins = 2 ** zoom * CLUSTER_GRID
+    lat = func.radians(offer.lat)
+    # position on the whole map (in bins) in web mercator projection
+    bin_x = func.floor((offer.lon + 180) / 360 * n_bins)
+    bin_y = func.floor(
+        (1 - func.ln(func.tan(lat) + 1 / func.cos(lat)) / math.pi) / 2 * n_bins
+    )
+    clusters = db.query(
+        func.count(offer.id).label("count"),
+        func.avg(offer.lat).label("lat"),
+        func.avg(offer.lon).label("lon"),
+        func.min(offer.price_estimate_diff).label("min_price_estimate_diff"),
+        func.max(offer.price_estimate_diff).label("max_price_estimate_diff"),
+        func.percentile_cont(0.5).within_group(offer.price_estimate_diff)
+            .label("median_price_estimate_diff"),
+    )
+    clusters = crud.filter_offers(clusters, bbox=tile_bounds(zoom, x, y), **filters)
+    clusters = clusters.group_by(bin_x, bin_y)
+    return [cluster._asdict() for cluster in clusters.all()]
@@ -1,8 +1,37 @@
+import csv
 import datetime
+import io
+from typing import List
+
+from sqlalchemy import or_, tuple_
 from sqlalchemy.orm import Session
 
 import models
 import schemas
+from spatial import get_cell, get_cell_ranges
+
+# all columns filled by client and computed on insert, in order used by COPY
+OFFER_COLUMNS = list(schemas.OfferCreate.__fields__)
+INSERT_COLUMNS = OFFER_COLUMNS + ["cell"]
+
+STAGING_TABLE = "offers_staging"
+# rows which were inserted have xmax = 0, updated ones have it set,
+# rows which did not change are skipped by WHERE clause of the update
+UPSERT_QUERY = f"""
+WITH upserted AS (
+    INSERT INTO {models.Offer.__tablename__} ({", ".join(INSERT_COLUMNS)})
+    SELECT {", ".join(INSERT_COLUMNS)} FROM {STAGING_TABLE}
+    ON CONFLICT (offer_id) DO UPDATE SET
+        {", ".join(f"{c} = EXCLUDED.{c}" for c in INSERT_COLUMNS)}
+    WHERE ({", ".join(f"{models.Offer.__tablename__}.{c}" for c in OFFER_COLUMNS)})
+        IS DISTINCT FROM ({", ".join(f"EXCLUDED.{c}" for c in OFFER_COLUMNS)})
+    RETURNING (xmax = 0) AS inserted
+)
+SELECT
+    count(*) FILTER (WHERE inserted),
+    count(*) FILTER (WHERE NOT inserted)
+FROM upserted
+"""
 
 
 def get_offer(db: Session, offer_id: int):
@@ -18,8 +47,62 @@ def get_offers(
     max_size: float = None,
     min_size: float = None,
     min_price_estimate_diff: float = None,
+    bbox: tuple = None,
+    sort_by: str = "id",
+    descending: bool = False,
+    after: tuple = None,
+    limit: int = None,
+    columns: List[str] = None,
+):
+    """
+    Filter offers ordered by sort_by column (ties broken by id).
+    bbox is (min_lat, min_lon, max_lat, max_lon) of the viewport.
+    after is (sort_by value, id) of the last offer from previous page.
+    If columns are given plain rows of them are returned instead of models.
+    """
+    if columns:
+        query = db.query(*(getattr(models.Offer, column) for column in columns))
+    else:
+        query = db.query(models.Offer)
+    offers = filter_offers(
+        query,
+        from_date=from_date,
+        to_date=to_date,
+        offer_type=offer_type,
+        max_price=max_price,
+        min_price=min_price,
+        max_size=max_size,
+        min_size=min_size,
+        min_price_estimate_diff=min_price_estimate_diff,
+        bbox=bbox,
+    )
+
+    sort_column = getattr(models.Offer, sort_by)
+    sort_key = tuple_(sort_column, models.Offer.id)
+    if after:
+        after = tuple_(*after)
+        offers = offers.filter(sort_key < after if descending else sort_key > after)
+    if descending:
+        offers = offers.order_by(sort_column.desc(), models.Offer.id.desc())
+    else:
+        offers = offers.order_by(sort_column, models.Offer.id)
+    if limit:
+        offers = offers.limit(limit)
+    return offers.all()
+
+
+def filter_offers(
+    offers,
+    from_date: datetime.date = None,
+    to_date: datetime.date = None,
+    offer_type: str = None,
+    max_price: float = None,
+    min_price: float = None,
+    max_size: float = None,
+    min_size: float = None,
+    min_price_estimate_diff: float = None,
+    bbox: tuple = None,
 ):
-    offers = db.query(models.Offer)
     if offer_type:
        offers = offers.filter(models.Offer.offer_type == offer_type)
     if from_date:
@@ -36,14 +119,80 @@ def get_offers(
        offers = offers.filter(models.Offer.size >= min_size)
     if min_price_estimate_diff:
        offers = offers.filter(models.Offer.price_estimate_diff >= min_price_estimate_diff)
-    return offers.all()
+    if bbox:
+        offers = filter_bbox(offers, *bbox)
+    return offers
+
+
+def filter_bbox(offers, min_lat: float, min_lon: float, max_lat: float, max_lon: float):
+    """ Narrow down to cells covering bbox first, so cell index can be used. """
+    cell_ranges = get_cell_ranges(min_lat, min_lon, max_lat, max_lon)
+    if cell_ranges:
+        offers = offers.filter(or_(*(
+            models.Offer.cell.between(first, last) for first, last in cell_ranges
+        )))
+    return offers.filter(
+        models.Offer.lat.between(min_lat, max_lat),
+        models.Offer.lon.between(min_lon, max_lon),
+    )
 
 
 def create_offer(db: Session, offer: schemas.OfferCreate):
     db_offer = models.Offer(
-        **offer.dict()
+        **offer.dict(),
+        cell=get_cell(offer.lat, offer.lon),
     )
     db.add(db_offer)
     db.commit()
     db.refresh(db_offer)
     return db_offer
+
+
+def create_offers(db: Session, offers: List[schemas.OfferCreate]):
+    """ Insert a batch of offers with a single COPY statement. """
+    cursor = db.connection().connection.cursor()
+    copy_offers(cursor, models.Offer.__tablename__, offers)
+    db.commit()
+    return len(offers)
+
+
+def upsert_offers(db: Session, offers: List[schemas.OfferCreate]):
+    """
+    Insert new offers and update changed ones (matched on offer_id) with
+    a single statement. Returns counts of inserted, updated and unchanged
+    offers and of duplicates (offers repeated within the batch).
+    """
+    # with offer_id repeated in a batch the last one wins
+    unique_offers = list({offer.offer_id: offer for offer in offers}.values())
+    columns = ", ".join(INSERT_COLUMNS)
+    cursor = db.connection().connection.cursor()
+    cursor.execute(
+        f"CREATE TEMP TABLE {STAGING_TABLE} ON COMMIT DROP AS "
+        f"SELECT {columns} FROM {models.Offer.__tablename__} WITH NO DATA"
+    )
+    copy_offers(cursor, STAGING_TABLE, unique_offers)
+    cursor.execute(UPSERT_QUERY)
+    inserted, updated = cursor.fetchone()
+    db.commit()
+    return {
+        "inserted": inserted,
+        "updated": updated,
+        "unchanged": len(unique_offers) - inserted - updated,
+        "duplicates": len(offers) - len(unique_offers),
+    }
+
+
+def copy_offers(cursor, table: str, offers: List[schemas.OfferCreate]):
+    buffer = io.StringIO()
+    # quoting strings keeps empty strings from being loaded as NULLs
+    writer = csv.writer(buffer, quoting=csv.QUOTE_NONNUMERIC)
+    for offer in offers:
+        row = offer.dict()
+        writer.writerow(
+            [row[column] for column in OFFER_COLUMNS] + [get_cell(offer.lat, offer.lon)]
+        )
+    buffer.seek(0)
+    cursor.copy_expert(
+        f"COPY {table} ({', '.join(INSERT_COLUMNS)}) FROM STDIN WITH CSV",
+        buffer,
+    )
@@ -5,12 +5,16 @@ import os
 
 import pandas as pd
 
+from catalog import CATALOG_NAME, Catalog, get_schema_hash
+
 log = logging.getLogger(__name__)
 
 
 class FsClient:
     def __init__(self, root="/data"):
         self.root = root
+        # catalog of each bucket, see get_catalog
+        self.catalogs = {}
         log.info(f"Will use local filesystem as data backend at {root}")
 
     def get_full_path(self, path):
@@ -24,9 +28,98 @@ class FsClient:
             return None
         return files
 
+    def exists(self, path):
+        return os.path.exists(self.get_full_path(path))
+
+    def read_bytes(self, path, start=0):
+        """ Content of file from start byte, empty if there is no such file. """
+        full_path = self.get_full_path(path)
+        if not os.path.exists(full_path):
+            return b""
+        with open(full_path, "rb") as f:
+            f.seek(start)
+            return f.read()
+
+    def list_catalog_parts(self, path):
+        """ Files catalog at path is kept in, with their sizes (None if not known). """
+        return [(path, None)]
+
+    def append_catalog(self, path, data):
+        with open(self.get_full_path(path), "ab") as f:
+            f.write(data)
+
+    def get_catalog(self, path):
+        """ Catalog of bucket (first directory) of path. """
+        bucket = path.split("/")[0]
+        if bucket not in self.catalogs:
+            self.catalogs[bucket] = Catalog(f"{bucket}/{CATALOG_NAME}", self)
+        return self.catalogs[bucket]
+
+    def record(self, path, rows=None, schema_hash=None):
+        """ Add file (saved or changed) to catalog, content is hashed by scraper when needed. """
+        stat = os.stat(self.get_full_path(path))
+        date = self.get_date_from_filename(path.split("/")[-1], warn=False)
+        self.get_catalog(path).append({
+            "path": path,
+            "timestamp": date.isoformat() if date else None,
+            "bytes": stat.st_size,
+            "mtime": stat.st_mtime,
+            "content_hash": None,
+            "rows": rows,
+            "schema_hash": schema_hash,
+        })
+
+    def is_unchanged(self, path, entry):
+        stat = os.stat(self.get_full_path(path))
+        return stat.st_size == entry["bytes"] and stat.st_mtime == entry["mtime"]
+
+    def index_directory(self, directory):
+        """
+        Bring catalog of directory up to date with its files, for files not
+        saved by FsClient (eg. written before catalog existed).
+        """
+        catalog = self.get_catalog(directory)
+        if not self.exists(directory):
+            log.info(f"{directory} does not exist, nothing to index")
+            return
+        # taken before listing, so files added meanwhile are indexed next time
+        version = self.get_directory_version(directory)
+        paths = [path for path in self.list_dir(directory) or [] if os.path.isfile(self.get_full_path(path))]
+        log.info(f"Indexing {len(paths)} files of {directory}")
+        for path in paths:
+            entry = catalog.get(path)
+            if entry is None or not self.is_unchanged(path, entry):
+                self.record(path)
+        for path in set(catalog.list(directory)) - set(paths):
+            catalog.append({"path": path, "deleted": True})
+        catalog.append({"indexed": directory, "version": version})
+
+    def get_directory_version(self, directory):
+        """
+        Time of last file added to or removed from directory, also not by
+        FsClient (eg. model copied by hand). Files saved by FsClient are
+        recorded with mtime not older than that, so they do not make
+        catalog stale. None if directory does not exist.
+        """
+        full_path = self.get_full_path(directory)
+        return os.stat(full_path).st_mtime if os.path.isdir(full_path) else None
+
+    def get_newest_path(self, directory):
+        """ Path of file with newest date in name, None if there are no such files. """
+        catalog = self.get_catalog(directory)
+        if not catalog.is_indexed(directory, self.get_directory_version(directory)):
+            self.index_directory(directory)
+        newest_path = catalog.newest(directory)
+        if newest_path is not None and not self.exists(newest_path):
+            log.info(f"{newest_path} was removed, indexing {directory} again")
+            self.index_directory(directory)
+            newest_path = catalog.newest(directory)
+        return newest_path
+
     def save_df(self, df, path):
         log.info(f"Saving {path}")
-        return df.to_csv(self.get_full_path(path), index=False)
+        df.to_csv(self.get_full_path(path), index=False)
+        self.record(path, len(df), get_schema_hash(df))
 
     def save_df_with_timestamp(self, df, path, keyword, dtype, extension='csv'):
         """ Assumes path in fomrat 'flats-data/{dtype}/clean'"""
@@ -37,7 +130,9 @@ class FsClient:
 
     def save_model(self, model, path):
         log.info(f"Saving {path}")
-        return dump(model, self.get_full_path(path), compress=3)
+        dumped = dump(model, self.get_full_path(path), compress=3)
+        self.record(path)
+        return dumped
 
     def save_model_with_timestamp(self, model, path, dtype, keyword):
         """ Assumes path in format 'flats-models/{dtype}'"""
@@ -63,9 +158,7 @@ class FsClient:
 
 
     def read_newest_df(self, directory, dtype):
-        directory = directory.format(data_type=dtype)
-        file_list = self.list_dir(directory)
-        newest_path = self.select_newest_file(file_list)
+        newest_path = self.get_newest_path(directory.format(data_type=dtype))
         if newest_path:
             return self.read_df(newest_path)
         else:
@@ -75,9 +168,7 @@ class FsClient:
         return load(self.get_full_path(path))
 
     def read_newest_model(self, directory, dtype):
-        directory = directory.format(data_type=dtype)
-        file_list = self.list_dir(directory)
-        newest_path = self.select_newest_file(file_list)
+        newest_path = self.get_newest_path(directory.format(data_type=dtype))
         if newest_path:
             return self.read_model(newest_path)
         else:
@@ -98,10 +189,11 @@ class FsClient:
         return file_paths[max_pos]
 
 
-    def get_date_from_filename(self, filename):
+    def get_date_from_filename(self, filename, warn=True):
         date_numbers = "".join([x for x in filename if x.isdigit()])
         # make sure this is a valid datetime format used accross project
         if len(date_numbers) != 14:
-            log.warning(f"Not getting date from invalid file name: {filename}")
+            if warn:
+                log.warning(f"Not getting date from invalid file name: {filename}")
             return None
         return datetime.strptime(date_numbers, "%Y%m%d%H%M%S")
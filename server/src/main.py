@@ -1,24 +1,51 @@
 import datetime
-from typing import List
+import logging
+from typing import List, Optional
 
-from fastapi import Depends, FastAPI, HTTPException
+from fastapi import Depends, FastAPI, HTTPException, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.middleware.gzip import GZipMiddleware
+from psycopg2 import IntegrityError
+from pydantic import ValidationError
 from sqlalchemy.orm import Session
+from starlette.concurrency import run_in_threadpool
+import orjson
 import pandas as pd
 
-from add_features import get_coords_factor
+from add_features import (
+    get_coords_factor,
+    refresh_coords_features,
+    start_coords_features_refresh,
+    stop_refresh,
+)
+import clusters
 import crud
 import columns as c
-import models
 import schemas
 from database import SessionLocal, engine
 from fs_client import FsClient
+from migrations import migrate
+import offer_formats
+from pagination import InvalidCursorError, decode_cursor, encode_cursor
+
+log = logging.getLogger(__name__)
 
-models.Base.metadata.create_all(bind=engine)
+migrate(bind=engine)
 fs = FsClient()
 model = fs.read_newest_model("flats-models/{data_type}/models", dtype="sale")
 app = FastAPI()
 
+# content types of newline delimited json, one offer per line
+NDJSON_CONTENT_TYPES = ("application/x-ndjson", "application/ndjson")
+# max number of offers written to db with a single statement
+BULK_BATCH_SIZE = 5000
+# page size of offers listing
+DEFAULT_OFFERS_LIMIT = 1000
+MAX_OFFERS_LIMIT = 10000
+MAX_ZOOM = 20
+# responses smaller than that are not worth compressing
+GZIP_MIN_SIZE = 1000
+
 origins = [
     "http://127.0.0.1:5500",
 ]
@@ -29,7 +56,20 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["X-Next-Cursor", "X-Offer-Columns"],
 )
+app.add_middleware(GZipMiddleware, minimum_size=GZIP_MIN_SIZE)
+
+
+@app.on_event("startup")
+def load_coords_features():
+    refresh_coords_features()
+    start_coords_features_refresh()
+
+
+@app.on_event("shutdown")
+def stop_coords_features_refresh():
+    stop_refresh.set()
 
 
 # Dependency
@@ -43,11 +83,118 @@ def get_db():
 
 @app.post("/api/v1/offers/", response_model=schemas.Offer)
 def create_offer(offer: schemas.OfferCreate, db: Session = Depends(get_db)):
-    return crud.create_offer(db=db, offer=offer)
+    db_offer = crud.create_offer(db=db, offer=offer)
+    clusters.invalidate_cache()
+    return db_offer
+
+
+@app.post("/api/v1/offers/bulk", response_model=schemas.BulkResult)
+async def create_offers_bulk(
+    request: Request,
+    mode: schemas.BulkMode = schemas.BulkMode.insert,
+    db: Session = Depends(get_db),
+):
+    """
+    Add offers in batches. Accepts either JSON array of offers or NDJSON
+    stream, which is written to db batch by batch while it is received.
+    In upsert mode offers with already existing offer_id are updated.
+    Invalid offers are skipped, their offer_ids are returned with the counts.
+    """
+    content_type = request.headers.get("content-type", "").split(";")[0].strip()
+    if content_type in NDJSON_CONTENT_TYPES:
+        rows = iter_ndjson(request)
+    else:
+        rows = iter_json_array(request)
+
+    result = {"inserted": 0, "updated": 0, "unchanged": 0, "duplicates": 0, "invalid": 0, "invalid_offer_ids": []}
+    batch = []
+    async for row in rows:
+        offer = parse_offer(row)
+        if offer is None:
+            result["invalid"] += 1
+            result["invalid_offer_ids"].append(row.get("offer_id") if isinstance(row, dict) else None)
+            continue
+        batch.append(offer)
+        if len(batch) == BULK_BATCH_SIZE:
+            await write_batch(db, batch, mode, result)
+            batch = []
+    if batch:
+        await write_batch(db, batch, mode, result)
+    return result
+
+
+async def iter_json_array(request: Request):
+    try:
+        rows = orjson.loads(await request.body())
+    except orjson.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid JSON: {e}")
+    if not isinstance(rows, list):
+        raise HTTPException(status_code=400, detail="Expected JSON array of offers")
+    for row in rows:
+        yield row
+
+
+async def iter_ndjson(request: Request):
+    pending = b""
+    async for chunk in request.stream():
+        pending += chunk
+        *lines, pending = pending.split(b"\n")
+        for line in lines:
+            if line.strip():
+                yield parse_json_line(line)
+    if pending.strip():
+        yield parse_json_line(pending)
+
+
+def parse_json_line(line: bytes):
+    try:
+        return orjson.loads(line)
+    except orjson.JSONDecodeError as e:
+        raise HTTPException(status_code=400, detail=f"Invalid NDJSON line: {e}")
+
+
+def parse_offer(row) -> Optional[schemas.OfferCreate]:
+    """ Returns None for invalid offer, so it does not fail whole batch. """
+    try:
+        return schemas.OfferCreate(**row)
+    except (TypeError, ValidationError) as e:
+        detail = e.errors() if isinstance(e, ValidationError) else str(e)
+        log.warning(f"Skipping invalid offer: {detail}")
+        return None
+
+
+async def write_batch(db: Session, batch: List[schemas.OfferCreate], mode: schemas.BulkMode, result: dict):
+    """
+    Clusters cache is invalidated after batch is committed, clusters queried
+    while it was written are not cached (see clusters.get_clusters).
+    """
+    clusters.invalidate_cache()
+    try:
+        await write_offers(db, batch, mode, result)
+    finally:
+        clusters.invalidate_cache()
+
+
+async def write_offers(db: Session, batch: List[schemas.OfferCreate], mode: schemas.BulkMode, result: dict):
+    if mode == schemas.BulkMode.upsert:
+        counts = await run_in_threadpool(crud.upsert_offers, db, batch)
+        for key, count in counts.items():
+            result[key] += count
+        return
+    try:
+        result["inserted"] += await run_in_threadpool(crud.create_offers, db, batch)
+    except IntegrityError:
+        db.rollback()
+        raise HTTPException(
+            status_code=409,
+            detail=f"Batch contains already existing offers ({result['inserted']} inserted before it)",
+        )
 
 
 @app.get("/api/v1/offers/", response_model=List[schemas.Offer])
 def read_offers(
+    request: Request,
+    response: Response,
     from_date: datetime.date = None,
     to_date: datetime.date = None,
     offer_type: str = None,
@@ -56,8 +203,38 @@ def read_offers(
     max_size: float = None,
     min_size: float = None,
     min_price_estimate_diff: float = None,
+    min_lat: float = None,
+    min_lon: float = None,
+    max_lat: float = None,
+    max_lon: float = None,
+    sort_by: schemas.OfferSortKey = schemas.OfferSortKey.id,
+    descending: bool = False,
+    limit: int = Query(DEFAULT_OFFERS_LIMIT, ge=1, le=MAX_OFFERS_LIMIT),
+    cursor: str = None,
+    format: schemas.OfferFormat = None,
     db: Session = Depends(get_db),
 ):
+    """
+    List offers page by page. If there are more offers to fetch cursor of
+    the next page is returned in X-Next-Cursor header.
+    Pass all of min/max lat/lon to get only offers within map viewport.
+    Pass format (or matching Accept header) to get columnar or binary
+    response instead of list of offer objects, see offer_formats.
+    """
+    format = offer_formats.get_format(format, request.headers.get("accept", ""))
+    bbox = get_bbox(min_lat, min_lon, max_lat, max_lon)
+    sort_by = sort_by.value
+    columns, query_columns = None, None
+    if format != schemas.OfferFormat.json:
+        columns = offer_formats.get_columns(format)
+        # sort key and id are needed to create cursor of the next page
+        query_columns = columns + [col for col in (sort_by, "id") if col not in columns]
+    after = None
+    if cursor:
+        try:
+            after = decode_cursor(cursor, sort_by, descending)
+        except InvalidCursorError as e:
+            raise HTTPException(status_code=400, detail=str(e))
     offers = crud.get_offers(
         db,
         from_date=from_date,
@@ -68,10 +245,75 @@ def read_offers(
         max_size=max_size,
         min_size=min_size,
         min_price_estimate_diff=min_price_estimate_diff,
+        bbox=bbox,
+        sort_by=sort_by,
+        descending=descending,
+        after=after,
+        limit=limit,
+        columns=query_columns,
     )
+    headers = {}
+    if len(offers) == limit:
+        headers["X-Next-Cursor"] = encode_cursor(offers[-1], sort_by, descending)
+    if format == schemas.OfferFormat.columnar:
+        content = offer_formats.to_columnar(offers, columns)
+        return Response(content, media_type=offer_formats.COLUMNAR_MEDIA_TYPE, headers=headers)
+    if format == schemas.OfferFormat.binary:
+        headers["X-Offer-Columns"] = ",".join(columns)
+        content = offer_formats.to_binary(offers, columns)
+        return Response(content, media_type=offer_formats.BINARY_MEDIA_TYPE, headers=headers)
+    response.headers.update(headers)
     return offers
 
 
+def get_bbox(min_lat: float, min_lon: float, max_lat: float, max_lon: float):
+    bbox = (min_lat, min_lon, max_lat, max_lon)
+    if all(value is None for value in bbox):
+        return None
+    if any(value is None for value in bbox):
+        raise HTTPException(status_code=400, detail="Bounding box requires all of min/max lat/lon")
+    if min_lat > max_lat or min_lon > max_lon:
+        raise HTTPException(status_code=400, detail="Bounding box minimum is greater than maximum")
+    return bbox
+
+
+@app.get("/api/v1/clusters/{zoom}/{x}/{y}", response_model=List[schemas.Cluster])
+def read_clusters(
+    zoom: int,
+    x: int,
+    y: int,
+    from_date: datetime.date = None,
+    to_date: datetime.date = None,
+    offer_type: str = None,
+    max_price: float = None,
+    min_price: float = None,
+    max_size: float = None,
+    min_size: float = None,
+    min_price_estimate_diff: float = None,
+    db: Session = Depends(get_db),
+):
+    """
+    Offers within map tile (same numbering as map tiles) aggregated into
+    clusters. Meant for low zoom levels instead of listing all offers.
+    """
+    if not 0 <= zoom <= MAX_ZOOM or not 0 <= x < 2 ** zoom or not 0 <= y < 2 ** zoom:
+        raise HTTPException(status_code=400, detail="Invalid tile coordinates")
+    return clusters.get_clusters(
+        db,
+        zoom,
+        x,
+        y,
+        from_date=from_date,
+        to_date=to_date,
+        offer_type=offer_type,
+        max_price=max_price,
+        min_price=min_price,
+        max_size=max_size,
+        min_size=min_size,
+        min_price_estimate_diff=min_price_estimate_diff,
+    )
+
+
 @app.get("/api/v1/offers/{offer_id}", response_model=schemas.Offer)
 def read_offer(offer_id: int, db: Session = Depends(get_db)):
     db_offer = crud.get_offer(db, offer_id=offer_id)
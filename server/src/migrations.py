@@ -0,0 +1,57 @@
+"""
+Bring existing tables up to date with models.
+create_all only creates missing tables, so columns and indexes declared
+after the table was created have to be added here.
+
+Runs on server startup, can be also run manually with `python migrations.py`.
+"""
+import logging
+
+from sqlalchemy import inspect
+
+from database import Base, engine
+import models
+from spatial import CELL_SQL
+
+log = logging.getLogger(__name__)
+
+# how to fill columns added to already existing rows
+BACKFILL = {
+    ("offers", "cell"): CELL_SQL,
+}
+
+
+def add_missing_columns(bind=engine):
+    for table in Base.metadata.sorted_tables:
+        existing = {column["name"] for column in inspect(bind).get_columns(table.name)}
+        for column in table.columns:
+            if column.name in existing:
+                continue
+            log.warning(f"Adding missing column {column.name} to {table.name} ...")
+            column_type = column.type.compile(dialect=bind.dialect)
+            with bind.begin() as connection:
+                connection.execute(f"ALTER TABLE {table.name} ADD COLUMN {column.name} {column_type}")
+                if (table.name, column.name) in BACKFILL:
+                    connection.execute(
+                        f"UPDATE {table.name} SET {column.name} = {BACKFILL[(table.name, column.name)]}"
+                    )
+
+
+def create_missing_indexes(bind=engine):
+    for table in Base.metadata.sorted_tables:
+        existing = {index["name"] for index in inspect(bind).get_indexes(table.name)}
+        for index in table.indexes:
+            if index.name not in existing:
+                log.warning(f"Creating missing index {index.name} on {table.name} ...")
+                index.create(bind=bind)
+
+
+def migrate(bind=engine):
+    Base.metadata.create_all(bind=bind)
+    add_missing_columns(bind)
+    create_missing_indexes(bind)
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO)
+    migrate()
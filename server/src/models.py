@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Date, Float, Integer, String
+from sqlalchemy import Column, Date, Float, Index, Integer, String
 
 from database import Base
 
@@ -19,3 +19,20 @@ class Offer(Base):
     offer_type = Column(String)
     offer_id = Column(String, unique=True)
     price_estimate_diff = Column(Float)
+    # spatial key, see spatial.get_cell
+    cell = Column(Integer)
+
+    __table_args__ = (
+        # keyset pagination sort keys
+        Index("ix_offers_added_id", "added", "id"),
+        Index("ix_offers_price_estimate_diff_id", "price_estimate_diff", "id"),
+        # client always filters by offer type and added date range,
+        # remaining filters are applied on top of these
+        Index("ix_offers_offer_type_added_id", "offer_type", "added", "id"),
+        Index(
+            "ix_offers_offer_type_price_estimate_diff_id",
+            "offer_type", "price_estimate_diff", "id",
+        ),
+        # viewport (bounding box) queries
+        Index("ix_offers_offer_type_cell_added", "offer_type", "cell", "added"),
+    )
@@ -0,0 +1,51 @@
+"""
+Compact representations of offers listing, serialized directly from
+query rows (without building pydantic model per offer).
+
+columnar - JSON object with a list of values per column
+binary   - float64 little endian arrays of BINARY_COLUMNS, one after another,
+           so client can view them as Float64Array without parsing.
+           Column names are sent in X-Offer-Columns header.
+"""
+from typing import List
+
+import numpy as np
+import orjson
+
+import schemas
+
+COLUMNAR_COLUMNS = ["id"] + list(schemas.OfferBase.__fields__)
+# enough to draw offers on the map, details are fetched by id
+BINARY_COLUMNS = ["id", "lat", "lon", "price", "estimate", "price_estimate_diff"]
+
+COLUMNAR_MEDIA_TYPE = "application/vnd.flats.columnar+json"
+BINARY_MEDIA_TYPE = "application/octet-stream"
+
+
+def get_format(format: schemas.OfferFormat, accept: str) -> schemas.OfferFormat:
+    """ Explicit format param wins over Accept header. """
+    if format:
+        return format
+    if BINARY_MEDIA_TYPE in accept:
+        return schemas.OfferFormat.binary
+    if COLUMNAR_MEDIA_TYPE in accept:
+        return schemas.OfferFormat.columnar
+    return schemas.OfferFormat.json
+
+
+def get_columns(format: schemas.OfferFormat) -> List[str]:
+    if format == schemas.OfferFormat.binary:
+        return BINARY_COLUMNS
+    return COLUMNAR_COLUMNS
+
+
+def to_columnar(rows, columns: List[str]) -> bytes:
+    values = zip(*rows) if rows else [[] for _ in columns]
+    return orjson.dumps(dict(zip(columns, values)))
+
+
+def to_binary(rows, columns: List[str]) -> bytes:
+    """ rows may contain more fields than columns, extra ones are skipped. """
+    n_columns = len(columns)
+    array = np.array([row[:n_columns] for row in rows], dtype="<f8").reshape(-1, n_columns)
+    return array.T.tobytes()
@@ -0,0 +1,31 @@
+"""
+Opaque cursors for keyset pagination of offers.
+Cursor holds ordering it was created for and sort key of the last offer.
+"""
+import base64
+import datetime
+
+import orjson
+
+
+class InvalidCursorError(Exception):
+    pass
+
+
+def encode_cursor(offer, sort_by: str, descending: bool) -> str:
+    payload = [sort_by, descending, getattr(offer, sort_by), offer.id]
+    return base64.urlsafe_b64encode(orjson.dumps(payload)).decode()
+
+
+def decode_cursor(cursor: str, sort_by: str, descending: bool):
+    """ Returns (sort key value, id) of the last offer of previous page. """
+    try:
+        payload = orjson.loads(base64.urlsafe_b64decode(cursor.encode()))
+        cursor_sort_by, cursor_descending, value, offer_id = payload
+        if cursor_sort_by == "added":
+            value = datetime.date.fromisoformat(value)
+    except (TypeError, ValueError) as e:
+        raise InvalidCursorError(f"Malformed cursor: {e}")
+    if (cursor_sort_by, cursor_descending) != (sort_by, descending):
+        raise InvalidCursorError("Cursor was created for different ordering")
+    return value, offer_id
@@ -1,4 +1,5 @@
 import datetime
+from enum import Enum
 from typing import List, Optional
 
 from pydantic import BaseModel
@@ -30,6 +31,39 @@ class Offer(OfferBase):
 class PricePrediction(BaseModel):
     prediction: float
 
+class BulkMode(str, Enum):
+    insert = "insert"
+    upsert = "upsert"
+
+class OfferFormat(str, Enum):
+    json = "json"
+    columnar = "columnar"
+    binary = "binary"
+
+class Cluster(BaseModel):
+    count: int
+    lat: float
+    lon: float
+    min_price_estimate_diff: float
+    # best deal of the cluster, diff is estimate - price
+    max_price_estimate_diff: float
+    median_price_estimate_diff: float
+
+class OfferSortKey(str, Enum):
+    id = "id"
+    added = "added"
+    price_estimate_diff = "price_estimate_diff"
+
+class BulkResult(BaseModel):
+    inserted: int
+    updated: int = 0
+    unchanged: int = 0
+    # offers with offer_id repeated later in the same batch, see crud.upsert_offers
+    duplicates: int = 0
+    # offers skipped as invalid and their offer_ids (None if missing)
+    invalid: int = 0
+    invalid_offer_ids: List[Optional[str]] = []
+
 
 #SALE_MODEL_INPUTS = [
 #    columns.CLUSTER_COORDS_FACTOR,
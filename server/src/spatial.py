@@ -0,0 +1,42 @@
+"""
+Regular lat/lon grid used as indexed spatial key of offers.
+Cells are numbered row by row, so cells of one grid row covered by
+a bounding box form a continuous range of ids.
+"""
+import math
+
+# cell size in degrees (~5.5 km of latitude)
+CELL_SIZE_DEG = 0.05
+N_COLS = round(360 / CELL_SIZE_DEG)
+# above that many grid rows bounding box is filtered by lat/lon only
+MAX_CELL_ROWS = 200
+
+# same as get_cell, used to fill cells of already existing rows
+CELL_SQL = (
+    f"floor((lat + 90) / {CELL_SIZE_DEG}::float8)::int * {N_COLS}"
+    f" + floor((lon + 180) / {CELL_SIZE_DEG}::float8)::int"
+)
+
+
+def get_row_and_col(lat: float, lon: float):
+    return math.floor((lat + 90) / CELL_SIZE_DEG), math.floor((lon + 180) / CELL_SIZE_DEG)
+
+
+def get_cell(lat: float, lon: float) -> int:
+    row, col = get_row_and_col(lat, lon)
+    return row * N_COLS + col
+
+
+def get_cell_ranges(min_lat: float, min_lon: float, max_lat: float, max_lon: float):
+    """
+    Inclusive ranges of cells covering bounding box, one per grid row.
+    Returns None if bounding box spans too many rows to be worth it.
+    """
+    min_row, min_col = get_row_and_col(min_lat, min_lon)
+    max_row, max_col = get_row_and_col(max_lat, max_lon)
+    if max_row - min_row + 1 > MAX_CELL_ROWS:
+        return None
+    return [
+        (row * N_COLS + min_col, row * N_COLS + max_col)
+        for row in range(min_row, max_row + 1)
+    ]
@@ -0,0 +1,46 @@
+import time
+
+import pandas as pd
+import pytest
+
+import add_features
+import columns as c
+
+COORDS_MAP = pd.DataFrame({
+    c.LON: [21.01, 19.94],
+    c.LAT: [52.23, 50.06],
+    c.CLUSTER_MEAN_PRICE_M2: [12000.0, 9000.0],
+})
+
+
+@pytest.fixture
+def newest_paths(monkeypatch):
+    """ Coords map paths returned as newest, one per check. """
+    paths = ["coords_map_1.csv"]
+    monkeypatch.setattr(add_features.fs, "get_newest_path", lambda directory: paths[-1])
+    monkeypatch.setattr(add_features.fs, "read_df", lambda path: COORDS_MAP.assign(**{
+        c.CLUSTER_MEAN_PRICE_M2: COORDS_MAP[c.CLUSTER_MEAN_PRICE_M2] * len(paths)
+    }))
+    monkeypatch.setattr(add_features, "coords_features", None)
+    yield paths
+    add_features.stop_refresh.set()
+
+
+def test_coords_factor_does_not_touch_filesystem(newest_paths, monkeypatch):
+    add_features.refresh_coords_features()
+    monkeypatch.setattr(add_features.fs, "get_newest_path", lambda directory: pytest.fail("catalog was read"))
+    assert add_features.get_coords_factor(21.01, 52.23) == pytest.approx(24000.0)
+
+
+def test_newer_coords_map_is_loaded_in_background(newest_paths):
+    add_features.refresh_coords_features()
+    thread = add_features.start_coords_features_refresh(interval=0.01)
+    newest_paths.append("coords_map_2.csv")
+    deadline = time.monotonic() + 5
+    while add_features.coords_features.path != "coords_map_2.csv" and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert add_features.get_coords_factor(21.01, 52.23) == pytest.approx(48000.0)
+
+    add_features.stop_refresh.set()
+    thread.join(1)
+    assert not thread.is_alive()
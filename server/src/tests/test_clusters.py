@@ -0,0 +1,43 @@
+import math
+
+import pytest
+
+import clusters
+from clusters import tile_bounds
+
+# latitude covered by web mercator tiles
+MAX_LAT = math.degrees(math.atan(math.sinh(math.pi)))
+
+
+def test_single_tile_of_zoom_0_covers_whole_map():
+    assert tile_bounds(0, 0, 0) == pytest.approx((-MAX_LAT, -180, MAX_LAT, 180))
+
+
+def test_tiles_of_zoom_1_are_map_quarters():
+    assert tile_bounds(1, 0, 0) == pytest.approx((0, -180, MAX_LAT, 0))
+    assert tile_bounds(1, 1, 1) == pytest.approx((-MAX_LAT, 0, 0, 180))
+
+
+def test_neighbouring_tiles_share_edges():
+    zoom, x, y = 10, 571, 337
+    min_lat, min_lon, max_lat, max_lon = tile_bounds(zoom, x, y)
+    assert min_lat < max_lat and min_lon < max_lon
+    assert tile_bounds(zoom, x + 1, y)[1] == max_lon
+    assert tile_bounds(zoom, x, y + 1)[2] == min_lat
+    # Warsaw is within this tile
+    assert min_lat <= 52.23 <= max_lat and min_lon <= 21.01 <= max_lon
+
+
+def test_clusters_queried_while_offers_changed_are_not_cached(monkeypatch):
+    clusters.invalidate_cache()
+
+    def query_during_write(db, zoom, x, y, **filters):
+        clusters.invalidate_cache()
+        return [{"count": 1}]
+
+    monkeypatch.setattr(clusters, "query_clusters", query_during_write)
+    clusters.get_clusters(None, 1, 0, 0)
+    monkeypatch.setattr(clusters, "query_clusters", lambda db, zoom, x, y, **filters: [{"count": 2}])
+    assert clusters.get_clusters(None, 1, 0, 0) == [{"count": 2}]
+    monkeypatch.setattr(clusters, "query_clusters", lambda db, zoom, x, y, **filters: [{"count": 3}])
+    assert clusters.get_clusters(None, 1, 0, 0) == [{"count": 2}]
@@ -0,0 +1,34 @@
+import os
+
+import pytest
+
+from fs_client import FsClient
+
+MODEL_DIR = "flats-models/sale"
+
+
+@pytest.fixture
+def fs(tmp_path):
+    os.makedirs(tmp_path / MODEL_DIR)
+    return FsClient(root=str(tmp_path))
+
+
+def copy_model(fs, day):
+    """ Model copied by hand, not saved by FsClient. """
+    path = f"{MODEL_DIR}/sale_model_2021_01_{day:02d}T10_00_00.joblib"
+    with open(fs.get_full_path(path), "wb") as f:
+        f.write(b"model")
+    return path
+
+
+def test_models_copied_after_indexing_are_found(fs, monkeypatch):
+    first_path = copy_model(fs, 1)
+    assert fs.get_newest_path(MODEL_DIR) == first_path
+    with monkeypatch.context() as m:
+        m.setattr(fs, "list_dir", lambda directory: pytest.fail("directory was listed"))
+        assert fs.get_newest_path(MODEL_DIR) == first_path
+
+    newest_path = copy_model(fs, 2)
+    # directory mtime can have coarse resolution
+    os.utime(fs.get_full_path(MODEL_DIR), (0, os.stat(fs.get_full_path(newest_path)).st_mtime + 1))
+    assert fs.get_newest_path(MODEL_DIR) == newest_path
@@ -0,0 +1,33 @@
+import numpy as np
+import orjson
+
+import schemas
+from offer_formats import BINARY_COLUMNS, COLUMNAR_COLUMNS, get_format, to_binary, to_columnar
+
+ROWS = [
+    (1, 52.23, 21.01, 450000.0, 480000.5, 30000.5),
+    (2, 50.06, 19.94, 380000.0, 350000.0, -30000.0),
+]
+
+
+def test_columnar_has_list_of_values_per_column():
+    columns = BINARY_COLUMNS
+    assert orjson.loads(to_columnar(ROWS, columns)) == {
+        column: [row[i] for row in ROWS] for i, column in enumerate(columns)
+    }
+    assert orjson.loads(to_columnar([], COLUMNAR_COLUMNS)) == {column: [] for column in COLUMNAR_COLUMNS}
+
+
+def test_binary_has_float64_array_per_column():
+    # extra fields (eg. sort key needed for cursor) are skipped
+    rows = [row + ("2021-01-22",) for row in ROWS]
+    content = to_binary(rows, BINARY_COLUMNS)
+    arrays = np.frombuffer(content, dtype="<f8").reshape(len(BINARY_COLUMNS), len(ROWS))
+    np.testing.assert_array_equal(arrays, np.array(ROWS).T)
+    assert to_binary([], BINARY_COLUMNS) == b""
+
+
+def test_format_param_wins_over_accept_header():
+    assert get_format(None, "application/octet-stream") == schemas.OfferFormat.binary
+    assert get_format(schemas.OfferFormat.columnar, "application/octet-stream") == schemas.OfferFormat.columnar
+    assert get_format(None, "application/json") == schemas.OfferFormat.json
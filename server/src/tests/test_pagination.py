@@ -0,0 +1,41 @@
+import base64
+import datetime
+from types import SimpleNamespace
+
+import orjson
+import pytest
+
+from pagination import InvalidCursorError, decode_cursor, encode_cursor
+
+OFFER = SimpleNamespace(id=42, added=datetime.date(2021, 1, 22), price_estimate_diff=-12500.5)
+
+
+@pytest.mark.parametrize("sort_by", ["id", "added", "price_estimate_diff"])
+@pytest.mark.parametrize("descending", [False, True])
+def test_cursor_holds_sort_key_of_last_offer(sort_by, descending):
+    cursor = encode_cursor(OFFER, sort_by, descending)
+    assert decode_cursor(cursor, sort_by, descending) == (getattr(OFFER, sort_by), OFFER.id)
+
+
+@pytest.mark.parametrize("sort_by, descending", [("id", False), ("added", True), ("price_estimate_diff", False)])
+def test_cursor_of_different_ordering_is_rejected(sort_by, descending):
+    cursor = encode_cursor(OFFER, "added", False)
+    with pytest.raises(InvalidCursorError, match="different ordering"):
+        decode_cursor(cursor, sort_by, descending)
+
+
+def encode_payload(payload):
+    return base64.urlsafe_b64encode(orjson.dumps(payload)).decode()
+
+
+@pytest.mark.parametrize("cursor", [
+    "not a cursor",
+    base64.urlsafe_b64encode(b"not json").decode(),
+    encode_payload(["id", False, 42]),
+    encode_payload(42),
+    encode_payload(["added", False, "yesterday", 42]),
+    encode_payload(["added", False, None, 42]),
+])
+def test_malformed_cursor_is_rejected(cursor):
+    with pytest.raises(InvalidCursorError, match="Malformed cursor"):
+        decode_cursor(cursor, "added", False)
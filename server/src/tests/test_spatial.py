@@ -0,0 +1,57 @@
+import math
+
+import numpy as np
+import pytest
+
+from spatial import CELL_SIZE_DEG, CELL_SQL, MAX_CELL_ROWS, get_cell, get_cell_ranges
+
+# exact multiples of cell size, negative lon and lat and points within cells
+BOUNDARY_COORDS = [
+    (52.05, 21.0),
+    (52.0, -0.05),
+    (-33.85, -70.65),
+    (0.0, 0.0),
+    (-0.05, -180.0),
+    (89.95, 179.95),
+    (50.06143, 19.93658),
+    (49.999999999, -0.000000001),
+]
+
+
+def sql_cell(lat, lon):
+    """ CELL_SQL evaluated the way postgres does it, on float8 values. """
+    expression = CELL_SQL.replace("::float8", "").replace("::int", "")
+    return eval(expression, {"floor": math.floor, "lat": lat, "lon": lon})
+
+
+@pytest.mark.parametrize("lat, lon", BOUNDARY_COORDS)
+def test_cell_sql_agrees_with_get_cell(lat, lon):
+    assert sql_cell(lat, lon) == get_cell(lat, lon)
+
+
+@pytest.mark.parametrize("bbox", [
+    (52.1, 20.85, 52.37, 21.27),
+    (50.0, -0.15, 50.1, 0.15),
+    (-34.0, -71.0, -33.5, -70.5),
+    (52.05, 21.0, 52.05, 21.0),
+])
+def test_cell_ranges_cover_every_cell_of_bbox(bbox):
+    min_lat, min_lon, max_lat, max_lon = bbox
+    ranges = get_cell_ranges(*bbox)
+    lats = np.append(np.linspace(min_lat, max_lat, 50), np.arange(min_lat, max_lat, CELL_SIZE_DEG))
+    lons = np.append(np.linspace(min_lon, max_lon, 50), np.arange(min_lon, max_lon, CELL_SIZE_DEG))
+    for lat in lats:
+        for lon in lons:
+            cell = get_cell(lat, lon)
+            assert any(first <= cell <= last for first, last in ranges), (lat, lon)
+
+
+def test_cell_ranges_are_one_per_grid_row():
+    ranges = get_cell_ranges(52.01, 21.01, 52.14, 21.02)
+    assert len(ranges) == 3
+    assert all(last - first == 0 for first, last in ranges)
+
+
+def test_too_tall_bbox_is_not_split_into_cells():
+    assert get_cell_ranges(0.0, 10.0, MAX_CELL_ROWS * CELL_SIZE_DEG, 10.1) is None
+    assert get_cell_ranges(0.01, 10.0, (MAX_CELL_ROWS - 1) * CELL_SIZE_DEG + 0.01, 10.1) is not None